@@ -78,6 +78,10 @@ class ProjectAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('is_active', 'is_deleted')
         }),
+        ('Rasm yuklash siyosati', {
+            'fields': ('normalize_uploads', 'upload_max_edge', 'upload_quality'),
+            'classes': ('collapse',)
+        }),
         ('Statistika', {
             'fields': ('images_count_display',),
             'classes': ('collapse',)
@@ -234,7 +238,7 @@ class AgentLocationAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     fieldsets = (
         ('Agent ma\'lumotlari', {
-            'fields': ('agent_code', 'agent_name', 'agent_phone', 'region')
+            'fields': ('project', 'agent_code', 'agent_name', 'agent_phone', 'region')
         }),
         ('Qurilma ma\'lumotlari', {
             'fields': (
@@ -0,0 +1,67 @@
+"""
+Fill geohash columns for AgentLocation and Visit rows created before the spatial index.
+
+Usage:
+    python manage.py backfill_geohash
+    python manage.py backfill_geohash --batch-size 5000 --force
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import AgentLocation
+from utils.geo import safe_geohash
+from visits.models import Visit
+
+
+class Command(BaseCommand):
+    help = 'Compute geohash cells for existing agent pings and visit check-ins'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per bulk_update batch',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute rows that already have a geohash',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        force = options['force']
+
+        locations = AgentLocation.objects.all()
+        if not force:
+            locations = locations.filter(geohash='')
+        updated = self._backfill(locations, 'id', 'geohash', 'latitude', 'longitude', batch_size)
+        self.stdout.write(self.style.SUCCESS(f'AgentLocation: {updated} rows updated'))
+
+        visits = Visit.objects.filter(check_in_latitude__isnull=False, check_in_longitude__isnull=False)
+        if not force:
+            visits = visits.filter(check_in_geohash='')
+        updated = self._backfill(
+            visits, 'visit_id', 'check_in_geohash', 'check_in_latitude', 'check_in_longitude', batch_size
+        )
+        self.stdout.write(self.style.SUCCESS(f'Visit: {updated} rows updated'))
+
+    @staticmethod
+    def _backfill(queryset, pk_field, geohash_field, lat_field, lng_field, batch_size):
+        """Keyset (pk) bo'yicha partiyalab yangilash - ochiq cursor ustida yozmaslik uchun"""
+        model = queryset.model
+        updated = 0
+        last_pk = None
+        while True:
+            page = queryset.order_by(pk_field)
+            if last_pk is not None:
+                page = page.filter(**{f'{pk_field}__gt': last_pk})
+            rows = list(page.values_list(pk_field, lat_field, lng_field)[:batch_size])
+            if not rows:
+                break
+            batch = [model(**{pk_field: pk, geohash_field: safe_geohash(lat, lng)}) for pk, lat, lng in rows]
+            model.objects.bulk_update(batch, [geohash_field])
+            updated += len(batch)
+            last_pk = rows[-1][0]
+        return updated
@@ -0,0 +1,92 @@
+"""
+Fill persisted image metadata (width, height, format, size, thumbnail size,
+LQIP placeholder)
+for ProjectImage, ClientImage and NomenklaturaImage rows uploaded earlier.
+
+Usage:
+    python manage.py backfill_image_metadata
+    python manage.py backfill_image_metadata --model client --batch-size 200
+    python manage.py backfill_image_metadata --force --skip-thumbnails
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.models import ProjectImage
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.images import IMAGE_METADATA_FIELDS, populate_image_metadata, populate_thumbnail_metadata
+
+MODELS_MAP = {
+    'project': ProjectImage,
+    'client': ClientImage,
+    'nomenklatura': NomenklaturaImage,
+}
+
+
+class Command(BaseCommand):
+    help = 'Backfill stored image metadata so thumbnail feeds do not open files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=list(MODELS_MAP.keys()),
+            help='Process only one image model (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows fetched per batch',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute rows that already have metadata',
+        )
+        parser.add_argument(
+            '--skip-thumbnails',
+            action='store_true',
+            help='Do not generate thumbnails / thumbnail metadata / placeholders',
+        )
+
+    def handle(self, *args, **options):
+        models = [MODELS_MAP[options['model']]] if options.get('model') else list(MODELS_MAP.values())
+        for model in models:
+            updated, failed = self._backfill(
+                model, options['batch_size'], options['force'], options['skip_thumbnails']
+            )
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: {updated} updated, {failed} failed'))
+
+    @staticmethod
+    def _backfill(model, batch_size, force, skip_thumbnails):
+        queryset = model.objects.exclude(image='')
+        if not force:
+            pending = Q(width__isnull=True)
+            if not skip_thumbnails:
+                pending |= Q(thumbnail_size_bytes__isnull=True) | Q(placeholder__isnull=True)
+            queryset = queryset.filter(pending)
+
+        updated = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for obj in batch:
+                ok = True
+                if force or obj.width is None:
+                    if populate_image_metadata(obj):
+                        model.objects.filter(pk=obj.pk).update(
+                            **{field: getattr(obj, field) for field in IMAGE_METADATA_FIELDS}
+                        )
+                    else:
+                        ok = False
+                if not skip_thumbnails and (force or obj.thumbnail_size_bytes is None or obj.placeholder is None):
+                    ok = populate_thumbnail_metadata(obj) and ok
+                if ok:
+                    updated += 1
+                else:
+                    failed += 1
+            last_pk = batch[-1].pk
+        return updated, failed
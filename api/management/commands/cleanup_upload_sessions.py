@@ -0,0 +1,24 @@
+"""
+Delete expired chunked upload sessions together with their temporary files,
+plus stray `.part` files older than UPLOAD_SESSION_TTL_HOURS.
+
+Run periodically (e.g. hourly from cron).
+
+Usage:
+    python manage.py cleanup_upload_sessions
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.services import ChunkedUploadService
+from utils.images import format_size
+
+
+class Command(BaseCommand):
+    help = 'Remove expired resumable upload sessions and their temp files'
+
+    def handle(self, *args, **options):
+        deleted, freed = ChunkedUploadService.cleanup_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} expired sessions removed, {format_size(freed)} freed'
+        ))
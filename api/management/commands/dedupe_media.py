@@ -0,0 +1,161 @@
+"""
+Move existing ProjectImage, ClientImage and NomenklaturaImage files into the
+content-addressed blob store (`blobs/ab/cd/<sha256>.<ext>`), pointing every
+row with identical content at a single blob, and report reclaimed disk space.
+
+Renditions are regenerated once per blob and copied to the other rows that
+share it. Old imagekit cache files are left for the media GC.
+
+Usage:
+    python manage.py dedupe_media --dry-run
+    python manage.py dedupe_media --model client --batch-size 200
+    python manage.py dedupe_media --keep-originals --skip-renditions
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import ProjectImage
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.images import THUMBNAIL_METADATA_FIELDS, format_size
+from utils.renditions import generate_renditions
+from utils.storage import BLOB_PREFIX, blob_name, compute_sha256, get_image_storage, hash_from_name
+
+MODELS_MAP = {
+    'project': ProjectImage,
+    'client': ClientImage,
+    'nomenklatura': NomenklaturaImage,
+}
+
+
+class Command(BaseCommand):
+    help = 'Deduplicate stored images by SHA-256 and move them into the blob store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=list(MODELS_MAP.keys()),
+            help='Process only one image model (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Rows fetched per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only hash files and report what would be reclaimed',
+        )
+        parser.add_argument(
+            '--keep-originals',
+            action='store_true',
+            help='Do not delete the old (non-blob) files',
+        )
+        parser.add_argument(
+            '--skip-renditions',
+            action='store_true',
+            help='Do not regenerate renditions for relinked blobs',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = get_image_storage()
+        self.dry_run = options['dry_run']
+        self.keep_originals = options['keep_originals']
+        # Dry-run'da yozilgan deb hisoblanadigan blob'lar
+        self.seen_hashes = set()
+
+        models = [MODELS_MAP[options['model']]] if options.get('model') else list(MODELS_MAP.values())
+        total_reclaimed = 0
+        for model in models:
+            stats = self._dedupe(model, options['batch_size'])
+            if not self.dry_run and not options['skip_renditions']:
+                stats['renditions'] = self._regenerate(model, stats['relinked_hashes'])
+            total_reclaimed += stats['reclaimed']
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: {stats['relinked']} relinked, {stats['hashed']} hashed, "
+                f"{stats['duplicates']} duplicates, {stats['failed']} failed, "
+                f"{stats.get('renditions', 0)} blobs rendered, reclaimed {format_size(stats['reclaimed'])}"
+            ))
+
+        prefix = 'Would reclaim' if self.dry_run or self.keep_originals else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {format_size(total_reclaimed)} in total'))
+
+    def _dedupe(self, model, batch_size):
+        stats = {
+            'relinked': 0, 'hashed': 0, 'duplicates': 0, 'failed': 0,
+            'reclaimed': 0, 'relinked_hashes': set(),
+        }
+        queryset = model.objects.exclude(image='')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for obj in batch:
+                try:
+                    self._process(model, obj, stats)
+                except (OSError, ValueError) as e:
+                    stats['failed'] += 1
+                    self.stderr.write(f'{model.__name__} #{obj.pk}: {e}')
+            last_pk = batch[-1].pk
+        return stats
+
+    def _process(self, model, obj, stats):
+        name = obj.image.name
+        if name.startswith(f'{BLOB_PREFIX}/'):
+            # Allaqachon blob - faqat xeshni to'ldirish
+            if not obj.content_hash:
+                stats['hashed'] += 1
+                if not self.dry_run:
+                    model.objects.filter(pk=obj.pk).update(content_hash=hash_from_name(name))
+            return
+
+        with self.storage.open(name, 'rb') as fh:
+            content_hash = compute_sha256(fh)
+            target = blob_name(content_hash, name)
+            size = self.storage.size(name)
+            blob_exists = content_hash in self.seen_hashes or self.storage.exists(target)
+            if not self.dry_run and not blob_exists:
+                fh.content_hash = content_hash
+                target = self.storage.save(name, fh)
+        self.seen_hashes.add(content_hash)
+
+        if blob_exists:
+            stats['duplicates'] += 1
+        stats['relinked'] += 1
+        stats['relinked_hashes'].add(content_hash)
+        if not self.keep_originals or self.dry_run:
+            # Yangi blob yozilgan bo'lsa joy faqat dublikatlardan bo'shaydi
+            stats['reclaimed'] += size if blob_exists else 0
+        if self.dry_run:
+            return
+
+        model.objects.filter(pk=obj.pk).update(
+            image=target,
+            content_hash=content_hash,
+            renditions_ready=False,
+            **{field: None for field in THUMBNAIL_METADATA_FIELDS},
+        )
+        if not self.keep_originals and not self._is_referenced(name):
+            self.storage.delete(name)
+
+    @staticmethod
+    def _is_referenced(name):
+        return any(model.objects.filter(image=name).exists() for model in MODELS_MAP.values())
+
+    @staticmethod
+    def _regenerate(model, content_hashes):
+        """Har bir blob uchun rendition'larni bir marta yaratib, qolgan yozuvlarga nusxalash"""
+        rendered = 0
+        for content_hash in content_hashes:
+            first = model.objects.filter(content_hash=content_hash).order_by('pk').first()
+            if first is None or not generate_renditions(first):
+                continue
+            rendered += 1
+            model.objects.filter(content_hash=content_hash).exclude(pk=first.pk).update(
+                renditions_ready=True,
+                **{field: getattr(first, field) for field in THUMBNAIL_METADATA_FIELDS},
+            )
+        return rendered
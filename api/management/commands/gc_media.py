@@ -0,0 +1,227 @@
+"""
+Garbage-collect orphaned image files and imagekit renditions.
+
+Walks the managed media prefixes (`blobs/`, the image models' `upload_to`
+directories, `CACHE/images/`, `CACHE/sprites/`) and compares every file against
+sets of live names loaded once from ProjectImage, ClientImage and
+NomenklaturaImage - no per-file queries.
+
+- Originals are orphaned when no row (soft-deleted rows included, they can be
+  restored) references them. Shared blobs stay while any row points at them.
+- Renditions are orphaned when their source is not used by an active row, or
+  only by rows soft-deleted longer than the grace period.
+- Sprite sheets are removed once older than the grace period.
+- `CACHE/resized/` is skipped: it has its own LRU limit.
+- In-flight files (`*.tmp`) and files younger than `--min-age-hours` are
+  skipped so uploads that have not committed their rows yet are not touched.
+  Deduplicated uploads refresh the blob's mtime, and orphaned originals are
+  re-checked against the database per chunk right before deletion, so a blob
+  reused during the walk is kept.
+
+Usage:
+    python manage.py gc_media --dry-run
+    python manage.py gc_media --grace-days 30 --quarantine /var/backups/media-gc
+    python manage.py gc_media --only renditions
+"""
+
+import datetime
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import ProjectImage
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.images import format_size
+from utils.sprites import SPRITE_PREFIX
+from utils.storage import BLOB_PREFIX, get_image_storage, referenced_names
+
+MODELS = (ProjectImage, ClientImage, NomenklaturaImage)
+CATEGORIES = ('originals', 'renditions', 'sprites')
+RESIZE_PREFIX = 'CACHE/resized'
+TMP_SUFFIX = '.tmp'
+# Originallar shuncha nomdan iborat chunk'larda o'chirishdan oldin qayta tekshiriladi
+RECHECK_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Delete or quarantine orphaned media files and imagekit renditions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=CATEGORIES,
+            help='Collect only one category (default: all)',
+        )
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=30,
+            help='Keep renditions of soft-deleted images (and sprites) this many days',
+        )
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=24,
+            help='Never touch files modified more recently than this',
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Move orphans into this directory instead of deleting them',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be reclaimed',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.quarantine = options['quarantine']
+        self.min_mtime = time.time() - options['min_age_hours'] * 3600
+        grace_cutoff = timezone.now() - datetime.timedelta(days=options['grace_days'])
+        categories = [options['only']] if options.get('only') else list(CATEGORIES)
+
+        referenced, rendition_sources = self._load_live_names(grace_cutoff)
+        self.stdout.write(
+            f'{len(referenced)} referenced originals, {len(rendition_sources)} live rendition sources'
+        )
+
+        cache_dir = settings.IMAGEKIT_CACHEFILE_DIR
+        total = 0
+        for category in categories:
+            # Originallar blob storage'da, rendition va sprite'lar imagekit (default) storage'da
+            self.storage = get_image_storage() if category == 'originals' else default_storage
+            if category == 'originals':
+                prefixes = [BLOB_PREFIX, *self._upload_dirs()]
+                is_orphan = lambda name: name not in referenced  # noqa: E731
+            elif category == 'renditions':
+                prefixes = [cache_dir]
+                is_orphan = lambda name: os.path.dirname(name)[len(cache_dir) + 1:] not in rendition_sources  # noqa: E731
+            else:
+                prefixes = [SPRITE_PREFIX]
+                sprite_cutoff = grace_cutoff.timestamp()
+                is_orphan = lambda name: self._mtime(name) < sprite_cutoff  # noqa: E731
+
+            stats = {'scanned': 0, 'removed': 0, 'bytes': 0, 'failed': 0}
+            pending = []
+            for prefix in prefixes:
+                for name in self._walk(prefix):
+                    stats['scanned'] += 1
+                    if name.endswith(TMP_SUFFIX):
+                        continue
+                    try:
+                        if self._mtime(name) > self.min_mtime or not is_orphan(name):
+                            continue
+                        size = self.storage.size(name)
+                    except OSError as e:
+                        stats['failed'] += 1
+                        self.stderr.write(f'{name}: {e}')
+                        continue
+                    pending.append((name, size))
+                    if category != 'originals' or len(pending) >= RECHECK_CHUNK_SIZE:
+                        self._collect_chunk(pending, stats, recheck=category == 'originals')
+                        pending = []
+            self._collect_chunk(pending, stats, recheck=category == 'originals')
+            total += stats['bytes']
+            self.stdout.write(self.style.SUCCESS(
+                f"{category}: {stats['scanned']} scanned, {stats['removed']} orphaned, "
+                f"{stats['failed']} failed, {format_size(stats['bytes'])}"
+            ))
+
+        if 'renditions' in categories and not self.dry_run:
+            self._reset_purged_renditions(grace_cutoff, rendition_sources)
+
+        action = 'Would reclaim' if self.dry_run else ('Quarantined' if self.quarantine else 'Reclaimed')
+        self.stdout.write(self.style.SUCCESS(f'{action} {format_size(total)} in total'))
+
+    @staticmethod
+    def _upload_dirs():
+        dirs = []
+        for model in MODELS:
+            upload_to = model._meta.get_field('image').upload_to
+            if isinstance(upload_to, str) and upload_to.strip('/') and upload_to.strip('/') not in dirs:
+                dirs.append(upload_to.strip('/'))
+        return dirs
+
+    @staticmethod
+    def _load_live_names(grace_cutoff):
+        """
+        Bitta o'tishda ikkita to'plam:
+        referenced - har qanday yozuv ishlatayotgan original nomlari,
+        rendition_sources - rendition'lari saqlanishi kerak bo'lgan manbalar (kengaytmasiz).
+        """
+        referenced = set()
+        rendition_sources = set()
+        for model in MODELS:
+            rows = model.objects.exclude(image='').values_list('image', 'is_deleted', 'updated_at')
+            for name, is_deleted, updated_at in rows.iterator(chunk_size=5000):
+                referenced.add(name)
+                if not is_deleted or updated_at >= grace_cutoff:
+                    rendition_sources.add(os.path.splitext(name)[0])
+        return referenced, rendition_sources
+
+    def _walk(self, prefix):
+        """Storage bo'ylab papkama-papka yurish (butun ro'yxat xotiraga olinmaydi)"""
+        if prefix == RESIZE_PREFIX or not self.storage.exists(prefix):
+            return
+        dirs, files = self.storage.listdir(prefix)
+        for filename in files:
+            yield f'{prefix}/{filename}'
+        for dirname in dirs:
+            child = f'{prefix}/{dirname}'
+            if child != RESIZE_PREFIX:
+                yield from self._walk(child)
+
+    def _mtime(self, name):
+        return self.storage.get_modified_time(name).timestamp()
+
+    def _collect_chunk(self, chunk, stats, recheck):
+        """
+        Originallar uchun: yurish davomida yangi yozuv shu blob'ga bog'langan
+        bo'lishi mumkin - o'chirishdan oldin bazadan qayta tekshiriladi.
+        """
+        if not chunk:
+            return
+        live = referenced_names(name for name, _ in chunk) if recheck else set()
+        for name, size in chunk:
+            if name in live:
+                continue
+            try:
+                self._collect(name)
+            except OSError as e:
+                stats['failed'] += 1
+                self.stderr.write(f'{name}: {e}')
+                continue
+            stats['removed'] += 1
+            stats['bytes'] += size
+
+    def _collect(self, name):
+        if self.dry_run:
+            return
+        if not self.quarantine:
+            self.storage.delete(name)
+            return
+        try:
+            source = self.storage.path(name)
+        except NotImplementedError:
+            raise CommandError('--quarantine faqat lokal fayl tizimi storage bilan ishlaydi')
+        target = os.path.join(self.quarantine, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source, target)
+
+    @staticmethod
+    def _reset_purged_renditions(grace_cutoff, rendition_sources):
+        """Rendition'lari o'chirilgan soft-deleted yozuvlar tiklansa, original URL qaytarilsin"""
+        for model in MODELS:
+            rows = model.objects.filter(
+                is_deleted=True, updated_at__lt=grace_cutoff, renditions_ready=True,
+            ).exclude(image='').values_list('pk', 'image')
+            purged = [pk for pk, name in rows.iterator() if os.path.splitext(name)[0] not in rendition_sources]
+            for start in range(0, len(purged), 1000):
+                model.objects.filter(pk__in=purged[start:start + 1000]).update(renditions_ready=False)
@@ -0,0 +1,80 @@
+"""
+Generate imagekit renditions (thumbnail/sm/md/lg) for images that do not have them yet.
+
+Usage:
+    python manage.py generate_renditions
+    python manage.py generate_renditions --model nomenklatura --workers 8
+    python manage.py generate_renditions --force
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from api.models import ProjectImage
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.renditions import generate_renditions_for_pk
+
+MODELS_MAP = {
+    'project': ProjectImage,
+    'client': ClientImage,
+    'nomenklatura': NomenklaturaImage,
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate image renditions in parallel and mark images as renditions_ready'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=list(MODELS_MAP.keys()),
+            help='Process only one image model (default: all)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of parallel worker threads',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Primary keys submitted per batch',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate renditions even if they are marked ready',
+        )
+
+    def handle(self, *args, **options):
+        models = [MODELS_MAP[options['model']]] if options.get('model') else list(MODELS_MAP.values())
+        workers = max(options['workers'], 1)
+        force = options['force']
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for model in models:
+                queryset = model.objects.filter(is_deleted=False).exclude(image='')
+                if not force:
+                    queryset = queryset.filter(renditions_ready=False)
+
+                done = failed = 0
+                last_pk = 0
+                while True:
+                    pks = list(
+                        queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+                    )
+                    if not pks:
+                        break
+                    futures = [executor.submit(generate_renditions_for_pk, model, pk, force) for pk in pks]
+                    for future in as_completed(futures):
+                        if future.result():
+                            done += 1
+                        else:
+                            failed += 1
+                    last_pk = pks[-1]
+                    self.stdout.write(f'{model.__name__}: {done} done, {failed} failed...')
+
+                self.stdout.write(self.style.SUCCESS(f'{model.__name__}: {done} generated, {failed} failed'))
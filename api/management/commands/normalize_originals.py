@@ -0,0 +1,195 @@
+"""
+Re-process stored original images with their project's upload policy
+(auto-orient, cap the long edge, recompress, strip EXIF/GPS metadata).
+
+Only projects with `normalize_uploads` enabled are processed; rows already
+marked `is_normalized` are skipped. Normalized files go to the blob store,
+renditions are regenerated once per new blob. Replaced originals are left in
+place for the media GC (they may still be referenced by other rows).
+
+Usage:
+    python manage.py normalize_originals --dry-run
+    python manage.py normalize_originals --model client --project P-001
+    python manage.py normalize_originals --batch-size 100 --skip-renditions
+"""
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from api.models import ProjectImage
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.images import (
+    THUMBNAIL_METADATA_FIELDS,
+    format_size,
+    has_embedded_metadata,
+    normalize_image_bytes,
+    with_format_extension,
+)
+from utils.renditions import generate_renditions
+from utils.storage import compute_sha256, get_image_storage
+
+# Model -> api.Project ga olib boruvchi lookup
+MODELS_MAP = {
+    'project': (ProjectImage, 'project'),
+    'client': (ClientImage, 'client__project'),
+    'nomenklatura': (NomenklaturaImage, 'nomenklatura__project'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Normalize stored originals according to per-project upload policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=list(MODELS_MAP.keys()),
+            help='Process only one image model (default: all)',
+        )
+        parser.add_argument(
+            '--project',
+            help='Process only one project (code_1c)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Rows fetched per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how much space would be saved',
+        )
+        parser.add_argument(
+            '--skip-renditions',
+            action='store_true',
+            help='Do not regenerate renditions for normalized blobs',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = get_image_storage()
+        self.dry_run = options['dry_run']
+        # (eski blob nomi, siyosat) -> natija: bir xil blob bir marta qayta ishlanadi
+        self.results = {}
+
+        keys = [options['model']] if options.get('model') else list(MODELS_MAP.keys())
+        total_saved = 0
+        for key in keys:
+            model, project_path = MODELS_MAP[key]
+            stats = self._normalize(model, project_path, options['project'], options['batch_size'])
+            if not self.dry_run and not options['skip_renditions']:
+                stats['renditions'] = self._regenerate(model, stats['hashes'])
+            total_saved += stats['saved']
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: {stats['normalized']} normalized, {stats['skipped']} unchanged, "
+                f"{stats['failed']} failed, {stats.get('renditions', 0)} blobs rendered, "
+                f"saved {format_size(stats['saved'])}"
+            ))
+
+        prefix = 'Would save' if self.dry_run else 'Saved'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {format_size(total_saved)} in total'))
+
+    def _normalize(self, model, project_path, project_code, batch_size):
+        stats = {'normalized': 0, 'skipped': 0, 'failed': 0, 'saved': 0, 'hashes': set()}
+        queryset = model.objects.exclude(image='').filter(
+            is_normalized=False,
+            **{f'{project_path}__normalize_uploads': True},
+        )
+        if project_code:
+            queryset = queryset.filter(**{f'{project_path}__code_1c': project_code})
+        policy_fields = {
+            'max_edge': f'{project_path}__upload_max_edge',
+            'quality': f'{project_path}__upload_quality',
+        }
+        queryset = queryset.annotate(**{f'policy_{key}': F(path) for key, path in policy_fields.items()})
+
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for obj in batch:
+                policy = {'max_edge': obj.policy_max_edge, 'quality': obj.policy_quality}
+                try:
+                    self._process(model, obj, policy, stats)
+                except Exception as e:  # noqa: BLE001 - bitta buzilgan fayl butun jarayonni to'xtatmasin
+                    stats['failed'] += 1
+                    self.stderr.write(f'{model.__name__} #{obj.pk}: {e}')
+            last_pk = batch[-1].pk
+        return stats
+
+    def _process(self, model, obj, policy, stats):
+        key = (obj.image.name, policy['max_edge'], policy['quality'])
+        if key not in self.results:
+            self.results[key] = self._normalize_file(obj.image.name, policy)
+        result = self.results[key]
+        if result is None:
+            stats['skipped'] += 1
+            if not self.dry_run:
+                model.objects.filter(pk=obj.pk).update(is_normalized=True)
+            return
+
+        stats['normalized'] += 1
+        if not result.get('counted'):
+            # Blob bir marta yoziladi, tejalgan joy ham bir marta hisoblanadi
+            stats['saved'] += result['saved']
+            result['counted'] = True
+        if self.dry_run:
+            return
+        stats['hashes'].add(result['content_hash'])
+        model.objects.filter(pk=obj.pk).update(
+            image=result['name'],
+            content_hash=result['content_hash'],
+            is_normalized=True,
+            renditions_ready=False,
+            **result['metadata'],
+            **{field: None for field in THUMBNAIL_METADATA_FIELDS},
+        )
+
+    def _normalize_file(self, name, policy):
+        """
+        Faylni siyosat bo'yicha qayta kodlash. Hajm kamaymasa va faylda EXIF/GPS
+        ham bo'lmasa None; metama'lumotli fayl hajmidan qat'i nazar tozalanadi.
+        """
+        with self.storage.open(name, 'rb') as fh:
+            original = fh.read()
+        normalized = normalize_image_bytes(original, **policy)
+        if not normalized:
+            return None
+        data, size, image_format = normalized
+        if len(data) >= len(original) and not has_embedded_metadata(original):
+            return None
+
+        content = ContentFile(data, name=with_format_extension(name, image_format))
+        content.content_hash = compute_sha256(content)
+        new_name = content.name
+        if not self.dry_run:
+            new_name = self.storage.save(content.name, content)
+        return {
+            'name': new_name,
+            'content_hash': content.content_hash,
+            'saved': max(len(original) - len(data), 0),
+            'metadata': {
+                'width': size[0],
+                'height': size[1],
+                'format': image_format,
+                'size_bytes': len(data),
+            },
+        }
+
+    @staticmethod
+    def _regenerate(model, content_hashes):
+        """Har bir yangi blob uchun rendition'larni bir marta yaratib, qolgan yozuvlarga nusxalash"""
+        rendered = 0
+        for content_hash in content_hashes:
+            first = model.objects.filter(content_hash=content_hash).order_by('pk').first()
+            if first is None or not generate_renditions(first):
+                continue
+            rendered += 1
+            model.objects.filter(content_hash=content_hash).exclude(pk=first.pk).update(
+                renditions_ready=True,
+                **{field: getattr(first, field) for field in THUMBNAIL_METADATA_FIELDS},
+            )
+        return rendered
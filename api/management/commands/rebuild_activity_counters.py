@@ -0,0 +1,49 @@
+"""
+Rebuild hourly agent activity counters (AgentActivityHourly) from raw data.
+
+Usage:
+    python manage.py rebuild_activity_counters
+    python manage.py rebuild_activity_counters --date-from 2025-01-01 --date-to 2025-01-31
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.services import AgentActivityService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly agent activity counters from AgentLocation and Visit records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date-from',
+            type=str,
+            help='Start date (YYYY-MM-DD), inclusive',
+        )
+        parser.add_argument(
+            '--date-to',
+            type=str,
+            help='End date (YYYY-MM-DD), inclusive',
+        )
+
+    def handle(self, *args, **options):
+        date_from = self._parse(options.get('date_from'), '--date-from')
+        date_to = self._parse(options.get('date_to'), '--date-to')
+        if date_from and date_to and date_from > date_to:
+            raise CommandError('--date-from must be before --date-to')
+
+        created = AgentActivityService.rebuild(date_from=date_from, date_to=date_to)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} hourly activity rows'))
+
+    @staticmethod
+    def _parse(value, option):
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if not parsed:
+            raise CommandError(f'{option}: invalid date "{value}", expected YYYY-MM-DD')
+        return parsed
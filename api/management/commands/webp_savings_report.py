@@ -0,0 +1,92 @@
+"""
+Report how many bytes WebP renditions save compared to the JPEG renditions.
+
+Usage:
+    python manage.py webp_savings_report
+    python manage.py webp_savings_report --model client --limit 500
+    python manage.py webp_savings_report --generate   # create missing renditions while measuring
+"""
+from django.core.management.base import BaseCommand
+
+from api.models import ProjectImage
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.images import format_size
+from utils.renditions import JPEG_SPECS, WEBP_SUFFIX
+
+MODELS_MAP = {
+    'project': ProjectImage,
+    'client': ClientImage,
+    'nomenklatura': NomenklaturaImage,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare JPEG and WebP rendition sizes over existing media'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=list(MODELS_MAP.keys()),
+            help='Process only one image model (default: all)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Maximum number of images per model (sample)',
+        )
+        parser.add_argument(
+            '--generate',
+            action='store_true',
+            help='Generate missing JPEG/WebP renditions instead of skipping them',
+        )
+
+    def handle(self, *args, **options):
+        models = [MODELS_MAP[options['model']]] if options.get('model') else list(MODELS_MAP.values())
+        grand_jpeg = grand_webp = 0
+
+        for model in models:
+            totals = {spec: [0, 0, 0] for spec in JPEG_SPECS}  # jpeg bytes, webp bytes, pairs
+            queryset = model.objects.filter(is_deleted=False).exclude(image='').order_by('pk')
+            if options.get('limit'):
+                queryset = queryset[:options['limit']]
+
+            for obj in queryset.iterator(chunk_size=200):
+                for spec in JPEG_SPECS:
+                    jpeg_size = self._rendition_size(obj, spec, options['generate'])
+                    webp_size = self._rendition_size(obj, f'{spec}{WEBP_SUFFIX}', options['generate'])
+                    if jpeg_size is None or webp_size is None:
+                        continue
+                    totals[spec][0] += jpeg_size
+                    totals[spec][1] += webp_size
+                    totals[spec][2] += 1
+
+            self.stdout.write(self.style.MIGRATE_HEADING(model.__name__))
+            for spec, (jpeg_bytes, webp_bytes, pairs) in totals.items():
+                self.stdout.write(f'  {spec:<16} {self._line(jpeg_bytes, webp_bytes)} ({pairs} images)')
+                grand_jpeg += jpeg_bytes
+                grand_webp += webp_bytes
+
+        self.stdout.write(self.style.SUCCESS(f'TOTAL {self._line(grand_jpeg, grand_webp)}'))
+
+    @staticmethod
+    def _rendition_size(obj, spec_name, generate):
+        try:
+            cachefile = getattr(obj, spec_name)
+            storage = cachefile.storage
+            if not storage.exists(cachefile.name):
+                if not generate:
+                    return None
+                cachefile.generate()
+            return storage.size(cachefile.name)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _line(jpeg_bytes, webp_bytes):
+        saved = jpeg_bytes - webp_bytes
+        percent = (saved / jpeg_bytes * 100) if jpeg_bytes else 0
+        return (
+            f'JPEG {format_size(jpeg_bytes)} -> WebP {format_size(webp_bytes)}, '
+            f'saved {format_size(max(saved, 0))} ({percent:.1f}%)'
+        )
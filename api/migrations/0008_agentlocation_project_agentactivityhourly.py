@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_agentlocation_accelerometer_x_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentlocation',
+            name='project',
+            field=models.ForeignKey(blank=True, help_text='Proyekt', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='agent_locations', to='api.project'),
+        ),
+        migrations.CreateModel(
+            name='AgentActivityHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agent_code', models.CharField(help_text='Agent kodi', max_length=100)),
+                ('region', models.CharField(blank=True, default='', help_text='Hudud yoki filial nomi', max_length=120)),
+                ('hour', models.DateTimeField(help_text='Soat boshi (UTC)')),
+                ('points_count', models.PositiveIntegerField(default=0, help_text='Lokatsiya yozuvlari soni')),
+                ('visits_count', models.PositiveIntegerField(default=0, help_text='Check-in qilingan tashriflar soni')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(blank=True, help_text='Proyekt', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_counters', to='api.project')),
+            ],
+            options={
+                'verbose_name': 'Agent Activity (hourly)',
+                'verbose_name_plural': 'Agent Activity (hourly)',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour', 'project'], name='api_agentac_hour_6ec2cc_idx'), models.Index(fields=['agent_code', 'hour'], name='api_agentac_agent_c_0d01f1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'agent_code', 'region', 'hour'), name='uniq_agent_activity_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_agentlocation_project_agentactivityhourly'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentlocation',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text="Koordinata geohash'i (spatial qidiruv uchun, avtomatik)", max_length=12),
+        ),
+    ]
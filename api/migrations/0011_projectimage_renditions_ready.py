@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_projectimage_format_projectimage_height_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, help_text="image_thumbnail/sm/md/lg fonda yaratib bo'lindimi"),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:37
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_projectimage_content_hash_alter_projectimage_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Sessiya identifikatori', unique=True)),
+                ('target', models.CharField(choices=[('client', 'Client rasmi'), ('nomenklatura', 'Nomenklatura rasmi'), ('visit', 'Tashrif rasmi')], help_text='Yakuniy rasm turi', max_length=20)),
+                ('target_id', models.CharField(help_text="Bog'lanadigan obyekt PK (client, nomenklatura yoki visit)", max_length=64)),
+                ('filename', models.CharField(help_text='Asl fayl nomi', max_length=255)),
+                ('total_size', models.PositiveBigIntegerField(help_text="Faylning to'liq hajmi (bayt)")),
+                ('received_bytes', models.PositiveBigIntegerField(default=0, help_text='Qabul qilingan baytlar (offset)')),
+                ('checksum', models.CharField(blank=True, default='', help_text="Ixtiyoriy SHA-256 (finalize'da tekshiriladi)", max_length=64)),
+                ('category', models.CharField(blank=True, default='', help_text='Rasm toifasi', max_length=120)),
+                ('note', models.CharField(blank=True, default='', help_text='Izoh', max_length=255)),
+                ('image_type', models.CharField(blank=True, default='', help_text='Tashrif rasmi turi (visit uchun)', max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Yuklanmoqda'), ('completed', 'Yakunlangan'), ('aborted', 'Bekor qilingan')], db_index=True, default='pending', max_length=20)),
+                ('result_id', models.CharField(blank=True, default='', help_text='Yaratilgan rasm yozuvining PK', max_length=64)),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='Sessiya amal qilish muddati')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, help_text='Sessiyani ochgan foydalanuvchi', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Upload Session',
+                'verbose_name_plural': 'Upload Sessions',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:42
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='normalize_uploads',
+            field=models.BooleanField(default=False, help_text="Yuklashda original rasmni normalize qilish (auto-orient, o'lchamni cheklash, qayta siqish, EXIF'siz)"),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='upload_max_edge',
+            field=models.PositiveIntegerField(default=2560, help_text='Original rasmning uzun tomoni (px) uchun chegara'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='upload_quality',
+            field=models.PositiveSmallIntegerField(default=85, help_text='Qayta siqish sifati (JPEG/WebP, 1-95)', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(95)]),
+        ),
+        migrations.AddField(
+            model_name='projectimage',
+            name='is_normalized',
+            field=models.BooleanField(default=False, help_text="Original project siyosati bo'yicha normalize qilinganmi"),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:25
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_counters(apps, schema_editor):
+    """Project'siz takroriy soatlik qatorlarni bittaga yig'ish (yangi constraint'dan oldin)"""
+    AgentActivityHourly = apps.get_model('api', 'AgentActivityHourly')
+    duplicates = (
+        AgentActivityHourly.objects.filter(project__isnull=True)
+        .values('agent_code', 'region', 'hour')
+        .annotate(rows=Count('id'), points=Sum('points_count'), visits=Sum('visits_count'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = AgentActivityHourly.objects.filter(
+            project__isnull=True, agent_code=group['agent_code'], region=group['region'], hour=group['hour'],
+        ).order_by('id')
+        keep = rows.first()
+        rows.exclude(pk=keep.pk).delete()
+        AgentActivityHourly.objects.filter(pk=keep.pk).update(
+            points_count=group['points'], visits_count=group['visits'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_projectimage_placeholder'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='agentactivityhourly',
+            name='uniq_agent_activity_hour',
+        ),
+        migrations.AddConstraint(
+            model_name='agentactivityhourly',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', False)), fields=('project', 'agent_code', 'region', 'hour'), name='uniq_agent_activity_hour'),
+        ),
+        migrations.RunPython(merge_duplicate_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='agentactivityhourly',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', True)), fields=('agent_code', 'region', 'hour'), name='uniq_agent_activity_hour_no_project'),
+        ),
+    ]
@@ -1,7 +1,14 @@
+import uuid
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from ckeditor.fields import RichTextField
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill, ResizeToFit
+from utils.images import has_new_image, prepare_new_image
+from utils.renditions import schedule_renditions
+from utils.storage import get_image_storage
+from utils.geo import safe_geohash
 
 # Create your models here.
 class BaseModel(models.Model):
@@ -113,6 +120,19 @@ class Project(BaseModel):
     name = models.CharField(max_length=255, db_index=True)
     title = models.CharField(max_length=255, blank=True, null=True)
     description = RichTextField(blank=True, null=True)
+    normalize_uploads = models.BooleanField(
+        default=False,
+        help_text="Yuklashda original rasmni normalize qilish (auto-orient, o'lchamni cheklash, qayta siqish, EXIF'siz)"
+    )
+    upload_max_edge = models.PositiveIntegerField(
+        default=2560,
+        help_text="Original rasmning uzun tomoni (px) uchun chegara"
+    )
+    upload_quality = models.PositiveSmallIntegerField(
+        default=85,
+        validators=[MinValueValidator(1), MaxValueValidator(95)],
+        help_text="Qayta siqish sifati (JPEG/WebP, 1-95)"
+    )
 
     class Meta:
         ordering = ['-created_at']
@@ -125,9 +145,18 @@ class Project(BaseModel):
     def __str__(self):
         return self.name
 
+    @property
+    def upload_policy(self):
+        """Yuklash normalize siyosati (`normalize_uploads` o'chiq bo'lsa None)"""
+        if not self.normalize_uploads:
+            return None
+        return {'max_edge': self.upload_max_edge, 'quality': self.upload_quality}
+
 class ProjectImage(BaseModel):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='images', db_index=True)
-    image = models.ImageField(upload_to='projects/')
+    image = models.ImageField(upload_to='projects/', storage=get_image_storage)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, help_text="Rasm faylining SHA-256 xeshi (blob)")
+    is_normalized = models.BooleanField(default=False, help_text="Original project siyosati bo'yicha normalize qilinganmi")
     is_main = models.BooleanField(default=False, db_index=True)
     category = models.CharField(
         max_length=120,
@@ -160,6 +189,17 @@ class ProjectImage(BaseModel):
         help_text="Rasmni yuboruvchi ma'lumotlari"
     )
     
+    # Metama'lumotlar (yuklash/rendition vaqtida bir marta hisoblanadi)
+    width = models.PositiveIntegerField(null=True, blank=True, help_text="Original kenglik (px)")
+    height = models.PositiveIntegerField(null=True, blank=True, help_text="Original balandlik (px)")
+    format = models.CharField(max_length=10, blank=True, default='', help_text="Original format (JPEG, PNG, ...)")
+    size_bytes = models.BigIntegerField(null=True, blank=True, help_text="Original hajmi (bayt)")
+    thumbnail_width = models.PositiveIntegerField(null=True, blank=True, help_text="Thumbnail kengligi (px)")
+    thumbnail_height = models.PositiveIntegerField(null=True, blank=True, help_text="Thumbnail balandligi (px)")
+    thumbnail_size_bytes = models.BigIntegerField(null=True, blank=True, help_text="Thumbnail hajmi (bayt)")
+    placeholder = models.TextField(null=True, blank=True, help_text="LQIP: kichik (16px) JPEG base64 data URI, thumbnail yuklanguncha ko'rsatiladi")
+    renditions_ready = models.BooleanField(default=False, help_text="image_thumbnail/sm/md/lg fonda yaratib bo'lindimi")
+
     # Turli o'lchamlarda rasmlar
     image_sm = ImageSpecField(
         source='image',
@@ -186,6 +226,32 @@ class ProjectImage(BaseModel):
         options={'quality': 80}
     )
 
+    # WebP variantlari (Accept: image/webp yoki ?webp=1 bo'lsa qaytariladi)
+    image_sm_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(300, 300)],
+        format='WEBP',
+        options={'quality': 80}
+    )
+    image_md_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(600, 600)],
+        format='WEBP',
+        options={'quality': 80}
+    )
+    image_lg_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(1200, 1200)],
+        format='WEBP',
+        options={'quality': 85}
+    )
+    image_thumbnail_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(150, 150)],
+        format='WEBP',
+        options={'quality': 75}
+    )
+
     def __str__(self):
         return f"{self.project.name} - Image"
 
@@ -198,6 +264,10 @@ class ProjectImage(BaseModel):
             models.Index(fields=['is_main', 'is_deleted']),
         ]
 
+    def get_project(self):
+        """Normalize siyosati olinadigan api.Project"""
+        return self.project if self.project_id else None
+
     def save(self, *args, **kwargs):
         if self.is_main:
             # Ushbu project uchun boshqa barcha rasmlarni is_main=False qilish
@@ -205,12 +275,26 @@ class ProjectImage(BaseModel):
                 project=self.project, 
                 is_main=True
             ).exclude(pk=self.pk).update(is_main=False)
+
+        needs_renditions = has_new_image(self) and prepare_new_image(self)
         super().save(*args, **kwargs)
+        if needs_renditions:
+            # Rendition'lar request ichida emas, fon pool'da yaratiladi
+            schedule_renditions(self)
 
 
 class AgentLocation(BaseModel):
     """Mobil agentlar tomonidan yuborilgan geolokatsiya yozuvlari"""
 
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='agent_locations',
+        db_index=True,
+        help_text="Proyekt"
+    )
     agent_code = models.CharField(
         max_length=100,
         db_index=True,
@@ -256,6 +340,7 @@ class AgentLocation(BaseModel):
     postal_code = models.CharField(max_length=20, blank=True, default='', help_text="Pochta indeksi")
     timezone = models.CharField(max_length=50, blank=True, default='', help_text="Vaqt mintaqasi (UTC+5, Asia/Tashkent, etc.)")
     location_provider = models.CharField(max_length=50, blank=True, default='', help_text="Lokatsiya manbasi (GPS, Network, Passive)")
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, help_text="Koordinata geohash'i (spatial qidiruv uchun, avtomatik)")
 
     # Batareya ma'lumotlari
     battery_level = models.DecimalField(
@@ -326,3 +411,115 @@ class AgentLocation(BaseModel):
 
     def __str__(self):
         return f"{self.agent_code} ({self.latitude}, {self.longitude})"
+
+    def save(self, *args, **kwargs):
+        self.geohash = safe_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ('latitude' in update_fields or 'longitude' in update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+
+class AgentActivityHourly(models.Model):
+    """
+    Agent aktivligining soatlik agregatlari (project, agent_code, region, hour).
+    Ingest vaqtida yangilanadi, regional_activity faqat shu jadvalni yig'adi.
+    """
+
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='activity_counters',
+        help_text="Proyekt"
+    )
+    agent_code = models.CharField(max_length=100, help_text="Agent kodi")
+    region = models.CharField(max_length=120, blank=True, default='', help_text="Hudud yoki filial nomi")
+    hour = models.DateTimeField(help_text="Soat boshi (UTC)")
+    points_count = models.PositiveIntegerField(default=0, help_text="Lokatsiya yozuvlari soni")
+    visits_count = models.PositiveIntegerField(default=0, help_text="Check-in qilingan tashriflar soni")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Agent Activity (hourly)"
+        verbose_name_plural = "Agent Activity (hourly)"
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'agent_code', 'region', 'hour'],
+                condition=models.Q(project__isnull=False),
+                name='uniq_agent_activity_hour',
+            ),
+            # NULL'lar unikal indeksda teng hisoblanmaydi - project'siz qatorlar alohida
+            models.UniqueConstraint(
+                fields=['agent_code', 'region', 'hour'],
+                condition=models.Q(project__isnull=True),
+                name='uniq_agent_activity_hour_no_project',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'project']),
+            models.Index(fields=['agent_code', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_code} {self.region} {self.hour:%Y-%m-%d %H}:00"
+
+
+class UploadSession(models.Model):
+    """
+    Bo'laklab (chunked) va davom ettiriladigan rasm yuklash sessiyasi.
+    Baytlar vaqtinchalik faylga yoziladi, finalize'da ClientImage,
+    NomenklaturaImage yoki VisitImage yaratiladi.
+    """
+
+    TARGET_CLIENT = 'client'
+    TARGET_NOMENKLATURA = 'nomenklatura'
+    TARGET_VISIT = 'visit'
+    TARGET_CHOICES = [
+        (TARGET_CLIENT, 'Client rasmi'),
+        (TARGET_NOMENKLATURA, 'Nomenklatura rasmi'),
+        (TARGET_VISIT, 'Tashrif rasmi'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETED = 'completed'
+    STATUS_ABORTED = 'aborted'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Yuklanmoqda'),
+        (STATUS_COMPLETED, 'Yakunlangan'),
+        (STATUS_ABORTED, 'Bekor qilingan'),
+    ]
+
+    upload_id = models.UUIDField(unique=True, default=uuid.uuid4, editable=False, help_text="Sessiya identifikatori")
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='upload_sessions',
+        help_text="Sessiyani ochgan foydalanuvchi"
+    )
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES, help_text="Yakuniy rasm turi")
+    target_id = models.CharField(max_length=64, help_text="Bog'lanadigan obyekt PK (client, nomenklatura yoki visit)")
+    filename = models.CharField(max_length=255, help_text="Asl fayl nomi")
+    total_size = models.PositiveBigIntegerField(help_text="Faylning to'liq hajmi (bayt)")
+    received_bytes = models.PositiveBigIntegerField(default=0, help_text="Qabul qilingan baytlar (offset)")
+    checksum = models.CharField(max_length=64, blank=True, default='', help_text="Ixtiyoriy SHA-256 (finalize'da tekshiriladi)")
+    category = models.CharField(max_length=120, blank=True, default='', help_text="Rasm toifasi")
+    note = models.CharField(max_length=255, blank=True, default='', help_text="Izoh")
+    image_type = models.CharField(max_length=50, blank=True, default='', help_text="Tashrif rasmi turi (visit uchun)")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    result_id = models.CharField(max_length=64, blank=True, default='', help_text="Yaratilgan rasm yozuvining PK")
+    expires_at = models.DateTimeField(db_index=True, help_text="Sessiya amal qilish muddati")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.upload_id} ({self.target}, {self.received_bytes}/{self.total_size})"
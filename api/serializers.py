@@ -4,10 +4,26 @@ from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
 from PIL import Image
 from nomenklatura.models import Nomenklatura, NomenklaturaImage
-from .models import Project, ProjectImage, ImageStatus, ImageSource, AgentLocation
+from .models import Project, ProjectImage, ImageStatus, ImageSource, AgentLocation, UploadSession
+from utils.refdata import reference_data
+from utils.renditions import prefers_webp, rendition_url
 
 
-class ImageStatusSerializer(serializers.ModelSerializer):
+class ReferenceLookupMixin:
+    """
+    Nested ma'lumotnoma serializer'i `source='<fk>_id'` bilan ishlatilsa, obyekt
+    reference registry'dan olinadi - har bir qator uchun so'rov yoki JOIN kerak emas.
+    """
+
+    def to_representation(self, instance):
+        if not isinstance(instance, self.Meta.model):
+            instance = reference_data.get(self.Meta.model, instance, include_deleted=True)
+            if instance is None:
+                return None
+        return super().to_representation(instance)
+
+
+class ImageStatusSerializer(ReferenceLookupMixin, serializers.ModelSerializer):
     """ImageStatus serializer"""
     class Meta:
         model = ImageStatus
@@ -15,7 +31,7 @@ class ImageStatusSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ImageSourceSerializer(serializers.ModelSerializer):
+class ImageSourceSerializer(ReferenceLookupMixin, serializers.ModelSerializer):
     """ImageSource serializer"""
     uploader_type_display = serializers.CharField(source='get_uploader_type_display', read_only=True)
     
@@ -65,7 +81,7 @@ class APINomenklaturaImageSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nomenklatura', 'project', 'code_1c', 'article_code', 'image', 'is_main', 'category', 'note',
             'status', 'source', 'created_at', 'updated_at', 'is_active', 'is_deleted',
-            'image_url', 'image_sm_url', 'image_md_url', 'image_lg_url', 'image_thumbnail_url'
+            'image_url', 'image_sm_url', 'image_md_url', 'image_lg_url', 'image_thumbnail_url', 'placeholder'
         ]
     
     @extend_schema_field(OpenApiTypes.URI)
@@ -79,38 +95,42 @@ class APINomenklaturaImageSerializer(serializers.ModelSerializer):
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_sm_url(self, obj) -> Optional[str]:
-        if obj.image_sm:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_sm', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_sm.url)
-            return obj.image_sm.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_md_url(self, obj) -> Optional[str]:
-        if obj.image_md:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_md', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_md.url)
-            return obj.image_md.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_lg_url(self, obj) -> Optional[str]:
-        if obj.image_lg:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_lg', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_lg.url)
-            return obj.image_lg.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_thumbnail_url(self, obj) -> Optional[str]:
-        if obj.image_thumbnail:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_thumbnail', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_thumbnail.url)
-            return obj.image_thumbnail.url
+                return request.build_absolute_uri(url)
+            return url
         return None
 
 
@@ -140,9 +160,9 @@ class ProjectImageSerializer(serializers.ModelSerializer):
     image_thumbnail_url = serializers.SerializerMethodField()
     project = ProjectNestedSerializer(read_only=True)
     code_1c = serializers.CharField(source='project.code_1c', read_only=True)
-    status = ImageStatusSerializer(read_only=True)
+    status = ImageStatusSerializer(source='status_id', read_only=True)
     status_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
-    source = ImageSourceSerializer(read_only=True)
+    source = ImageSourceSerializer(source='source_id', read_only=True)
     source_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     
     class Meta:
@@ -159,6 +179,7 @@ class ProjectImageSerializer(serializers.ModelSerializer):
             'image_md_url',
             'image_lg_url',
             'image_thumbnail_url',
+            'placeholder',
             'is_main',
             'status',
             'status_id',
@@ -166,7 +187,7 @@ class ProjectImageSerializer(serializers.ModelSerializer):
             'source_id',
             'created_at',
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'placeholder', 'created_at']
     
     def create(self, validated_data):
         """Create qilganda status_id va source_id ni to'g'ri ishlatish"""
@@ -176,16 +197,10 @@ class ProjectImageSerializer(serializers.ModelSerializer):
         instance = super().create(validated_data)
         
         if status_id:
-            try:
-                instance.status = ImageStatus.objects.get(id=status_id, is_deleted=False)
-            except ImageStatus.DoesNotExist:
-                pass
+            instance.status = reference_data.get(ImageStatus, status_id)
         
         if source_id:
-            try:
-                instance.source = ImageSource.objects.get(id=source_id, is_deleted=False)
-            except ImageSource.DoesNotExist:
-                pass
+            instance.source = reference_data.get(ImageSource, source_id)
         
         instance.save()
         return instance
@@ -201,38 +216,42 @@ class ProjectImageSerializer(serializers.ModelSerializer):
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_sm_url(self, obj) -> Optional[str]:
-        if obj.image_sm:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_sm', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_sm.url)
-            return obj.image_sm.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_md_url(self, obj) -> Optional[str]:
-        if obj.image_md:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_md', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_md.url)
-            return obj.image_md.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_lg_url(self, obj) -> Optional[str]:
-        if obj.image_lg:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_lg', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_lg.url)
-            return obj.image_lg.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_thumbnail_url(self, obj) -> Optional[str]:
-        if obj.image_thumbnail:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_thumbnail', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_thumbnail.url)
-            return obj.image_thumbnail.url
+                return request.build_absolute_uri(url)
+            return url
         return None
 
 
@@ -245,6 +264,7 @@ class ThumbnailEntrySerializer(serializers.Serializer):
     entity_name = serializers.CharField(help_text="Entity nomi")
     image_id = serializers.IntegerField(help_text="Image primary key ID si")
     thumbnail_url = serializers.URLField(allow_null=True, help_text="Thumbnail rasm URL i")
+    placeholder = serializers.CharField(allow_null=True, help_text="LQIP placeholder (base64 data URI), thumbnail yuklanguncha ko'rsatiladi")
     thumbnail_dimensions = serializers.DictField(allow_null=True, help_text="Thumbnail rasm o'lchamlari va hajmi (width, height, format, size)")
     original_dimensions = serializers.DictField(allow_null=True, help_text="Original rasm o'lchamlari va hajmi (width, height, format, size_bytes, size)")
     is_main = serializers.BooleanField(help_text="Asosiy rasm statusi")
@@ -262,7 +282,7 @@ class AgentLocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = AgentLocation
         fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'geohash', 'created_at', 'updated_at']
 
 
 
@@ -274,6 +294,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = Project
         fields = [
             'id', 'code_1c', 'name', 'title', 'description', 'is_active', 'is_deleted',
+            'normalize_uploads', 'upload_max_edge', 'upload_quality',
             'created_at', 'updated_at', 'images', 'is_integration'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -327,3 +348,49 @@ class ProjectImageBulkUploadSerializer(serializers.Serializer):
         max_length=255,
     )
 
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Chunked upload sessiyasi holati"""
+    offset = serializers.IntegerField(source='received_bytes', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'upload_id', 'target', 'target_id', 'filename', 'total_size', 'offset',
+            'status', 'result_id', 'expires_at', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Chunked upload sessiyasini ochish uchun schema."""
+
+    target = serializers.ChoiceField(
+        choices=UploadSession.TARGET_CHOICES,
+        help_text="Yakuniy rasm turi: client, nomenklatura yoki visit",
+    )
+    target_ref = serializers.CharField(
+        max_length=255,
+        help_text="client uchun `client_code_1c`, nomenklatura uchun `code_1c`, visit uchun `visit_id`",
+    )
+    project_id = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text="Loyiha ID si (kod dublikat bo'lgan holatlar uchun)",
+    )
+    filename = serializers.CharField(max_length=255, help_text="Asl fayl nomi (kengaytmasi bilan)")
+    total_size = serializers.IntegerField(min_value=1, help_text="Faylning to'liq hajmi (bayt)")
+    checksum = serializers.RegexField(
+        r'^[0-9a-fA-F]{64}$',
+        required=False,
+        allow_blank=True,
+        help_text="Optional: faylning SHA-256 xeshi, finalize'da tekshiriladi",
+    )
+    category = serializers.CharField(required=False, allow_blank=True, max_length=120)
+    note = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    image_type = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        max_length=50,
+        help_text="Tashrif rasmi turi (faqat visit uchun, default PRODUCT)",
+    )
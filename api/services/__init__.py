@@ -0,0 +1,4 @@
+from .activity import AgentActivityService
+from .spatial import SpatialQueryService
+from .heatmap import HeatmapService
+from .uploads import ChunkedUploadService, UploadSessionError
@@ -0,0 +1,189 @@
+"""
+Agent aktivligi uchun soatlik hisoblagichlar (AgentActivityHourly).
+
+Har bir lokatsiya yozuvi va check-in ingest vaqtida tegishli soatlik qatorga
+qo'shiladi, shuning uchun `regional_activity` xom pinglarni skan qilmaydi.
+`rebuild` esa eski ma'lumotlarni (yoki bulk_create orqali kelganlarni) qayta
+yig'ish uchun ishlatiladi.
+"""
+import datetime
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncHour
+from django.utils import timezone
+
+from api.models import AgentActivityHourly, AgentLocation, Project
+
+logger = logging.getLogger(__name__)
+
+
+class AgentActivityService:
+    @staticmethod
+    def truncate_to_hour(value):
+        """Vaqtni UTC bo'yicha soat boshiga qirqish"""
+        if value is None:
+            value = timezone.now()
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def day_bounds(date_from=None, date_to=None):
+        """Sana oralig'ini joriy timezone bo'yicha [start, end) datetime juftligiga aylantirish"""
+        start = end = None
+        if date_from:
+            start = timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min))
+        if date_to:
+            end = timezone.make_aware(
+                datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min)
+            )
+        return start, end
+
+    @classmethod
+    def _bump(cls, key, field, delta):
+        """Bitta hisoblagichni atomik tarzda oshirish/kamaytirish"""
+        qs = AgentActivityHourly.objects.filter(**key)
+        if delta < 0:
+            qs.update(**{field: Greatest(F(field) + delta, 0)})
+            return
+        if qs.update(**{field: F(field) + delta}):
+            return
+        try:
+            with transaction.atomic():
+                AgentActivityHourly.objects.create(**key, **{field: delta})
+        except IntegrityError:
+            # Parallel worker qatorni birinchi yaratdi
+            qs.update(**{field: F(field) + delta})
+
+    @staticmethod
+    def _location_key(location):
+        return {
+            'project_id': location.project_id,
+            'agent_code': location.agent_code,
+            'region': location.region or '',
+            'hour': AgentActivityService.truncate_to_hour(location.created_at),
+        }
+
+    @staticmethod
+    def resolve_api_project_id(auth_project):
+        """users.AuthProject -> api.Project (code_1c) mapping"""
+        if not auth_project or not auth_project.project_code:
+            return None
+        return Project.objects.filter(
+            code_1c__iexact=auth_project.project_code,
+            is_deleted=False,
+        ).values_list('id', flat=True).first()
+
+    @classmethod
+    def record_ping(cls, location):
+        if not location.agent_code:
+            return
+        cls._bump(cls._location_key(location), 'points_count', 1)
+
+    @classmethod
+    def remove_ping(cls, location):
+        if not location.agent_code:
+            return
+        cls._bump(cls._location_key(location), 'points_count', -1)
+
+    @classmethod
+    def record_visit(cls, visit):
+        """Check-in qilingan tashrifni agentning soatlik hisobiga qo'shish"""
+        if not visit.agent_code or not visit.actual_start_time:
+            return
+        key = {
+            'project_id': cls.resolve_api_project_id(visit.project),
+            'agent_code': visit.agent_code,
+            'region': '',
+            'hour': cls.truncate_to_hour(visit.actual_start_time),
+        }
+        cls._bump(key, 'visits_count', 1)
+
+    @classmethod
+    def rebuild(cls, date_from=None, date_to=None):
+        """
+        Berilgan sana oralig'i uchun hisoblagichlarni xom ma'lumotlardan qayta yaratish.
+        Qaytaradi: yaratilgan qatorlar soni.
+        """
+        from visits.models import Visit
+
+        start, end = cls.day_bounds(date_from, date_to)
+        utc = datetime.timezone.utc
+
+        counters = AgentActivityHourly.objects.all()
+        pings = AgentLocation.objects.filter(is_deleted=False).exclude(agent_code='')
+        visits = Visit.objects.filter(is_deleted=False, actual_start_time__isnull=False).exclude(agent_code='')
+        if start:
+            counters = counters.filter(hour__gte=start)
+            pings = pings.filter(created_at__gte=start)
+            visits = visits.filter(actual_start_time__gte=start)
+        if end:
+            counters = counters.filter(hour__lt=end)
+            pings = pings.filter(created_at__lt=end)
+            visits = visits.filter(actual_start_time__lt=end)
+
+        rows = {}
+        ping_stats = pings.annotate(
+            bucket=TruncHour('created_at', tzinfo=utc),
+        ).values('project_id', 'agent_code', 'region', 'bucket').annotate(total=Count('id')).order_by()
+        for item in ping_stats.iterator():
+            key = (item['project_id'], item['agent_code'], item['region'] or '', item['bucket'])
+            rows.setdefault(key, [0, 0])[0] += item['total']
+
+        project_ids = {
+            code.lower(): pk
+            for pk, code in Project.objects.filter(is_deleted=False).values_list('id', 'code_1c')
+        }
+        visit_stats = visits.annotate(
+            bucket=TruncHour('actual_start_time', tzinfo=utc),
+        ).values('project__project_code', 'agent_code', 'bucket').annotate(total=Count('visit_id')).order_by()
+        for item in visit_stats.iterator():
+            project_code = (item['project__project_code'] or '').lower()
+            key = (project_ids.get(project_code), item['agent_code'], '', item['bucket'])
+            rows.setdefault(key, [0, 0])[1] += item['total']
+
+        objs = [
+            AgentActivityHourly(
+                project_id=project_id,
+                agent_code=agent_code,
+                region=region,
+                hour=hour,
+                points_count=points,
+                visits_count=visit_count,
+            )
+            for (project_id, agent_code, region, hour), (points, visit_count) in rows.items()
+        ]
+        with transaction.atomic():
+            counters.delete()
+            AgentActivityHourly.objects.bulk_create(objs, batch_size=1000)
+        logger.info(f"AgentActivityHourly rebuilt: {len(objs)} rows ({date_from} - {date_to})")
+        return len(objs)
+
+    @classmethod
+    def summarize(cls, date_from=None, date_to=None, agent_code=None, project_id=None):
+        """Sana oralig'i bo'yicha regionlar va umumiy sonlarni rollup'lardan yig'ish"""
+        start, end = cls.day_bounds(date_from, date_to)
+        qs = AgentActivityHourly.objects.all()
+        if start:
+            qs = qs.filter(hour__gte=start)
+        if end:
+            qs = qs.filter(hour__lt=end)
+        if agent_code:
+            qs = qs.filter(agent_code=agent_code)
+        if project_id:
+            qs = qs.filter(project_id=project_id)
+
+        regions = list(
+            qs.filter(points_count__gt=0)
+            .values('region')
+            .annotate(points_count=Sum('points_count'))
+            .order_by('-points_count')
+        )
+        totals = qs.aggregate(total_points=Sum('points_count'), total_visits=Sum('visits_count'))
+        return {
+            'regions': regions,
+            'total_points': totals['total_points'] or 0,
+            'total_visits': totals['total_visits'] or 0,
+        }
@@ -0,0 +1,180 @@
+"""
+Agent lokatsiyalari zichligi (heatmap) uchun tile'lar.
+
+Har bir kun uchun koordinatalar NumPy `histogram2d` orqali global grid
+kataklariga binlanadi va (project, kun, zoom) kaliti bilan keshlanadi.
+O'tgan kunlar o'zgarmaydi, shuning uchun ular bir marta hisoblanadi.
+Kataklar soni `MAX_CELLS` dan oshsa (keng hudud + katta zoom) grid keshlashdan
+oldin ham, javobda ham kichikroq zoom'ga yiriklashtiriladi.
+"""
+import datetime
+import logging
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from api.models import AgentLocation
+from utils.cache import get_or_set, smart_cache_delete
+
+logger = logging.getLogger(__name__)
+
+
+class HeatmapService:
+    MIN_ZOOM = 1
+    MAX_ZOOM = 18
+    # Bitta slippy-map tile bo'yicha kataklar soni (64x64)
+    CELLS_PER_TILE = 64
+    # histogram2d uchun zich massivning maksimal hajmi; undan katta bo'lsa np.unique ishlatiladi
+    MAX_DENSE_BINS = 4_000_000
+    # Kunlik keshdagi va javobdagi kataklarning maksimal soni
+    MAX_CELLS = 20_000
+    MAX_DAYS = 92
+    HISTORY_TIMEOUT = 60 * 60 * 24 * 7
+    TODAY_TIMEOUT = 60
+    # v2: kunlik tile {'zoom', 'cells'} ko'rinishida (eski ro'yxat formatidagi kesh o'qilmaydi)
+    CACHE_PREFIX = 'agent_heatmap_v2'
+
+    @classmethod
+    def cell_size(cls, zoom):
+        """Zoom darajasidagi katak o'lchami (gradus)"""
+        return 360.0 / (2 ** zoom) / cls.CELLS_PER_TILE
+
+    @classmethod
+    def cache_key(cls, project_id, day, zoom):
+        return f"{cls.CACHE_PREFIX}:{project_id or 'all'}:{day.isoformat()}:{zoom}"
+
+    @staticmethod
+    def _day_range(day):
+        start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        return start, start + datetime.timedelta(days=1)
+
+    @classmethod
+    def _load_coordinates(cls, project_id, day):
+        """Kun bo'yicha koordinatalarni DB tomonda float'ga o'tkazib olish"""
+        start, end = cls._day_range(day)
+        qs = AgentLocation.objects.filter(is_deleted=False, created_at__gte=start, created_at__lt=end)
+        if project_id:
+            qs = qs.filter(project_id=project_id)
+        rows = qs.order_by().annotate(
+            lat_f=Cast('latitude', FloatField()),
+            lng_f=Cast('longitude', FloatField()),
+        ).values_list('lat_f', 'lng_f')
+        coords = np.array(list(rows), dtype=np.float64).reshape(-1, 2)
+        return coords[:, 0], coords[:, 1]
+
+    @classmethod
+    def bin_coordinates(cls, lats, lngs, zoom):
+        """
+        Koordinatalarni global grid kataklariga binlash.
+        Qaytaradi: [[ix, iy, count], ...] (faqat bo'sh bo'lmagan kataklar).
+        """
+        if lats.size == 0:
+            return []
+        size = cls.cell_size(zoom)
+        ix = np.floor((lngs + 180.0) / size).astype(np.int64)
+        iy = np.floor((lats + 90.0) / size).astype(np.int64)
+        ix_min, ix_max = int(ix.min()), int(ix.max())
+        iy_min, iy_max = int(iy.min()), int(iy.max())
+        nx = ix_max - ix_min + 1
+        ny = iy_max - iy_min + 1
+
+        if nx * ny <= cls.MAX_DENSE_BINS:
+            hist, _, _ = np.histogram2d(
+                ix, iy,
+                bins=(nx, ny),
+                range=((ix_min, ix_max + 1), (iy_min, iy_max + 1)),
+            )
+            xs, ys = np.nonzero(hist)
+            counts = hist[xs, ys].astype(np.int64)
+            xs = xs + ix_min
+            ys = ys + iy_min
+        else:
+            # Juda keng hudud + katta zoom: zich massiv o'rniga siyrak sanash
+            keys = (ix - ix_min) * ny + (iy - iy_min)
+            uniq, counts = np.unique(keys, return_counts=True)
+            xs = uniq // ny + ix_min
+            ys = uniq % ny + iy_min
+        return np.stack([xs, ys, counts], axis=1).tolist()
+
+    @staticmethod
+    def coarsen(cells, levels):
+        """Kataklarni `levels` zoom pastga yig'ish (har daraja 2x2 katakni bittaga)"""
+        if levels <= 0 or not cells:
+            return cells
+        arr = np.asarray(cells, dtype=np.int64).reshape(-1, 3)
+        uniq, inverse = np.unique(arr[:, :2] >> levels, axis=0, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=arr[:, 2]).astype(np.int64)
+        return np.column_stack([uniq, counts]).tolist()
+
+    @classmethod
+    def fit_cells(cls, cells, zoom):
+        """`MAX_CELLS` ga sig'guncha yiriklashtirish. Qaytaradi: (kataklar, zoom)"""
+        while len(cells) > cls.MAX_CELLS and zoom > cls.MIN_ZOOM:
+            cells = cls.coarsen(cells, 1)
+            zoom -= 1
+        return cells, zoom
+
+    @classmethod
+    def day_tile(cls, project_id, day, zoom):
+        """Bitta kun uchun binlangan kataklar (keshdan yoki hisoblab): {'zoom', 'cells'}"""
+        def _load():
+            lats, lngs = cls._load_coordinates(project_id, day)
+            cells, tile_zoom = cls.fit_cells(cls.bin_coordinates(lats, lngs, zoom), zoom)
+            return {'zoom': tile_zoom, 'cells': cells}
+
+        timeout = cls.TODAY_TIMEOUT if day >= timezone.localdate() else cls.HISTORY_TIMEOUT
+        return get_or_set(cls.cache_key(project_id, day, zoom), _load, timeout)
+
+    @classmethod
+    def build(cls, project_id, date_from, date_to, zoom, bbox=None):
+        """Sana oralig'idagi kunlik tile'larni yig'ib, heatmap javobini qaytarish"""
+        tiles = []
+        day = date_from
+        while day <= date_to:
+            tiles.append(cls.day_tile(project_id, day, zoom))
+            day += datetime.timedelta(days=1)
+        # Yiriklashtirilgan kunlar bo'lsa barcha kunlar eng kichik zoom'ga keltiriladi
+        cell_zoom = min(tile['zoom'] for tile in tiles)
+
+        totals = {}
+        for tile in tiles:
+            for ix, iy, count in cls.coarsen(tile['cells'], tile['zoom'] - cell_zoom):
+                totals[(ix, iy)] = totals.get((ix, iy), 0) + count
+
+        size = cls.cell_size(cell_zoom)
+        binned = []
+        for (ix, iy), count in totals.items():
+            if bbox:
+                lat = -90.0 + (iy + 0.5) * size
+                lng = -180.0 + (ix + 0.5) * size
+                if not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lng <= bbox[3]):
+                    continue
+            binned.append([ix, iy, count])
+        binned, cell_zoom = cls.fit_cells(binned, cell_zoom)
+
+        size = cls.cell_size(cell_zoom)
+        cells = [
+            [round(-90.0 + (iy + 0.5) * size, 6), round(-180.0 + (ix + 0.5) * size, 6), count]
+            for ix, iy, count in binned
+        ]
+        cells.sort(key=lambda cell: -cell[2])
+
+        return {
+            'zoom': zoom,
+            # MAX_CELLS sababli yiriklashtirilgan bo'lsa zoom'dan kichik
+            'cell_zoom': cell_zoom,
+            'cell_size_deg': size,
+            'period': {'from': date_from.isoformat(), 'to': date_to.isoformat()},
+            'total_points': sum(cell[2] for cell in cells),
+            'max_count': cells[0][2] if cells else 0,
+            'cells': cells,
+        }
+
+    @classmethod
+    def invalidate_day(cls, project_id, day):
+        """Kun tile'larini barcha zoom darajalari uchun keshdan o'chirish"""
+        for zoom in range(cls.MIN_ZOOM, cls.MAX_ZOOM + 1):
+            smart_cache_delete(cls.cache_key(project_id, day, zoom))
+            smart_cache_delete(cls.cache_key(None, day, zoom))
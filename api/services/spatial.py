@@ -0,0 +1,106 @@
+"""
+Geohash prefiks + NumPy haversine asosidagi hududiy qidiruv.
+
+Avval bbox'ni qoplovchi geohash kataklari bo'yicha indeksli `startswith`
+lookup bilan nomzodlar olinadi, so'ngra ular float massivlarda aniq
+masofa/bbox bo'yicha filtrlanadi.
+"""
+import operator
+from functools import reduce
+
+import numpy as np
+from django.db.models import Q
+
+from utils.geo import bbox_cover_cells, haversine_m, in_bbox_mask, radius_to_bbox
+
+
+class SpatialQueryService:
+    @staticmethod
+    def cell_filter(geohash_field, cells):
+        """Kataklar ro'yxatini OR qilingan `startswith` Q obyektiga aylantirish"""
+        return reduce(operator.or_, (Q(**{f'{geohash_field}__startswith': cell}) for cell in cells))
+
+    @classmethod
+    def search(cls, queryset, *, geohash_field, lat_field, lng_field, fields,
+               center=None, radius_m=None, bbox=None):
+        """
+        Hudud ichidagi yozuvlarni qaytaradi.
+
+        center + radius_m (metr) yoki bbox=(min_lat, min_lng, max_lat, max_lng) berilishi kerak.
+        Natija: `fields` qiymatlari + `distance_m` (faqat radius rejimida) bo'lgan dict'lar ro'yxati
+        va ishlatilgan kataklar.
+        """
+        if center is not None:
+            bbox = radius_to_bbox(center[0], center[1], radius_m)
+        cells = bbox_cover_cells(*bbox)
+        if not cells:
+            return [], cells
+
+        value_fields = list(dict.fromkeys([*fields, lat_field, lng_field]))
+        rows = list(queryset.filter(cls.cell_filter(geohash_field, cells)).values(*value_fields))
+        if not rows:
+            return [], cells
+
+        lats = np.fromiter((float(r[lat_field]) for r in rows), dtype=np.float64, count=len(rows))
+        lngs = np.fromiter((float(r[lng_field]) for r in rows), dtype=np.float64, count=len(rows))
+
+        if center is not None:
+            distances = haversine_m(center[0], center[1], lats, lngs)
+            mask = distances <= radius_m
+        else:
+            distances = None
+            mask = in_bbox_mask(lats, lngs, *bbox)
+
+        results = []
+        for idx in np.flatnonzero(mask):
+            row = rows[idx]
+            if distances is not None:
+                row['distance_m'] = round(float(distances[idx]), 1)
+            results.append(row)
+        if distances is not None:
+            results.sort(key=lambda r: r['distance_m'])
+        return results, cells
+
+    @classmethod
+    def nearby_agents(cls, locations, **kwargs):
+        """Hudud ichidagi pinglarni agent bo'yicha guruhlash"""
+        points, cells = cls.search(
+            locations,
+            geohash_field='geohash',
+            lat_field='latitude',
+            lng_field='longitude',
+            fields=['agent_code', 'agent_name', 'created_at'],
+            **kwargs,
+        )
+        agents = {}
+        for point in points:
+            agent = agents.get(point['agent_code'])
+            if agent is None:
+                agent = agents[point['agent_code']] = {
+                    'agent_code': point['agent_code'],
+                    'agent_name': point['agent_name'],
+                    'points_count': 0,
+                    'min_distance_m': point.get('distance_m'),
+                    'first_seen': point['created_at'],
+                    'last_seen': point['created_at'],
+                }
+            agent['points_count'] += 1
+            agent['first_seen'] = min(agent['first_seen'], point['created_at'])
+            agent['last_seen'] = max(agent['last_seen'], point['created_at'])
+        return list(agents.values()), len(points), cells
+
+    @classmethod
+    def nearby_visits(cls, visits, **kwargs):
+        """Check-in koordinatasi hudud ichida bo'lgan tashriflar"""
+        rows, _ = cls.search(
+            visits.filter(check_in_latitude__isnull=False, check_in_longitude__isnull=False),
+            geohash_field='check_in_geohash',
+            lat_field='check_in_latitude',
+            lng_field='check_in_longitude',
+            fields=['visit_id', 'agent_code', 'agent_name', 'client_code', 'client_name', 'actual_start_time'],
+            **kwargs,
+        )
+        for row in rows:
+            row['latitude'] = float(row.pop('check_in_latitude'))
+            row['longitude'] = float(row.pop('check_in_longitude'))
+        return rows
@@ -0,0 +1,340 @@
+"""
+Bo'laklab (chunked) va davom ettiriladigan rasm yuklash.
+
+Protokol:
+    1. `create_session` - sessiya ochiladi, bo'sh vaqtinchalik fayl yaratiladi;
+    2. `write_chunk` - `Content-Range: bytes start-end/total` bo'yicha baytlar
+       yoziladi (faqat joriy offset'dan yoki undan oldin boshlanadigan bo'lak);
+    3. uzilishdan keyin klient offset'ni so'raydi va faqat yetishmagan baytlarni yuboradi;
+    4. `finalize` - fayl bulk upload pipeline'idan o'tib ClientImage,
+       NomenklaturaImage yoki VisitImage'ga aylanadi.
+Muddati o'tgan sessiyalar va ularning fayllari `cleanup_expired` bilan tozalanadi.
+"""
+import datetime
+import logging
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import UploadSession
+from client.models import Client, ClientImage
+from nomenklatura.models import Nomenklatura, NomenklaturaImage
+from utils.cache import entity_tags
+from utils.renditions import rendition_url
+from utils.scope import get_principal_scope
+from utils.storage import compute_sha256
+from utils.uploads import BulkImageUploader
+from visits.models import Visit, VisitImage
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+COPY_BUFFER_SIZE = 64 * 1024
+PART_SUFFIX = '.part'
+
+
+class UploadSessionError(Exception):
+    """Sessiya xatosi: HTTP status va (bo'lsa) joriy offset bilan"""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.offset = offset
+
+
+class ChunkedUploadService:
+    @staticmethod
+    def temp_path(session):
+        return os.path.join(settings.UPLOAD_SESSION_ROOT, f'{session.upload_id}{PART_SUFFIX}')
+
+    @classmethod
+    def _remove_temp(cls, session):
+        try:
+            os.remove(cls.temp_path(session))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def resolve_target(target, target_ref, user, project_id=None):
+        """
+        Yakuniy obyektni topish va uning PK'sini qaytarish.
+        Superuser bo'lmasa faqat o'z project'idagi obyektlarga yuklash mumkin.
+        """
+        scope = None if user.is_superuser else get_principal_scope(user)
+
+        def _limit(qs, scope_project_id):
+            # ProjectScopedMixin kabi: scope'i (project'i) yo'q foydalanuvchi hech narsa ko'rmaydi
+            if user.is_superuser:
+                return qs
+            return qs.filter(project_id=scope_project_id) if scope_project_id else qs.none()
+
+        if target == UploadSession.TARGET_CLIENT:
+            qs = _limit(
+                Client.objects.filter(client_code_1c=target_ref, is_deleted=False),
+                scope.project_id if scope else None,
+            )
+            if project_id:
+                qs = qs.filter(project_id=project_id)
+            pk = qs.order_by('pk').values_list('pk', flat=True).first()
+            if pk is None:
+                raise UploadSessionError('Client topilmadi', status_code=404)
+            return str(pk)
+
+        if target == UploadSession.TARGET_NOMENKLATURA:
+            qs = _limit(
+                Nomenklatura.objects.filter(code_1c=target_ref, is_deleted=False),
+                scope.project_id if scope else None,
+            )
+            if project_id:
+                qs = qs.filter(project_id=project_id)
+            pks = list(qs.values_list('pk', flat=True)[:2])
+            if not pks:
+                raise UploadSessionError('Nomenklatura topilmadi', status_code=404)
+            if len(pks) > 1:
+                raise UploadSessionError('Ushbu kod bir nechta loyihada mavjud. Iltimos, project_id ni yuboring.')
+            return str(pks[0])
+
+        qs = _limit(Visit.objects.filter(is_deleted=False), scope.auth_project_id if scope else None)
+        try:
+            visit = qs.filter(visit_id=target_ref).only('visit_id', 'client_id').first()
+        except Exception:  # noqa: BLE001 - noto'g'ri UUID
+            visit = None
+        if visit is None:
+            raise UploadSessionError('Tashrif topilmadi', status_code=404)
+        if not visit.client_id:
+            raise UploadSessionError('Tashrifga mijoz biriktirilmagan')
+        return str(visit.pk)
+
+    @classmethod
+    def create_session(cls, user, *, target, target_ref, filename, total_size, project_id=None,
+                       checksum='', category='', note='', image_type=''):
+        max_size = settings.UPLOAD_SESSION_MAX_SIZE
+        if total_size > max_size:
+            raise UploadSessionError(f'Fayl hajmi {max_size} baytdan oshmasligi kerak', status_code=413)
+
+        target_id = cls.resolve_target(target, target_ref, user, project_id)
+        session = UploadSession.objects.create(
+            user=user if user.is_authenticated else None,
+            target=target,
+            target_id=target_id,
+            filename=os.path.basename(filename),
+            total_size=total_size,
+            checksum=(checksum or '').lower(),
+            category=category or '',
+            note=note or '',
+            image_type=image_type or '',
+            expires_at=timezone.now() + datetime.timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS),
+        )
+        os.makedirs(settings.UPLOAD_SESSION_ROOT, exist_ok=True)
+        open(cls.temp_path(session), 'wb').close()
+        return session
+
+    @staticmethod
+    def parse_content_range(header, total_size):
+        """`bytes start-end/total` -> (start, length)"""
+        match = CONTENT_RANGE_RE.match((header or '').strip())
+        if not match:
+            raise UploadSessionError("Content-Range sarlavhasi noto'g'ri (bytes start-end/total)")
+        start, end, total = match.groups()
+        start, end = int(start), int(end)
+        if end < start or (total != '*' and int(total) != total_size) or end >= total_size:
+            raise UploadSessionError("Content-Range qiymati sessiya hajmiga mos emas", status_code=416)
+        return start, end - start + 1
+
+    @staticmethod
+    def _check_pending(session):
+        if session.status != UploadSession.STATUS_PENDING:
+            raise UploadSessionError('Sessiya yakunlangan yoki bekor qilingan', status_code=409)
+        if session.expires_at <= timezone.now():
+            raise UploadSessionError('Sessiya muddati tugagan', status_code=410)
+
+    @classmethod
+    def write_chunk(cls, session, start, length, stream):
+        """
+        Bo'lakni `start` pozitsiyasiga yozish. Bo'lak joriy offset'dan keyin boshlansa 409.
+        Tarmoqdan o'qish tranzaksiyadan tashqarida bajariladi - sessiya qatori faqat
+        offset'ni qayta tekshirib oshirish uchun qisqa vaqtga qulflanadi.
+        Ulanish uzilsa yozilgan qism saqlanadi va klient yangi offset'dan davom etadi.
+        """
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            raise UploadSessionError(
+                f'Bo\'lak hajmi {settings.UPLOAD_CHUNK_MAX_SIZE} baytdan oshmasligi kerak', status_code=413
+            )
+        current = UploadSession.objects.get(pk=session.pk)
+        cls._check_pending(current)
+        if start > current.received_bytes:
+            raise UploadSessionError(
+                "Bo'lak joriy offset'dan keyin boshlanmoqda", status_code=409, offset=current.received_bytes
+            )
+
+        written = 0
+        try:
+            with open(cls.temp_path(current), 'r+b') as fh:
+                fh.seek(start)
+                while written < length:
+                    data = stream.read(min(COPY_BUFFER_SIZE, length - written)) if stream else b''
+                    if not data:
+                        break
+                    fh.write(data)
+                    written += len(data)
+        except FileNotFoundError:
+            raise UploadSessionError('Sessiya yakunlangan yoki bekor qilingan', status_code=409)
+
+        with transaction.atomic():
+            locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+            cls._check_pending(locked)
+            # Parallel so'rov offset'ni qaytargan bo'lishi mumkin (checksum xatosi) -
+            # bo'lak qabul qilingan baytlarga tutashmasa offset oshirilmaydi
+            if start > locked.received_bytes:
+                raise UploadSessionError(
+                    "Bo'lak joriy offset'dan keyin boshlanmoqda", status_code=409, offset=locked.received_bytes
+                )
+            # start <= offset: takror yuborilgan baytlar tarkibi bir xil, offset faqat oshadi
+            locked.received_bytes = max(locked.received_bytes, start + written)
+            locked.save(update_fields=['received_bytes', 'updated_at'])
+
+        if written < length:
+            raise UploadSessionError("Bo'lak to'liq qabul qilinmadi", offset=locked.received_bytes)
+        return locked
+
+    @staticmethod
+    def _build_uploader(session):
+        if session.target == UploadSession.TARGET_CLIENT:
+            client_id = int(session.target_id)
+            project_id = Client.objects.filter(pk=client_id).values_list('project_id', flat=True).first()
+            return BulkImageUploader(
+                ClientImage,
+                {'client_id': client_id, 'category': session.category, 'note': session.note},
+                cache_tags=entity_tags('client_image', project_id),
+            )
+        if session.target == UploadSession.TARGET_NOMENKLATURA:
+            nomenklatura_id = int(session.target_id)
+            project_id = Nomenklatura.objects.filter(pk=nomenklatura_id).values_list('project_id', flat=True).first()
+            return BulkImageUploader(
+                NomenklaturaImage,
+                {
+                    'nomenklatura_id': nomenklatura_id,
+                    'category': session.category,
+                    'note': session.note,
+                },
+                cache_tags=entity_tags('nomenklatura_image', project_id),
+            )
+        visit = Visit.objects.select_related('client').only('visit_id', 'client__project_id').get(pk=session.target_id)
+        return BulkImageUploader(
+            ClientImage,
+            {'client_id': visit.client_id, 'category': session.category or 'visit', 'note': session.note},
+            cache_tags=entity_tags('client_image', visit.client.project_id if visit.client_id else None),
+        )
+
+    @classmethod
+    def _verify_checksum(cls, session):
+        """Klient yuborgan SHA-256 mos kelmasa fayl tozalanadi va offset 0 ga qaytariladi"""
+        if not session.checksum or session.received_bytes < session.total_size:
+            return
+        path = cls.temp_path(session)
+        with open(path, 'rb') as fh:
+            digest = compute_sha256(fh)
+        if digest == session.checksum:
+            return
+        open(path, 'wb').close()
+        UploadSession.objects.filter(pk=session.pk).update(received_bytes=0, updated_at=timezone.now())
+        raise UploadSessionError('SHA-256 mos kelmadi, fayl qaytadan yuborilishi kerak', offset=0)
+
+    @classmethod
+    def finalize(cls, session, request=None):
+        """
+        To'liq qabul qilingan faylni rasm yozuviga aylantirish.
+        Qaytaradi: yaratilgan ClientImage, NomenklaturaImage yoki VisitImage.
+        """
+        cls._verify_checksum(session)
+        with transaction.atomic():
+            locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+            cls._check_pending(locked)
+            if locked.received_bytes < locked.total_size:
+                raise UploadSessionError('Fayl hali to\'liq yuklanmagan', status_code=409, offset=locked.received_bytes)
+
+            with open(cls.temp_path(locked), 'rb') as fh:
+                created, errors = cls._build_uploader(locked).upload([File(fh, name=locked.filename)])
+            if errors:
+                raise UploadSessionError(errors[0]['error'])
+
+            result = created[0]
+            if locked.target == UploadSession.TARGET_VISIT:
+                image_url = result.image.url
+                thumbnail_url = rendition_url(result, 'image_thumbnail')
+                if request is not None:
+                    image_url = request.build_absolute_uri(image_url)
+                    thumbnail_url = request.build_absolute_uri(thumbnail_url)
+                result = VisitImage.objects.create(
+                    visit_id=locked.target_id,
+                    image_type=locked.image_type or 'PRODUCT',
+                    image_url=image_url,
+                    thumbnail_url=thumbnail_url,
+                    client_image_id=result.pk,
+                    notes=locked.note,
+                )
+
+            locked.status = UploadSession.STATUS_COMPLETED
+            locked.result_id = str(result.pk)
+            locked.save(update_fields=['status', 'result_id', 'updated_at'])
+            transaction.on_commit(lambda: cls._remove_temp(locked))
+        return locked, result
+
+    @staticmethod
+    def refresh_visit_thumbnails(client_image):
+        """
+        Finalize paytida rendition'lar hali tayyor bo'lmasa VisitImage'ga original
+        URL yoziladi - tayyor bo'lgach thumbnail URL'i (image_url bilan bir xil origin) yangilanadi.
+        """
+        original = client_image.image.url
+        thumbnail = rendition_url(client_image, 'image_thumbnail')
+        for visit_image in VisitImage.objects.filter(client_image_id=client_image.pk).only('image_id', 'image_url'):
+            origin = visit_image.image_url[:-len(original)] if visit_image.image_url.endswith(original) else ''
+            VisitImage.objects.filter(pk=visit_image.pk).update(thumbnail_url=f'{origin}{thumbnail}')
+
+    @classmethod
+    def abort(cls, session):
+        session.status = UploadSession.STATUS_ABORTED
+        session.save(update_fields=['status', 'updated_at'])
+        cls._remove_temp(session)
+
+    @classmethod
+    def cleanup_expired(cls, now=None):
+        """
+        Muddati o'tgan sessiyalarni va ularning vaqtinchalik fayllarini o'chirish,
+        hamda DB'da sessiyasi yo'q eski `.part` fayllarni tozalash.
+        Qaytaradi: (o'chirilgan sessiyalar, bo'shatilgan baytlar).
+        """
+        now = now or timezone.now()
+        freed = 0
+        expired = UploadSession.objects.filter(expires_at__lte=now)
+        for session in expired.iterator():
+            path = cls.temp_path(session)
+            if os.path.exists(path):
+                freed += os.path.getsize(path)
+                cls._remove_temp(session)
+        deleted, _ = expired.delete()
+
+        root = settings.UPLOAD_SESSION_ROOT
+        if os.path.isdir(root):
+            cutoff = time.time() - settings.UPLOAD_SESSION_TTL_HOURS * 3600
+            known = {
+                f'{upload_id}{PART_SUFFIX}'
+                for upload_id in UploadSession.objects.values_list('upload_id', flat=True)
+            }
+            for entry in os.scandir(root):
+                if not entry.name.endswith(PART_SUFFIX) or entry.name in known:
+                    continue
+                if entry.stat().st_mtime < cutoff:
+                    freed += entry.stat().st_size
+                    os.remove(entry.path)
+
+        if deleted:
+            logger.info(f"Upload sessions cleaned: {deleted} sessions, {freed} bytes")
+        return deleted, freed
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from client.models import ClientImage
+from nomenklatura.models import NomenklaturaImage
+from utils.cache import cache_tag, invalidate_entity, invalidate_tags
+from utils.refdata import reference_data
+from utils.renditions import renditions_ready
+from utils.scope import invalidate_all_principal_scopes
+
+from .models import AgentLocation, ImageSource, ImageStatus, Project, ProjectImage
+from .services import AgentActivityService, ChunkedUploadService
+
+
+@receiver(post_save, sender=AgentLocation)
+def record_agent_location_activity(sender, instance, created, **kwargs):
+    """Yangi lokatsiya yozuvini soatlik aktivlik hisobiga qo'shish"""
+    if created and not instance.is_deleted:
+        AgentActivityService.record_ping(instance)
+
+
+@receiver([post_save, post_delete], sender=ImageStatus)
+@receiver([post_save, post_delete], sender=ImageSource)
+def invalidate_image_references(sender, using=None, **kwargs):
+    """Ma'lumotnoma o'zgarsa reference registry versiyasini va feed kesh tegini yangilash"""
+    reference_data.invalidate(sender, using=using)
+    tag = cache_tag('image_status' if sender is ImageStatus else 'image_source')
+    transaction.on_commit(lambda: invalidate_tags(tag), using=using)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_scopes(sender, using=None, **kwargs):
+    """code_1c yoki is_deleted o'zgarsa AuthProject -> api.Project xaritasi ham o'zgaradi"""
+    invalidate_all_principal_scopes(using=using)
+
+
+@receiver(renditions_ready, sender=ClientImage)
+def refresh_visit_image_thumbnails(sender, instance, **kwargs):
+    """Chunked upload orqali yaratilgan VisitImage'larning thumbnail URL'ini yangilash"""
+    ChunkedUploadService.refresh_visit_thumbnails(instance)
+
+
+# Rendition tayyor bo'lgach feed'dagi thumbnail URL (original -> rendition) o'zgaradi
+RENDITION_FEED_ENTITIES = {
+    ProjectImage: ('project_image', lambda image: image.project_id),
+    ClientImage: ('client_image', lambda image: image.client.project_id),
+    NomenklaturaImage: ('nomenklatura_image', lambda image: image.nomenklatura.project_id),
+}
+
+
+@receiver(renditions_ready)
+def invalidate_feed_on_renditions_ready(sender, instance, **kwargs):
+    """`renditions_ready` yozilgach tegishli feed kesh teglarini yangilash"""
+    entry = RENDITION_FEED_ENTITIES.get(sender)
+    if entry is None:
+        return
+    entity, get_project_id = entry
+    project_id = get_project_id(instance)
+    transaction.on_commit(lambda: invalidate_entity(entity, project_id))
@@ -1,9 +1,18 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Project, ProjectImage
+from .models import AgentActivityHourly, AgentLocation, Project, ProjectImage
+from .services import AgentActivityService, HeatmapService
+from django.utils import timezone
+from utils.cache import build_cache_key, get_or_build, smart_cache_get
+from utils.geo import geohash_encode
+from utils.renditions import generate_renditions
+from .serializers import ProjectImageSerializer
+from nomenklatura.models import Nomenklatura, NomenklaturaImage
+import os
 import tempfile
+import time
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 class ProjectAPITestCase(TestCase):
@@ -81,3 +90,1053 @@ class ProjectAPITestCase(TestCase):
         response = self.client.get('/api/v1/project/?search=Test')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
+
+
+class AgentActivityTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(
+            username='admin',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _ping(self, region):
+        return AgentLocation.objects.create(
+            agent_code='AG001', region=region, latitude='41.311081', longitude='69.240562'
+        )
+
+    def test_regional_activity_uses_hourly_counters(self):
+        """Test regional-activity soatlik agregatlardan yig'iladi"""
+        self._ping('Toshkent')
+        self._ping('Toshkent')
+        self._ping('Samarqand')
+        self.assertEqual(AgentActivityHourly.objects.count(), 2)
+
+        response = self.client.get('/api/v1/agent-location/regional-activity/?agent_code=AG001')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_points'], 3)
+        self.assertEqual(response.data['regions'][0], {'region': 'Toshkent', 'points_count': 2})
+
+    def test_counters_without_project_are_unique(self):
+        """Test project'siz soatlik qator ham bitta (NULL project takror yaratilmaydi)"""
+        from django.db import IntegrityError, transaction
+        self._ping('Toshkent')
+        counter = AgentActivityHourly.objects.get()
+        self.assertIsNone(counter.project_id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AgentActivityHourly.objects.create(
+                agent_code=counter.agent_code, region=counter.region, hour=counter.hour, points_count=1,
+            )
+
+    def test_rebuild_matches_ingest(self):
+        """Test rebuild ingest natijasi bilan bir xil"""
+        self._ping('Toshkent')
+        location = self._ping('Toshkent')
+        response = self.client.delete(f'/api/v1/agent-location/{location.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(AgentActivityHourly.objects.get().points_count, 1)
+
+        AgentActivityHourly.objects.all().delete()
+        AgentActivityService.rebuild()
+        self.assertEqual(AgentActivityHourly.objects.get().points_count, 1)
+
+    def test_regional_activity_invalid_date(self):
+        response = self.client.get('/api/v1/agent-location/regional-activity/?date_from=2025-13-01')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/agent-location/regional-activity/?project_id=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AgentNearbyTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(
+            username='admin',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_geohash_computed_on_save(self):
+        """Test geohash insert vaqtida hisoblanadi"""
+        location = AgentLocation.objects.create(agent_code='AG001', latitude='41.311081', longitude='69.240562')
+        self.assertEqual(location.geohash, geohash_encode(41.311081, 69.240562))
+
+    def test_nearby_radius(self):
+        """Test radius ichidagi agentlar qaytariladi"""
+        AgentLocation.objects.create(agent_code='AG001', latitude='41.311081', longitude='69.240562')
+        AgentLocation.objects.create(agent_code='AG002', latitude='41.313000', longitude='69.241000')  # ~215m
+        AgentLocation.objects.create(agent_code='AG003', latitude='41.330000', longitude='69.240562')  # ~2.1km
+
+        response = self.client.get('/api/v1/agent-location/nearby/?lat=41.311081&lng=69.240562&radius=500')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        codes = [agent['agent_code'] for agent in response.data['agents']]
+        self.assertEqual(codes, ['AG001', 'AG002'])
+
+        response = self.client.get('/api/v1/agent-location/nearby/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_heatmap_bins_and_caches_day(self):
+        """Test heatmap kataklari va kunlik kesh"""
+        AgentLocation.objects.create(agent_code='AG001', latitude='41.311081', longitude='69.240562')
+        AgentLocation.objects.create(agent_code='AG002', latitude='41.311090', longitude='69.240570')
+        AgentLocation.objects.create(agent_code='AG003', latitude='40.100000', longitude='67.800000')
+
+        response = self.client.get('/api/v1/agent-location/heatmap/?zoom=12')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_points'], 3)
+        self.assertEqual(response.data['max_count'], 2)
+        self.assertEqual(len(response.data['cells']), 2)
+
+        key = HeatmapService.cache_key(None, timezone.localdate(), 12)
+        self.assertIsNotNone(smart_cache_get(key))
+
+        self.assertEqual(smart_cache_get(key)['zoom'], 12)
+
+        response = self.client.get('/api/v1/agent-location/heatmap/?zoom=30')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/agent-location/heatmap/?project_id=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    def test_heatmap_coarsens_cells_over_limit(self):
+        """Test kataklar chegaradan oshsa kichikroq zoom'ga yiriklashtiriladi (kesh ham)"""
+        from unittest import mock
+        from django.core.cache import cache, caches
+        from utils.cache import local_cache
+        cache.clear()
+        caches['fallback'].clear()
+        local_cache.clear()
+        AgentLocation.objects.create(agent_code='AG001', latitude='41.311081', longitude='69.240562')
+        AgentLocation.objects.create(agent_code='AG002', latitude='41.400000', longitude='69.300000')
+        AgentLocation.objects.create(agent_code='AG003', latitude='40.100000', longitude='67.800000')
+
+        with mock.patch.object(HeatmapService, 'MAX_CELLS', 2):
+            response = self.client.get('/api/v1/agent-location/heatmap/?zoom=12')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(response.data['cells']), 2)
+        self.assertLess(response.data['cell_zoom'], 12)
+        self.assertEqual(response.data['total_points'], 3)
+        self.assertEqual(response.data['cell_size_deg'], HeatmapService.cell_size(response.data['cell_zoom']))
+        tile = smart_cache_get(HeatmapService.cache_key(None, timezone.localdate(), 12))
+        self.assertLessEqual(len(tile['cells']), 2)
+
+
+def make_test_image(name='test.png', size=(640, 480), image_format='PNG'):
+    """Xotirada test rasm yaratish"""
+    from io import BytesIO
+    from PIL import Image as PILImage
+
+    buffer = BytesIO()
+    PILImage.new('RGB', size, color=(200, 50, 50)).save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_RENDITIONS_ASYNC=False)
+class ProjectImageMetadataTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+
+    def test_metadata_persisted_on_upload(self):
+        """Test rasm metama'lumotlari yuklashda saqlanadi"""
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProjectImage.objects.create(project=self.project, image=make_test_image())
+        image.refresh_from_db()
+        self.assertTrue(image.renditions_ready)
+        self.assertEqual((image.width, image.height, image.format), (640, 480, 'PNG'))
+        self.assertGreater(image.size_bytes, 0)
+        self.assertEqual((image.thumbnail_width, image.thumbnail_height), (150, 150))
+        self.assertGreater(image.thumbnail_size_bytes, 0)
+
+    def test_feed_reads_metadata_from_db(self):
+        """Test feed o'lchamlarni DB'dan oladi"""
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectImage.objects.create(project=self.project, image=make_test_image())
+        response = self.client.get('/api/v1/thumbnails/projects/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        entry = response.data[0] if isinstance(response.data, list) else response.data['results'][0]
+        self.assertEqual(entry['original_dimensions']['width'], 640)
+        self.assertEqual(entry['thumbnail_dimensions']['height'], 150)
+        self.assertTrue(entry['placeholder'].startswith('data:image/jpeg;base64,'))
+        self.assertLess(len(entry['placeholder']), 2048)
+        self.assertTrue(entry['thumbnail_url'].startswith('http://testserver/media/'))
+
+    def test_feed_cache_invalidated_when_renditions_ready(self):
+        """Test rendition tayyor bo'lgach keshlangan feed thumbnail URL'ini yangilaydi"""
+        from django.core.cache import cache
+        from utils.cache import local_cache
+        cache.clear()
+        local_cache.clear()
+        image = ProjectImage.objects.create(project=self.project, image=make_test_image())
+        response = self.client.get('/api/v1/thumbnails/projects/')
+        entries = response.data if isinstance(response.data, list) else response.data['results']
+        self.assertTrue(entries[0]['thumbnail_url'].endswith(image.image.url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_renditions(image)
+        response = self.client.get('/api/v1/thumbnails/projects/')
+        entries = response.data if isinstance(response.data, list) else response.data['results']
+        self.assertFalse(entries[0]['thumbnail_url'].endswith(image.image.url))
+
+    def test_feed_cache_invalidated_on_image_delete(self):
+        """Test rasm API orqali o'chirilsa keshlangan feed yangilanadi"""
+        from django.core.cache import cache
+        from utils.cache import local_cache
+        cache.clear()
+        local_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProjectImage.objects.create(project=self.project, image=make_test_image())
+        # Kesh scope'i bir xil bo'lishi uchun ikkala so'rov ham bitta foydalanuvchidan
+        self.client.force_authenticate(User.objects.create_user(username='editor', password='pass', is_staff=True))
+        response = self.client.get('/api/v1/thumbnails/projects/')
+        entries = response.data if isinstance(response.data, list) else response.data['results']
+        self.assertEqual(len(entries), 1)
+
+        response = self.client.delete(f'/api/v1/project-image/{image.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get('/api/v1/thumbnails/projects/')
+        entries = response.data if isinstance(response.data, list) else response.data['results']
+        self.assertEqual(entries, [])
+
+    def test_original_url_until_renditions_ready(self):
+        """Test rendition tayyor bo'lmaguncha original URL qaytariladi"""
+        image = ProjectImage.objects.create(project=self.project, image=make_test_image())
+        self.assertFalse(image.renditions_ready)
+        data = ProjectImageSerializer(image).data
+        self.assertEqual(data['image_thumbnail_url'], image.image.url)
+        self.assertIsNone(data['placeholder'])
+
+        generate_renditions(image)
+        image.refresh_from_db()
+        data = ProjectImageSerializer(image).data
+        self.assertNotEqual(data['image_thumbnail_url'], image.image.url)
+        self.assertTrue(data['image_sm_url'].endswith('.jpg'))
+
+    def test_identical_uploads_share_blob(self):
+        """Test bir xil tarkibli rasmlar bitta blob'ga yoziladi va rendition qayta yaratilmaydi"""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = ProjectImage.objects.create(project=self.project, image=make_test_image('a.png'))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            second = ProjectImage.objects.create(project=self.project, image=make_test_image('b.png'))
+        self.assertEqual(callbacks, [])
+        self.assertTrue(first.image.name.startswith('blobs/'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertTrue(second.renditions_ready)
+        self.assertEqual(second.thumbnail_size_bytes, ProjectImage.objects.get(pk=first.pk).thumbnail_size_bytes)
+
+    def test_project_upload_policy_normalizes_original(self):
+        """Test project siyosati yoqilgan bo'lsa original kichraytirilib JPEG'ga siqiladi"""
+        self.project.normalize_uploads = True
+        self.project.upload_max_edge = 320
+        self.project.save()
+        image = ProjectImage.objects.create(project=self.project, image=make_test_image('big.png'))
+        self.assertTrue(image.is_normalized)
+        self.assertEqual((image.width, image.height, image.format), (320, 240, 'JPEG'))
+        self.assertTrue(image.image.name.endswith('.jpg'))
+
+    def test_normalize_originals_backfill(self):
+        """Test backfill buyrug'i mavjud originallarni siyosat bo'yicha qayta ishlaydi"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProjectImage.objects.create(project=self.project, image=make_test_image(size=(1600, 1200)))
+        Project.objects.filter(pk=self.project.pk).update(normalize_uploads=True, upload_max_edge=800)
+
+        call_command('normalize_originals', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertTrue(image.is_normalized)
+        self.assertEqual((image.width, image.height), (800, 600))
+        self.assertTrue(image.renditions_ready)
+
+    def test_normalize_originals_strips_gps_without_size_gain(self):
+        """Test hajm kamaymasa ham EXIF/GPS'li original tozalanadi"""
+        from io import BytesIO, StringIO
+        from django.core.management import call_command
+        from PIL import Image as PILImage
+
+        exif = PILImage.Exif()
+        exif[0x8825] = {1: 'N', 2: (41.0, 18.0, 0.0)}  # GPSInfo
+        buffer = BytesIO()
+        # Shovqinli rasm: past sifatli JPEG'ni 95 sifatda qayta kodlash faylni kattalashtiradi
+        noise = PILImage.frombytes('RGB', (256, 256), os.urandom(256 * 256 * 3))
+        noise.save(buffer, format='JPEG', quality=10, exif=exif)
+        image = ProjectImage.objects.create(
+            project=self.project, image=SimpleUploadedFile('gps.jpg', buffer.getvalue(), content_type='image/jpeg'),
+        )
+        Project.objects.filter(pk=self.project.pk).update(normalize_uploads=True, upload_quality=95)
+
+        call_command('normalize_originals', '--skip-renditions', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertTrue(image.is_normalized)
+        with image.image.open('rb') as fh, PILImage.open(fh) as stored:
+            self.assertFalse(stored.getexif())
+
+    def test_webp_url_when_client_accepts_webp(self):
+        """Test Accept: image/webp bo'lsa WebP rendition qaytariladi"""
+        from rest_framework.test import APIRequestFactory
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProjectImage.objects.create(project=self.project, image=make_test_image())
+        image.refresh_from_db()
+
+        request = APIRequestFactory().get('/', HTTP_ACCEPT='image/webp,image/*')
+        data = ProjectImageSerializer(image, context={'request': request}).data
+        self.assertTrue(data['image_thumbnail_url'].endswith('.webp'))
+
+        request = APIRequestFactory().get('/')
+        data = ProjectImageSerializer(image, context={'request': request}).data
+        self.assertTrue(data['image_thumbnail_url'].endswith('.jpg'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_RENDITIONS_ASYNC=False)
+class BulkImageUploadTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='uploader', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+
+    def test_bulk_upload_normalizes_exif(self):
+        """Test bulk upload EXIF orientatsiyasini qo'llaydi va metama'lumotni olib tashlaydi"""
+        from io import BytesIO
+        from PIL import Image as PILImage
+
+        exif = PILImage.Exif()
+        exif[0x0112] = 6  # 90 gradusga burilgan
+        buffer = BytesIO()
+        PILImage.new('RGB', (400, 200)).save(buffer, format='JPEG', exif=exif)
+        rotated = SimpleUploadedFile('rotated.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/project-image/bulk-upload/', {
+                'project': 'PROJ001',
+                'images': [rotated, make_test_image()],
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['images']), 2)
+
+        image = ProjectImage.objects.get(image__endswith='.jpg')
+        self.assertEqual((image.width, image.height), (200, 400))
+        self.assertTrue(image.renditions_ready)
+        with image.image.open('rb') as fh, PILImage.open(fh) as img:
+            self.assertFalse(img.getexif())
+
+    def test_bulk_upload_rejects_invalid_file(self):
+        """Test yaroqsiz fayl bo'lsa hech bir rasm yozilmaydi"""
+        broken = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        response = self.client.post('/api/v1/project-image/bulk-upload/', {
+            'project': 'PROJ001',
+            'images': [make_test_image(), broken],
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['files'][0]['file'], 'broken.jpg')
+        self.assertEqual(ProjectImage.objects.count(), 0)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    UPLOAD_SESSION_ROOT=tempfile.mkdtemp(),
+    IMAGE_RENDITIONS_ASYNC=False,
+)
+class ChunkedUploadTestCase(TestCase):
+    def setUp(self):
+        from client.models import Client
+        from users.models import AuthProject
+        from utils.cache import local_cache
+        local_cache.clear()
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='agent', password='testpass123')
+        self.auth_project = AuthProject.objects.create(
+            name='Test', project_code='proj001', wsdl_url='http://example.com/ws?wsdl',
+        )
+        self.user.profile.project = self.auth_project
+        self.user.profile.save()
+        self.client.force_authenticate(user=self.user)
+        self.project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+        self.client_obj = Client.objects.create(client_code_1c='CL001', name='Test Client', project=self.project)
+        self.data = make_test_image().read()
+
+    def _put(self, upload_id, start, end):
+        return self.client.generic(
+            'PUT', f'/api/v1/upload-session/{upload_id}/', self.data[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.data)}',
+        )
+
+    def test_resume_and_finalize(self):
+        """Test bo'laklab yuklash, offset bo'yicha davom ettirish va yakunlash"""
+        import hashlib
+        from client.models import ClientImage
+
+        response = self.client.post('/api/v1/upload-session/', {
+            'target': 'client',
+            'target_ref': 'CL001',
+            'filename': 'shelf.png',
+            'total_size': len(self.data),
+            'checksum': hashlib.sha256(self.data).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data['upload_id']
+        half = len(self.data) // 2
+
+        self.assertEqual(self._put(upload_id, 0, half - 1).data['offset'], half)
+        # Offset'dan keyin boshlangan bo'lak rad etiladi
+        response = self._put(upload_id, half + 10, len(self.data) - 1)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], str(half))
+
+        response = self.client.post(f'/api/v1/upload-session/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        self.assertEqual(self.client.get(f'/api/v1/upload-session/{upload_id}/').data['offset'], half)
+        self._put(upload_id, half, len(self.data) - 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/v1/upload-session/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        image = ClientImage.objects.get(pk=response.data['result']['id'])
+        self.assertEqual((image.width, image.height), (640, 480))
+
+    def test_target_limited_to_caller_project(self):
+        """Test boshqa project'dagi client'ga sessiya ochib bo'lmaydi"""
+        from client.models import Client
+        other = Project.objects.create(code_1c='PROJ002', name='Other Project')
+        Client.objects.create(client_code_1c='CL002', name='Other Client', project=other)
+        payload = {'target': 'client', 'filename': 'a.png', 'total_size': len(self.data)}
+
+        response = self.client.post('/api/v1/upload-session/', {**payload, 'target_ref': 'CL002'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(
+            '/api/v1/upload-session/', {**payload, 'target_ref': 'CL002', 'project_id': other.pk}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Project'i yo'q foydalanuvchi project'siz yozuvlarga ham yuklay olmaydi
+        Client.objects.create(client_code_1c='CL003', name='Orphan Client')
+        self.client.force_authenticate(User.objects.create_user(username='noproject', password='pass'))
+        response = self.client.post('/api/v1/upload-session/', {**payload, 'target_ref': 'CL003'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_visit_thumbnail_updated_when_renditions_ready(self):
+        """Test VisitImage thumbnail URL'i rendition'lar tayyor bo'lgach yangilanadi"""
+        from client.models import ClientImage
+        from visits.models import Visit, VisitImage
+
+        visit = Visit.objects.create(
+            project=self.auth_project, client=self.client_obj, agent_code='AG1', agent_name='Agent',
+            client_code='CL001', client_name='Test Client', planned_date=timezone.now().date(),
+        )
+        response = self.client.post('/api/v1/upload-session/', {
+            'target': 'visit', 'target_ref': str(visit.pk), 'filename': 'shelf.png', 'total_size': len(self.data),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data['upload_id']
+        self._put(upload_id, 0, len(self.data) - 1)
+
+        # Rendition'lar commit'dan keyin yaratiladi - finalize paytida hali original URL
+        response = self.client.post(f'/api/v1/upload-session/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        visit_image = VisitImage.objects.get(visit=visit)
+        self.assertEqual(visit_image.thumbnail_url, visit_image.image_url)
+
+        image = ClientImage.objects.get(pk=visit_image.client_image_id)
+        generate_renditions(image)
+        visit_image.refresh_from_db()
+        self.assertNotEqual(visit_image.thumbnail_url, visit_image.image_url)
+        self.assertTrue(visit_image.thumbnail_url.startswith('http://testserver/'))
+        self.assertTrue(visit_image.thumbnail_url.endswith('.jpg'))
+
+    def test_cleanup_expired_sessions(self):
+        """Test muddati o'tgan sessiya va vaqtinchalik fayl o'chiriladi"""
+        import os
+        from datetime import timedelta
+        from .models import UploadSession
+        from .services import ChunkedUploadService
+
+        session = ChunkedUploadService.create_session(
+            self.user, target='client', target_ref='CL001', filename='a.png', total_size=10,
+        )
+        UploadSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(ChunkedUploadService.cleanup_expired()[0], 1)
+        self.assertFalse(os.path.exists(ChunkedUploadService.temp_path(session)))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_RESIZE_CACHE_ROOT=tempfile.mkdtemp())
+class ImageResizeTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+        self.image = ProjectImage.objects.create(project=project, image=make_test_image())
+        self.url = f'/api/v1/images/project/{self.image.pk}/resize/'
+
+    def test_resize_and_cache_headers(self):
+        """Test whitelist o'lchamga keltirish, immutable header va ETag"""
+        from io import BytesIO
+        from PIL import Image as PILImage
+
+        response = self.client.get(self.url, {'width': 320, 'height': 320, 'format': 'webp', 'v': self.image.content_hash[:12]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        with PILImage.open(BytesIO(b''.join(response.streaming_content))) as img:
+            self.assertEqual(img.size, (320, 320))
+
+        response = self.client.get(
+            self.url, {'width': 320, 'height': 320, 'format': 'webp'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_size_not_in_whitelist(self):
+        """Test whitelist'da bo'lmagan o'lcham rad etiladi"""
+        response = self.client.get(self.url, {'width': 333})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lru_eviction(self):
+        """Test kesh chegarasidan oshganda eski fayllar o'chiriladi"""
+        from utils.resize import _scan_cache, evict
+
+        for width in (160, 200, 240):
+            self.client.get(self.url, {'width': width})
+        entries = _scan_cache()
+        self.assertEqual(len(entries), 3)
+        for offset, (_, _, path) in enumerate(entries):
+            os.utime(path, (1000 + offset, 1000 + offset))
+        newest = max(_scan_cache())
+        # Past watermark (90%) faqat eng yangi faylni sig'diradi
+        evict(max_bytes=int(newest[1] / 0.9) + 1)
+        self.assertEqual([entry[2] for entry in _scan_cache()], [newest[2]])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_RENDITIONS_ASYNC=False)
+class ThumbnailSpriteTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        nomenklatura = Nomenklatura.objects.create(code_1c='NOM001', name='Test Nomenklatura')
+        self.images = [
+            NomenklaturaImage.objects.create(nomenklatura=nomenklatura, image=make_test_image(f'n{i}.png'))
+            for i in range(3)
+        ]
+
+    def test_sprite_sheet_and_map(self):
+        """Test bir nechta thumbnail bitta sprite'ga yig'iladi va kalit versiya bo'yicha keshlanadi"""
+        from io import BytesIO
+        from django.core.files.storage import default_storage
+        from PIL import Image as PILImage
+
+        ids = ','.join(str(image.pk) for image in reversed(self.images))
+        params = {'ids': ids, 'cell': 96, 'columns': 2, 'format': 'png'}
+        response = self.client.get('/api/v1/thumbnails/sprite/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['width'], response.data['height']), (192, 192))
+        self.assertEqual([item['id'] for item in response.data['items']], [image.pk for image in reversed(self.images)])
+        self.assertEqual((response.data['items'][2]['x'], response.data['items'][2]['y']), (0, 96))
+        self.assertEqual(response.data['items'][0]['code'], 'NOM001')
+
+        name = response.data['sprite_url'].split('/media/', 1)[1]
+        with default_storage.open(name) as fh, PILImage.open(BytesIO(fh.read())) as sheet:
+            self.assertEqual(sheet.size, (192, 192))
+
+        self.assertEqual(self.client.get('/api/v1/thumbnails/sprite/', params).data['key'], response.data['key'])
+        self.images[0].image = make_test_image('new.png', size=(300, 300))
+        self.images[0].save()
+        self.assertNotEqual(self.client.get('/api/v1/thumbnails/sprite/', params).data['key'], response.data['key'])
+
+    def test_parallel_requests_build_sprite_once(self):
+        """Test bir kalit uchun parallel so'rovlar sprite'ni bir marta yig'adi"""
+        import threading
+        from unittest import mock
+        from utils import sprites
+
+        real_build = sprites.build_sprite
+        calls = []
+
+        def slow_build(*args):
+            calls.append(1)
+            time.sleep(0.2)
+            return real_build(*args)
+
+        results = []
+        with mock.patch.object(sprites, 'build_sprite', side_effect=slow_build):
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    sprites.get_or_create_sprite('nomenklatura', self.images, 96, 3, 'png')
+                ))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({result['key'] for result in results}), 1)
+        self.assertEqual(len(results), 4)
+
+    def test_invalid_cell(self):
+        """Test whitelist'da bo'lmagan katak o'lchami rad etiladi"""
+        response = self.client.get('/api/v1/thumbnails/sprite/', {'cell': 77})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_RENDITIONS_ASYNC=False)
+class MediaGarbageCollectorTestCase(TestCase):
+    def setUp(self):
+        project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.live = ProjectImage.objects.create(project=project, image=make_test_image('live.png'))
+            self.deleted = ProjectImage.objects.create(
+                project=project, image=make_test_image('deleted.png', size=(320, 240))
+            )
+        self.live.refresh_from_db()
+        self.deleted.refresh_from_db()
+        ProjectImage.objects.filter(pk=self.deleted.pk).update(
+            is_deleted=True, updated_at=timezone.now() - timezone.timedelta(days=40)
+        )
+        self.orphan = self.live.image.storage.save('projects/orphan.png', make_test_image('orphan.png', size=(100, 100)))
+
+    def test_collects_orphans_and_expired_renditions(self):
+        """Test egasiz fayllar va eski soft-deleted rasmlarning rendition'lari tozalanadi"""
+        from io import StringIO
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+
+        storage = self.live.image.storage
+        call_command('gc_media', min_age_hours=0, dry_run=True, stdout=StringIO())
+        self.assertTrue(storage.exists(self.orphan))
+
+        out = StringIO()
+        call_command('gc_media', min_age_hours=0, stdout=out)
+        self.assertFalse(storage.exists(self.orphan))
+        self.assertTrue(storage.exists(self.live.image.name))
+        self.assertTrue(default_storage.exists(self.live.image_thumbnail.name))
+        # Soft-deleted original tiklash uchun qoladi, rendition'lari esa o'chiriladi
+        self.assertTrue(storage.exists(self.deleted.image.name))
+        self.assertFalse(default_storage.exists(self.deleted.image_thumbnail.name))
+        self.assertFalse(ProjectImage.objects.get(pk=self.deleted.pk).renditions_ready)
+        self.assertIn('Reclaimed', out.getvalue())
+
+
+    def test_reused_blob_is_kept(self):
+        """Test yurish davomida qayta ishlatilgan yoki dedup qilingan blob o'chirilmaydi"""
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from api.management.commands.gc_media import Command
+
+        storage = self.live.image.storage
+        old = time.time() - 3 * 86400
+        orphan = storage.save('projects/reused.png', make_test_image('reused.png', size=(90, 90)))
+        os.utime(storage.path(orphan), (old, old))
+        # Dedup hit mtime'ni yangilaydi - `--min-age-hours` himoya qiladi
+        self.assertEqual(storage.save('projects/again.png', make_test_image('again.png', size=(90, 90))), orphan)
+        call_command('gc_media', min_age_hours=1, only='originals', stdout=StringIO())
+        self.assertTrue(storage.exists(orphan))
+
+        os.utime(storage.path(orphan), (old, old))
+        load = Command._load_live_names
+
+        def load_then_attach(grace_cutoff):
+            names = load(grace_cutoff)
+            ProjectImage.objects.create(project=self.live.project, image=orphan)
+            return names
+
+        with mock.patch.object(Command, '_load_live_names', staticmethod(load_then_attach)):
+            call_command('gc_media', min_age_hours=1, only='originals', stdout=StringIO())
+        self.assertTrue(storage.exists(orphan))
+
+    def test_clear_enrichment_keeps_shared_blobs(self):
+        """Test AI rasm o'chirilganda boshqa yozuv ishlatayotgan blob qoladi"""
+        from unittest import mock
+        from nomenklatura.services.enrichment import NomenklaturaEnrichmentService
+
+        nomenklatura = Nomenklatura.objects.create(code_1c='NOM001', name='Test Nomenklatura')
+        shared = make_test_image('shared.png', size=(50, 50))
+        with self.captureOnCommitCallbacks(execute=True):
+            ai_image = NomenklaturaImage.objects.create(
+                nomenklatura=nomenklatura, image=shared, is_ai_generated=True,
+            )
+            ai_only = NomenklaturaImage.objects.create(
+                nomenklatura=nomenklatura, image=make_test_image('ai.png', size=(60, 60)), is_ai_generated=True,
+            )
+            other = ProjectImage.objects.create(
+                project=self.live.project, image=make_test_image('copy.png', size=(50, 50)),
+            )
+        self.assertEqual(ai_image.image.name, other.image.name)
+
+        with mock.patch('nomenklatura.services.enrichment.AIService'):
+            NomenklaturaEnrichmentService().clear_enrichment(nomenklatura)
+        storage = other.image.storage
+        self.assertFalse(NomenklaturaImage.objects.filter(nomenklatura=nomenklatura).exists())
+        self.assertTrue(storage.exists(other.image.name))
+        self.assertFalse(storage.exists(ai_only.image.name))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_RENDITIONS_ASYNC=False, CLEAR_DB_ASYNC=False, CLEAR_DB_BATCH_SIZE=1)
+class ClearDatabaseTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+
+    def test_background_purge_with_cascades_and_media(self):
+        """Test tozalash fon jarayonida cascade/SET_NULL bog'lanishlarni va media fayllarni hisobga oladi"""
+        from client.models import Client
+
+        project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+        Client.objects.create(client_code_1c='CL001', name='Client 1', project=project)
+        Client.objects.create(client_code_1c='CL002', name='Client 2')
+        location = AgentLocation.objects.create(project=project, agent_code='AG1', latitude=41.3, longitude=69.2)
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProjectImage.objects.create(project=project, image=make_test_image('purge.png'))
+        image.refresh_from_db()
+        storage = image.image.storage
+        self.assertTrue(storage.exists(image.image.name))
+        from utils.cache import cache_tag, tag_versions
+        from utils.scope import scope_key
+        tags = [cache_tag('project_image'), cache_tag('client'), cache_tag('image_status')]
+        versions, user_scope_key = tag_versions(tags), scope_key(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/admin/clear-db/', {'models': ['project']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.get(response.data['status_url'])
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['media_status'], 'completed')
+        self.assertEqual(response.data['progress'], 100)
+        self.assertEqual(response.data['stats']['client.Client'], 1)
+        self.assertFalse(Project.objects.exists())
+        self.assertEqual(list(Client.objects.values_list('client_code_1c', flat=True)), ['CL002'])
+        location.refresh_from_db()
+        self.assertIsNone(location.project_id)
+        self.assertFalse(storage.exists(image.image.name))
+
+        # Xom DELETE signal chaqirmaydi - keshlar purge'ning o'zida yangilanadi
+        after = tag_versions(tags)
+        self.assertNotEqual(after[cache_tag('project_image')], versions[cache_tag('project_image')])
+        self.assertNotEqual(after[cache_tag('client')], versions[cache_tag('client')])
+        self.assertEqual(after[cache_tag('image_status')], versions[cache_tag('image_status')])
+        self.assertNotEqual(scope_key(1), user_scope_key)
+
+    def test_unknown_table(self):
+        """Test noma'lum table bilan tozalash boshlanmaydi"""
+        response = self.client.post('/api/v1/admin/clear-db/', {'models': ['users']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EXCEL_IMPORT_ASYNC=False, EXCEL_IMPORT_TMP_ROOT=tempfile.mkdtemp(), EXCEL_IMPORT_BATCH_SIZE=2)
+class ExcelImportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def _workbook(self, headers, rows):
+        from io import BytesIO
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(headers)
+        for row in rows:
+            workbook.active.append(row)
+        buffer = BytesIO()
+        workbook.save(buffer)
+        return SimpleUploadedFile('import.xlsx', buffer.getvalue())
+
+    def test_project_import_invalidates_principal_scopes(self):
+        """Test Project importi (bulk yozuv, post_save'siz) ham scope versiyasini yangilaydi"""
+        from api.views import ProjectViewSet
+        from utils.cache import smart_cache_get
+        from utils.scope import SCOPE_VERSION_KEY
+
+        version = smart_cache_get(SCOPE_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/v1/project/import-xlsx/',
+                {'file': self._workbook(ProjectViewSet._project_excel_headers(), [['PROJ-X', 'Yangi', '', '', True]])},
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(Project.objects.filter(code_1c='PROJ-X').exists())
+        self.assertNotEqual(smart_cache_get(SCOPE_VERSION_KEY), version)
+
+    def test_invalid_headers(self):
+        """Test headerlar mos kelmasa import boshlanmaydi"""
+        response = self.client.post(
+            '/api/v1/project/import-xlsx/', {'file': self._workbook(['code', 'name'], [])}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailFeedCursorTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+        nomenklatura = Nomenklatura.objects.create(code_1c='NOM001', name='Test Nomenklatura')
+        for _ in range(3):
+            ProjectImage.objects.create(project=project, image=make_test_image(size=(32, 32)))
+            NomenklaturaImage.objects.create(nomenklatura=nomenklatura, image=make_test_image(size=(32, 32)))
+
+    def test_cursor_pages_through_merged_feed(self):
+        """Test cursor orqali birlashtirilgan feed to'liq varaqlanadi"""
+        seen = []
+        url = '/api/v1/thumbnails/?limit=4'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['has_more'])
+        seen.extend((e['entity_type'], e['image_id']) for e in response.data['results'])
+
+        response = self.client.get(f"{url}&cursor={response.data['next_cursor']}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['has_more'])
+        self.assertIsNone(response.data['next_cursor'])
+        seen.extend((e['entity_type'], e['image_id']) for e in response.data['results'])
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/thumbnails/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SharedCacheTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from utils.cache import local_cache
+        cache.clear()
+        local_cache.clear()
+
+    def test_cache_key_is_normalized(self):
+        """Test kesh kaliti parametrlar tartibiga bog'liq emas"""
+        from django.http import QueryDict
+        first = build_cache_key('feed', QueryDict('limit=10&entity_type=client&entity_type=project'))
+        second = build_cache_key('feed', QueryDict('entity_type=project&limit=10&entity_type=client'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, build_cache_key('feed', QueryDict('limit=11')))
+
+    def test_get_or_build_serves_cached_value(self):
+        """Test qiymat bir marta quriladi"""
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return {'value': len(calls)}
+
+        self.assertEqual(get_or_build('test:key', builder), {'value': 1})
+        self.assertEqual(get_or_build('test:key', builder), {'value': 1})
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_value_rebuilt_in_bounded_pool(self):
+        """Test stale qiymat darhol qaytadi va umumiy (chegaralangan) pool'da qayta quriladi"""
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return {'value': len(calls)}
+
+        self.assertEqual(get_or_build('test:stale', builder, ttl=0), {'value': 1})
+        executor = ThreadPoolExecutor(max_workers=1)
+        with mock.patch('utils.cache._get_rebuild_executor', return_value=executor):
+            self.assertEqual(get_or_build('test:stale', builder, ttl=0), {'value': 1})
+        executor.shutdown(wait=True)
+        self.assertEqual(get_or_build('test:stale', builder), {'value': 2})
+
+    def test_tagged_entries_rebuild_only_after_their_tag_changes(self):
+        """Test faqat tegishli teg invalidatsiya qilinganda qayta quriladi"""
+        from utils.cache import cache_metrics, cache_tag, entity_tags, invalidate_entity
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return {'value': len(calls)}
+
+        tags = [cache_tag('client'), cache_tag('image_status')]
+        cache_metrics.reset()
+        self.assertEqual(get_or_build('test:tagged', builder, tags=tags), {'value': 1})
+
+        invalidate_entity('nomenklatura', 5)
+        self.assertEqual(get_or_build('test:tagged', builder, tags=tags), {'value': 1})
+
+        # Project tegi bilan birga barcha project'lar tegi ham oshadi
+        self.assertEqual(entity_tags('client', 5), ('client:5', 'client:*'))
+        invalidate_entity('client', 5)
+        self.assertEqual(get_or_build('test:tagged', builder, tags=tags), {'value': 2})
+        self.assertEqual(cache_metrics.snapshot()['invalidations']['client:*'], 1)
+
+    def test_local_tier_negative_cache_and_single_flight(self):
+        """Test L1 qiymat va miss'ni eslab qoladi, parallel miss'lar bir marta yuklanadi"""
+        import threading
+        import time
+        from django.core.cache import cache, caches
+        from utils.cache import cache_metrics, get_or_set, smart_cache_set
+        cache_metrics.reset()
+
+        smart_cache_set('l1test:value', {'x': 1})
+        cache.delete('l1test:value')
+        caches['fallback'].delete('l1test:value')
+        self.assertEqual(smart_cache_get('l1test:value'), {'x': 1})
+
+        self.assertIsNone(smart_cache_get('l1test:missing'))
+        caches['fallback'].set('l1test:missing', 1)
+        self.assertIsNone(smart_cache_get('l1test:missing'))
+        self.assertEqual(smart_cache_get('l1test:missing', local=False), 1)
+        self.assertEqual(cache_metrics.snapshot()['hits_l1']['l1test'], 2)
+
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return [1, 2, 3]
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_set('l1test:flight', loader)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [[1, 2, 3]] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache_metrics.snapshot()['loads']['l1test'], 1)
+
+
+class ReferenceDataRegistryTestCase(TestCase):
+    def setUp(self):
+        from utils.refdata import reference_data
+        self.registry = reference_data
+        self.registry.clear()
+
+    def test_lookups_are_served_from_memory_and_invalidated_by_signals(self):
+        """Test ma'lumotnomalar so'rovsiz qaytariladi va o'zgarganda yangilanadi"""
+        from api.models import ImageStatus
+        from references.models import VisitStatus
+
+        in_progress = VisitStatus.objects.create(code='IN_PROGRESS', name='Jarayonda')
+        status_obj = ImageStatus.objects.create(code='test_status', name='Oldin')
+        self.assertEqual(self.registry.get_by_code(VisitStatus, 'IN_PROGRESS'), in_progress)
+        self.assertEqual(self.registry.get(ImageStatus, status_obj.pk).code, 'test_status')
+        with self.assertNumQueries(0):
+            self.registry.get_by_code(VisitStatus, 'IN_PROGRESS')
+            self.registry.get(ImageStatus, str(status_obj.pk))
+
+        status_obj.name = 'Tashrifdan oldin'
+        status_obj.is_deleted = True
+        status_obj.save()
+        self.assertIsNone(self.registry.get(ImageStatus, status_obj.pk))
+        self.assertEqual(self.registry.get(ImageStatus, status_obj.pk, include_deleted=True).name, 'Tashrifdan oldin')
+        self.assertIsNone(self.registry.get_by_code(VisitStatus, 'MISSING'))
+
+
+class PrincipalScopeTestCase(TestCase):
+    def setUp(self):
+        from client.models import Client
+        from users.models import AgentBusinessRegion, AuthProject
+        from utils.cache import local_cache
+        local_cache.clear()
+        self.auth_project = AuthProject.objects.create(
+            name='Evyap', project_code='evyap', wsdl_url='http://example.com/ws?wsdl',
+        )
+        self.project = Project.objects.create(code_1c='EVYAP', name='Evyap')
+        self.user = User.objects.create_user(username='agent', password='test')
+        profile = self.user.profile
+        profile.project = self.auth_project
+        profile.save()
+        AgentBusinessRegion.objects.create(profile=profile, code='R1', name='Region 1')
+        Client.objects.create(client_code_1c='C-1', name='Region 1 client', project=self.project, business_region_code='R1')
+        Client.objects.create(client_code_1c='C-2', name='Region 2 client', project=self.project, business_region_code='R2')
+
+    def test_scope_is_cached_and_refreshed_after_region_sync(self):
+        """Test scope bir marta aniqlanadi va regionlar o'zgarganda yangilanadi"""
+        from users.models import AgentBusinessRegion
+        from utils.scope import get_principal_scope
+
+        scope = get_principal_scope(User.objects.get(pk=self.user.pk))
+        self.assertEqual(scope.auth_project_id, self.auth_project.pk)
+        self.assertEqual(scope.project_id, self.project.pk)
+        self.assertEqual(scope.region_codes, ('R1',))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            get_principal_scope(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AgentBusinessRegion.objects.create(profile=self.user.profile, code='R2', name='Region 2')
+        scope = get_principal_scope(User.objects.get(pk=self.user.pk))
+        self.assertEqual(scope.region_codes, ('R1', 'R2'))
+
+    def test_access_token_claims_authenticate_agents_without_queries(self):
+        """Test agent token claim'laridan bazasiz, staff esa bazadan autentifikatsiya qilinadi"""
+        from rest_framework.test import APIRequestFactory
+        from users.authentication import ScopedJWTAuthentication
+        from users.services import OneCAuthService
+        from utils.scope import get_principal_scope
+
+        tokens = OneCAuthService.get_tokens_for_user(self.user)
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.assertNumQueries(0):
+            user, _ = ScopedJWTAuthentication().authenticate(request)
+            scope = get_principal_scope(user)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(scope.project_id, self.project.pk)
+        self.assertEqual(scope.region_codes, ('R1',))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = client.get('/api/v1/client/')
+        self.assertEqual([row['client_code_1c'] for row in response.data['results']], ['C-1'])
+
+        admin = User.objects.create_user(username='admin', password='test', is_staff=True)
+        tokens = OneCAuthService.get_tokens_for_user(admin)
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.assertNumQueries(1):
+            user, _ = ScopedJWTAuthentication().authenticate(request)
+        self.assertTrue(user.is_staff)
+
+    def test_stale_token_claims_fall_back_to_database(self):
+        """Test scope o'zgarsa yoki foydalanuvchi bloklansa token claim'lariga ishonilmaydi"""
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework.test import APIRequestFactory
+        from users.authentication import ScopedJWTAuthentication
+        from users.models import AgentBusinessRegion
+        from users.services import OneCAuthService
+        from utils.scope import get_principal_scope
+
+        tokens = OneCAuthService.get_tokens_for_user(self.user)
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AgentBusinessRegion.objects.create(profile=self.user.profile, code='R2', name='Region 2')
+        user, _ = ScopedJWTAuthentication().authenticate(request)
+        self.assertEqual(get_principal_scope(user).region_codes, ('R1', 'R2'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            ScopedJWTAuthentication().authenticate(request)
+
+    def test_activity_endpoints_use_scope_project(self):
+        """Test agent faqat o'z proyekti aktivligini ko'radi (scope orqali)"""
+        other = Project.objects.create(code_1c='OTHER', name='Other')
+        for project in (self.project, other):
+            AgentLocation.objects.create(
+                agent_code='AG001', region='Toshkent', latitude='41.311081', longitude='69.240562', project=project,
+            )
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/agent-location/regional-activity/?project_id=abc')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_points'], 1)
+        response = client.get('/api/v1/agent-location/heatmap/?zoom=12')
+        self.assertEqual(response.data['total_points'], 1)
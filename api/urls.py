@@ -13,6 +13,9 @@ from .views import (
     NomenklaturaThumbnailView,
     AgentLocationViewSet,
     ClearDatabaseView,
+    ImageResizeView,
+    ThumbnailSpriteView,
+    UploadSessionViewSet,
 )
 from references.views import (
     VisitTypeViewSet, 
@@ -36,6 +39,7 @@ router.register('project-image', ProjectImageViewSet)
 router.register('image-status', ImageStatusViewSet)
 router.register('image-source', ImageSourceViewSet)
 router.register('agent-location', AgentLocationViewSet)
+router.register('upload-session', UploadSessionViewSet, basename='upload-session')
 router.register('visit-image', VisitImageViewSet, basename='visit-image')
 
 from visits.views import VisitViewSet, VisitPlanViewSet
@@ -48,7 +52,10 @@ urlpatterns = [
     path('thumbnails/projects/', ProjectThumbnailView.as_view(), name='project-thumbnail-feed'),
     path('thumbnails/clients/', ClientThumbnailView.as_view(), name='client-thumbnail-feed'),
     path('thumbnails/nomenklatura/', NomenklaturaThumbnailView.as_view(), name='nomenklatura-thumbnail-feed'),
+    path('thumbnails/sprite/', ThumbnailSpriteView.as_view(), name='thumbnail-sprite'),
+    path('images/<str:entity_type>/<int:image_id>/resize/', ImageResizeView.as_view(), name='image-resize'),
     path('admin/clear-db/', ClearDatabaseView.as_view(), name='clear-database'),
+    path('admin/clear-db/<int:job_id>/', ClearDatabaseView.as_view(), name='clear-database-job'),
 ]
 
 urlpatterns += router.urls
@@ -1,14 +1,32 @@
+import base64
+import binascii
 import django_filters
 import datetime
-from typing import Optional
+import heapq
+import itertools
+import json
+import logging
+from functools import partial
+from urllib.parse import urljoin
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db.models import Q
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.http import FileResponse, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.encoding import iri_to_uri
+from django.utils.cache import patch_vary_headers
 from django.views.decorators.vary import vary_on_headers, vary_on_cookie
 from django.core.cache import cache
-from utils.cache import smart_cache_get, smart_cache_set, smart_cache_delete
+from utils.cache import (
+    build_cache_key, cache_tag, entity_tags, get_or_build, invalidate_entity,
+    smart_cache_get, smart_cache_set, smart_cache_delete,
+)
 from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -24,15 +42,37 @@ from drf_spectacular.utils import (
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, IsAuthenticatedOrReadOnly
 from openpyxl import load_workbook
 from client.models import Client, ClientImage
+from core.models import ClearDatabaseJob
 from nomenklatura.models import Nomenklatura, NomenklaturaImage
 from utils.excel import (
+    EXPORT_FORMATS,
     build_template_workbook,
     clean_cell,
+    export_response,
     parse_bool_cell,
+    parse_export_format,
     workbook_to_response,
 )
-from .models import Project, ProjectImage, ImageStatus, ImageSource, AgentLocation
+from .models import Project, ProjectImage, ImageStatus, ImageSource, AgentLocation, UploadSession
+from utils.images import format_size
 from utils.mixins import ProjectScopedMixin
+from utils.renditions import prefers_webp, rendition_url
+from utils.resize import OUTPUT_FORMATS as RESIZE_OUTPUT_FORMATS
+from utils.resize import ResizeError, parse_resize_params
+from utils.resize import get_or_create as resize_get_or_create
+from utils.sprites import get_or_create_sprite
+from utils.imports import BulkImporter, import_job_payload, start_excel_import
+from utils.purge import start_clear_database
+from utils.refdata import reference_data
+from utils.scope import get_principal_scope, invalidate_all_principal_scopes
+from utils.uploads import BulkImageUploader
+from .services import (
+    AgentActivityService,
+    ChunkedUploadService,
+    HeatmapService,
+    SpatialQueryService,
+    UploadSessionError,
+)
 from .serializers import (
     ProjectImageBulkUploadSerializer,
     ProjectImageSerializer,
@@ -42,9 +82,13 @@ from .serializers import (
     ImageSourceSerializer,
     ThumbnailEntrySerializer,
     AgentLocationSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
 )
 
 
+logger = logging.getLogger(__name__)
+
 class ProjectFilterSet(django_filters.FilterSet):
     """Enhanced filtering with backward compatibility"""
     # EXISTING FILTERS (preserved)
@@ -279,25 +323,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         super().perform_create(serializer)
-        try:
-            cache.delete_pattern("project_*")
-        except AttributeError:
-            cache.clear()
+        invalidate_entity('project', serializer.instance.pk)
 
     def perform_update(self, serializer):
         super().perform_update(serializer)
-        try:
-            cache.delete_pattern("project_*")
-        except AttributeError:
-            cache.clear()
+        invalidate_entity('project', serializer.instance.pk)
 
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted', 'updated_at'])
-        try:
-            cache.delete_pattern("project_*")
-        except AttributeError:
-            cache.clear()
+        invalidate_entity('project', instance.pk)
 
     # Excel helpers ---------------------------------------------------------
     @staticmethod
@@ -312,6 +347,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
         normalized = [clean_cell(value).lower() for value in header_row[:len(expected)]]
         return normalized == expected, expected, normalized
 
+    def _export(self, request, export_format):
+        # Export uchun alohida queryset - prefetch_related kerak emas; yozuvlar keyset bo'yicha oqim bilan yoziladi
+        queryset = self.filter_queryset(Project.objects.filter(is_deleted=False))
+        return export_response(export_format, 'projects', 'Projects', self._project_excel_headers(), queryset)
+
     @extend_schema(
         tags=['Projects'],
         summary="Project ma'lumotlarini Excel formatida eksport qilish",
@@ -320,35 +360,34 @@ class ProjectViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAuthenticated])
     def export_xlsx(self, request):
-        # Export uchun alohida queryset - prefetch_related kerak emas va SQLite limit muammosini oldini oladi
-        base_queryset = Project.objects.filter(is_deleted=False)
-        queryset = self.filter_queryset(base_queryset)
-        
-        workbook = build_template_workbook('Projects', self._project_excel_headers())
-        sheet = workbook.active
-        
-        # iterator() ishlatish - memory-efficient va SQLite limit muammosini hal qiladi
-        # Chunking bilan ishlash - har safar 1000 ta yozuvni qayta ishlash
-        chunk_size = 1000
-        offset = 0
-        
-        while True:
-            chunk = queryset[offset:offset + chunk_size]
-            if not chunk.exists():
-                break
-            
-            for project in chunk.iterator():
-                sheet.append([
-                    project.code_1c,
-                    project.name,
-                    project.title or '',
-                    project.description or '',
-                    project.is_active,
-                ])
-            
-            offset += chunk_size
-        
-        return workbook_to_response(workbook, 'projects.xlsx')
+        return self._export(request, 'xlsx')
+
+    @extend_schema(
+        tags=['Projects'],
+        summary="Project ma'lumotlarini XLSX, CSV yoki NDJSON formatida eksport qilish",
+        parameters=[
+            OpenApiParameter(
+                name='file_format',
+                type=OpenApiTypes.STR,
+                enum=list(EXPORT_FORMATS),
+                required=False,
+                description="Fayl formati (default: xlsx)",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="XLSX, CSV yoki NDJSON fayl (oqim)"),
+            400: OpenApiResponse(description="Noto'g'ri format"),
+        },
+    )
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAuthenticated])
+    def export(self, request):
+        export_format = parse_export_format(request.query_params.get('file_format'))
+        if export_format is None:
+            return Response(
+                {'error': f"file_format quyidagilardan biri bo'lishi kerak: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self._export(request, export_format)
 
     @extend_schema(
         tags=['Projects'],
@@ -367,6 +406,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @extend_schema(
         tags=['Projects'],
         summary="Project ma'lumotlarini Excel fayldan import qilish",
+        description=(
+            "Fayl headerlari tekshirilgach import fon rejimida bajariladi. Progress va natijani "
+            "`status_url` (`GET /api/v1/core/import-logs/{import_id}/`) orqali kuzatish mumkin."
+        ),
         request={
             'multipart/form-data': inline_serializer(
                 name='ProjectImportPayload',
@@ -376,7 +419,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
         },
         responses={
-            200: OpenApiResponse(description="Import natijalari (created/updated/errors)"),
+            202: OpenApiResponse(description="Import fon rejimida boshlandi (import_id, status_url)"),
             400: OpenApiResponse(description="Yaroqsiz fayl yoki header mos emas"),
         },
     )
@@ -393,12 +436,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return Response({'error': 'file field talab qilinadi'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            workbook = load_workbook(uploaded, data_only=True)
+            workbook = load_workbook(uploaded, read_only=True, data_only=True)
         except Exception:
             return Response({'error': 'XLSX faylni o\'qib bo\'lmadi'}, status=status.HTTP_400_BAD_REQUEST)
 
-        sheet = workbook.active
-        is_valid, expected, received = self._validate_project_headers(sheet)
+        try:
+            is_valid, expected, received = self._validate_project_headers(workbook.active)
+        finally:
+            workbook.close()
         if not is_valid:
             return Response(
                 {
@@ -409,41 +454,28 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        stats = {'created': 0, 'updated': 0, 'errors': []}
-        for idx, row in enumerate(
-            sheet.iter_rows(min_row=2, max_col=len(expected), values_only=True),
-            start=2,
-        ):
-            if not row or all(value in (None, '') for value in row):
-                continue
-            code = clean_cell(row[0])
-            if not code:
-                stats['errors'].append(f"Row {idx}: code_1c bo'sh bo'lishi mumkin emas")
-                continue
-            name = clean_cell(row[1]) or code
-            title = clean_cell(row[2]) or None
-            description = row[3] if row[3] is not None else ''
-            is_active = parse_bool_cell(row[4], default=True)
-
-            defaults = {
-                'name': name,
-                'title': title,
-                'description': description,
-                'is_active': is_active,
-                'is_deleted': False,
-            }
-            try:
-                obj, created_flag = Project.objects.update_or_create(
-                    code_1c=code,
-                    defaults=defaults,
-                )
-                if created_flag:
-                    stats['created'] += 1
-                else:
-                    stats['updated'] += 1
-            except Exception as exc:  # noqa: BLE001
-                stats['errors'].append(f"Row {idx}: {exc}")
-        return Response(stats, status=status.HTTP_200_OK)
+        # code_1c unique - o'chirilgan project ham qayta tiklanadi
+        # bulk yozuvlar post_save yubormaydi - AuthProject -> Project xaritasi qo'lda yangilanadi
+        importer = BulkImporter(
+            Project, 'code_1c', self._parse_import_row,
+            cache_tags=entity_tags('project'), on_finish=invalidate_all_principal_scopes,
+        )
+        import_log = start_excel_import('project', uploaded, request.user, importer, len(expected))
+        return Response(import_job_payload(request, import_log), status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _parse_import_row(row):
+        """Excel qatoridan (code_1c, defaults)"""
+        code = clean_cell(row[0])
+        if not code:
+            raise ValueError("code_1c bo'sh bo'lishi mumkin emas")
+        return code, {
+            'name': clean_cell(row[1]) or code,
+            'title': clean_cell(row[2]) or None,
+            'description': row[3] if row[3] is not None else '',
+            'is_active': parse_bool_cell(row[4], default=True),
+            'is_deleted': False,
+        }
 
 
 class AgentLocationFilterSet(django_filters.FilterSet):
@@ -513,6 +545,7 @@ class AgentLocationViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     search_fields = ['agent_code', 'agent_name', 'agent_phone', 'device_id', 'device_name', 'region']
     ordering = ['-created_at']
+    NEARBY_MAX_RADIUS_M = 50000.0
 
     def get_queryset(self):
         # Mixin handles project filtering
@@ -522,6 +555,40 @@ class AgentLocationViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted', 'updated_at'])
+        AgentActivityService.remove_ping(instance)
+        HeatmapService.invalidate_day(instance.project_id, timezone.localdate(instance.created_at))
+
+    @staticmethod
+    def _parse_date_range(params):
+        """`date_from`/`date_to` (YYYY-MM-DD, ixtiyoriy). Noto'g'ri format - ValueError."""
+        date_from = params.get('date_from')
+        date_to = params.get('date_to')
+        try:
+            parsed_from = parse_date(date_from) if date_from else None
+            parsed_to = parse_date(date_to) if date_to else None
+        except ValueError:
+            parsed_from = parsed_to = None
+        if (date_from and not parsed_from) or (date_to and not parsed_to):
+            raise ValueError("Sana formati noto'g'ri. YYYY-MM-DD formatidan foydalaning.")
+        return parsed_from, parsed_to
+
+    @staticmethod
+    def _activity_project_id(request):
+        """
+        Superuser: `project_id` parametri (yo'q bo'lsa None - barcha proyektlar).
+        Boshqalar: o'z api.Project id si, topilmasa -1 (bo'sh natija).
+        """
+        user = request.user
+        if user.is_superuser:
+            raw = request.query_params.get('project_id')
+            if raw in (None, ''):
+                return None
+            try:
+                return int(raw)
+            except (TypeError, ValueError):
+                raise ValueError("project_id butun son bo'lishi kerak.")
+        scope = get_principal_scope(user)
+        return (scope.project_id if scope else None) or -1
 
     @extend_schema(
         tags=['Agent Locations'],
@@ -649,11 +716,15 @@ class AgentLocationViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     @extend_schema(
         tags=['Agent Locations'],
         summary="Hududiy aktivlik",
-        description="Agentning vaqt oralig'idagi regionlar bo'yicha aktivligini qaytaradi.",
+        description=(
+            "Agentning vaqt oralig'idagi regionlar bo'yicha aktivligini qaytaradi. "
+            "Ma'lumotlar soatlik `AgentActivityHourly` agregatlaridan yig'iladi."
+        ),
         parameters=[
             OpenApiParameter(name='agent_code', required=False, type=str),
             OpenApiParameter(name='date_from', required=False, type=str, description="YYYY-MM-DD"),
-            OpenApiParameter(name='date_to', required=False, type=str, description="YYYY-MM-DD")
+            OpenApiParameter(name='date_to', required=False, type=str, description="YYYY-MM-DD"),
+            OpenApiParameter(name='project_id', required=False, type=int, description="Proyekt ID (faqat superuser uchun)"),
         ]
     )
     @action(detail=False, methods=['get'], url_path='regional-activity')
@@ -663,47 +734,188 @@ class AgentLocationViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
 
-        qs = AgentLocation.objects.filter(is_deleted=False)
-        if agent_code:
-            qs = qs.filter(agent_code=agent_code)
-        if date_from:
-            qs = qs.filter(created_at__date__gte=date_from)
-        if date_to:
-            qs = qs.filter(created_at__date__lte=date_to)
-
-        # Region bo'yicha guruhlash
-        region_stats = qs.values('region').annotate(
-            points_count=models.Count('id'),
-        ).order_by('-points_count')
-
-        # Visitlar bo'yicha (ClientImage)
-        # Note: ClientImage modelida source maydoni yo'q bo'lishi mumkin
-        total_visits = 0
         try:
-            from client.models import ClientImage
-            v_qs = ClientImage.objects.filter(is_deleted=False)
-            if date_from:
-                v_qs = v_qs.filter(created_at__date__gte=date_from)
-            if date_to:
-                v_qs = v_qs.filter(created_at__date__lte=date_to)
-            # Agent code bo'yicha filter qilish qiyin, chunki ClientImage'da to'g'ridan-to'g'ri agent maydoni yo'q
-            total_visits = v_qs.count()
-        except Exception as e:
-            # Agar ClientImage modelida muammo bo'lsa, 0 qaytaramiz
-            print(f"Visits count error: {e}")
-            total_visits = 0
-        
+            parsed_from, parsed_to = self._parse_date_range(request.query_params)
+            project_id = self._activity_project_id(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = AgentActivityService.summarize(
+            date_from=parsed_from,
+            date_to=parsed_to,
+            agent_code=agent_code,
+            project_id=project_id,
+        )
+
         return Response({
             'period': {
                 'from': date_from,
                 'to': date_to
             },
             'agent_code': agent_code,
-            'regions': list(region_stats),
-            'total_points': qs.count(),
-            'total_visits': total_visits
+            'regions': summary['regions'],
+            'total_points': summary['total_points'],
+            'total_visits': summary['total_visits']
         })
 
+    @extend_schema(
+        tags=['Agent Locations'],
+        summary="Hudud bo'yicha agentlar va tashriflar",
+        description=(
+            "Nuqta + radius (`lat`, `lng`, `radius`) yoki bbox (`min_lat`, `min_lng`, `max_lat`, `max_lng`) "
+            "ichidagi agentlarni qaytaradi. Qidiruv geohash prefiks indeksi va aniq haversine filtri orqali bajariladi."
+        ),
+        parameters=[
+            OpenApiParameter(name='lat', required=False, type=float),
+            OpenApiParameter(name='lng', required=False, type=float),
+            OpenApiParameter(name='radius', required=False, type=float, description="Radius (metr), default 500"),
+            OpenApiParameter(name='min_lat', required=False, type=float),
+            OpenApiParameter(name='min_lng', required=False, type=float),
+            OpenApiParameter(name='max_lat', required=False, type=float),
+            OpenApiParameter(name='max_lng', required=False, type=float),
+            OpenApiParameter(name='agent_code', required=False, type=str),
+            OpenApiParameter(name='date_from', required=False, type=str, description="YYYY-MM-DD"),
+            OpenApiParameter(name='date_to', required=False, type=str, description="YYYY-MM-DD"),
+            OpenApiParameter(name='include_visits', required=False, type=bool, description="Check-in tashriflarini ham qaytarish"),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='nearby')
+    def nearby(self, request):
+        """Berilgan hudud ichida bo'lgan agentlar (va ixtiyoriy tashriflar)"""
+        params = request.query_params
+
+        def _float(name):
+            value = params.get(name)
+            if value in (None, ''):
+                return None
+            return float(value)
+
+        try:
+            lat, lng = _float('lat'), _float('lng')
+            radius = _float('radius')
+            bbox = tuple(_float(name) for name in ('min_lat', 'min_lng', 'max_lat', 'max_lng'))
+        except ValueError:
+            return Response({'error': "Koordinatalar son bo'lishi kerak."}, status=status.HTTP_400_BAD_REQUEST)
+
+        area = {}
+        if lat is not None and lng is not None:
+            radius = radius if radius is not None else 500.0
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not (0 < radius <= self.NEARBY_MAX_RADIUS_M):
+                return Response(
+                    {'error': f"Koordinata yoki radius noto'g'ri (radius 0-{int(self.NEARBY_MAX_RADIUS_M)} m)."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            area = {'center': (lat, lng), 'radius_m': radius}
+        elif all(value is not None for value in bbox):
+            min_lat, min_lng, max_lat, max_lng = bbox
+            if min_lat > max_lat or min_lng > max_lng:
+                return Response({'error': "Bbox noto'g'ri: min qiymatlar max dan katta."}, status=status.HTTP_400_BAD_REQUEST)
+            area = {'bbox': bbox}
+        else:
+            return Response(
+                {'error': "`lat`+`lng` yoki `min_lat`,`min_lng`,`max_lat`,`max_lng` parametrlari majburiy."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            parsed_from, parsed_to = self._parse_date_range(params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = AgentActivityService.day_bounds(parsed_from, parsed_to)
+
+        agent_code = params.get('agent_code')
+        locations = self.get_queryset().order_by()
+        if agent_code:
+            locations = locations.filter(agent_code=agent_code)
+        if start:
+            locations = locations.filter(created_at__gte=start)
+        if end:
+            locations = locations.filter(created_at__lt=end)
+
+        agents, points_count, cells = SpatialQueryService.nearby_agents(locations, **area)
+        payload = {
+            'center': {'lat': lat, 'lng': lng} if 'center' in area else None,
+            'radius_m': area.get('radius_m'),
+            'bbox': area.get('bbox'),
+            'cells': cells,
+            'points_count': points_count,
+            'agents': agents,
+        }
+
+        if params.get('include_visits', '').lower() in ('1', 'true', 'yes'):
+            from visits.models import Visit
+
+            visits = Visit.objects.filter(is_deleted=False).order_by()
+            if not request.user.is_superuser:
+                scope = get_principal_scope(request.user)
+                auth_project_id = scope.auth_project_id if scope else None
+                visits = visits.filter(project_id=auth_project_id) if auth_project_id else visits.none()
+            if agent_code:
+                visits = visits.filter(agent_code=agent_code)
+            if start:
+                visits = visits.filter(actual_start_time__gte=start)
+            if end:
+                visits = visits.filter(actual_start_time__lt=end)
+            payload['visits'] = SpatialQueryService.nearby_visits(visits, **area)
+
+        return Response(payload)
+
+    @extend_schema(
+        tags=['Agent Locations'],
+        summary="Agentlar qamrovi heatmap'i",
+        description=(
+            "Proyekt va sana oralig'i bo'yicha agent lokatsiyalari zichligini grid kataklarida qaytaradi. "
+            "Kunlik tile'lar (project, kun, zoom) bo'yicha keshlanadi. Default: bugungi kun, zoom=12."
+        ),
+        parameters=[
+            OpenApiParameter(name='zoom', required=False, type=int, description="1-18, default 12"),
+            OpenApiParameter(name='date_from', required=False, type=str, description="YYYY-MM-DD"),
+            OpenApiParameter(name='date_to', required=False, type=str, description="YYYY-MM-DD"),
+            OpenApiParameter(name='project_id', required=False, type=int, description="Proyekt ID (faqat superuser uchun)"),
+            OpenApiParameter(name='bbox', required=False, type=str, description="min_lat,min_lng,max_lat,max_lng"),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='heatmap')
+    def heatmap(self, request):
+        """Lokatsiyalar zichligi grid'ini qaytaradi"""
+        params = request.query_params
+        try:
+            zoom = int(params.get('zoom', 12))
+        except (TypeError, ValueError):
+            zoom = None
+        if zoom is None or not (HeatmapService.MIN_ZOOM <= zoom <= HeatmapService.MAX_ZOOM):
+            return Response(
+                {'error': f"zoom {HeatmapService.MIN_ZOOM}-{HeatmapService.MAX_ZOOM} oralig'ida bo'lishi kerak."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            parsed_from, parsed_to = self._parse_date_range(params)
+            project_id = self._activity_project_id(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.localdate()
+        parsed_to = parsed_to or today
+        parsed_from = parsed_from or parsed_to
+        if parsed_from > parsed_to:
+            return Response({'error': "date_from date_to dan katta bo'lmasligi kerak."}, status=status.HTTP_400_BAD_REQUEST)
+        if (parsed_to - parsed_from).days >= HeatmapService.MAX_DAYS:
+            return Response(
+                {'error': f"Sana oralig'i {HeatmapService.MAX_DAYS} kundan oshmasligi kerak."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bbox = None
+        if params.get('bbox'):
+            try:
+                bbox = tuple(float(part) for part in params['bbox'].split(','))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4:
+                return Response({'error': "bbox formati: min_lat,min_lng,max_lat,max_lng"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(HeatmapService.build(project_id, parsed_from, parsed_to, zoom, bbox))
+
 @extend_schema_view(
     list=extend_schema(
         tags=['Projects'],
@@ -764,6 +976,19 @@ class ProjectImageViewSet(viewsets.ModelViewSet):
         """Optimizatsiya: select_related bilan project yuklash va global ko'rinish"""
         queryset = super().get_queryset()
         return queryset.select_related('project').order_by('-created_at')
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_entity('project_image', serializer.instance.project_id)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_entity('project_image', serializer.instance.project_id)
+
+    def perform_destroy(self, instance):
+        project_id = instance.project_id
+        super().perform_destroy(instance)
+        invalidate_entity('project_image', project_id)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -784,7 +1009,7 @@ class ProjectImageViewSet(viewsets.ModelViewSet):
                 response=ProjectImageSerializer(many=True),
                 description="Yangi yuklangan rasmlar ro'yxati",
             ),
-            400: OpenApiResponse(description="Kerakli maydonlar yetishmaydi"),
+            400: OpenApiResponse(description="Kerakli maydonlar yetishmaydi yoki yaroqsiz rasm fayli"),
             404: OpenApiResponse(description="Project topilmadi"),
         },
         examples=[
@@ -822,23 +1047,26 @@ class ProjectImageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        category = request.data.get('category', '')
-        note = request.data.get('note', '')
-        
-        created_images = []
-        for image in images:
-            image_obj = ProjectImage.objects.create(
-                project=project,
-                image=image,
-                is_main=False,
-                is_active=True,
-                is_deleted=False,
-                category=category,
-                note=note,
+        uploader = BulkImageUploader(
+            ProjectImage,
+            {
+                'project': project,
+                'is_main': False,
+                'is_active': True,
+                'is_deleted': False,
+                'category': request.data.get('category', ''),
+                'note': request.data.get('note', ''),
+            },
+            cache_tags=entity_tags('project_image', project.pk),
+        )
+        created, errors = uploader.upload(images)
+        if errors:
+            return Response(
+                {'error': 'Yaroqsiz rasm fayllari', 'files': errors},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            serializer = ProjectImageSerializer(image_obj, context={'request': request})
-            created_images.append(serializer.data)
-        
+
+        created_images = ProjectImageSerializer(created, many=True, context={'request': request}).data
         return Response({
             'message': f'{len(created_images)} ta rasm muvaffaqiyatli yuklandi',
             'images': created_images
@@ -873,7 +1101,10 @@ class ProjectImageViewSet(viewsets.ModelViewSet):
     ),
 )
 class ImageStatusViewSet(viewsets.ModelViewSet):
-    """ImageStatus CRUD operatsiyalari - Heavily cached"""
+    """
+    ImageStatus CRUD operatsiyalari.
+    O'qish reference registry'dan (so'rovsiz); o'zgarishlar signal orqali registry versiyasini yangilaydi.
+    """
     queryset = ImageStatus.objects.filter(is_deleted=False, is_active=True)
     serializer_class = ImageStatusSerializer
     permission_classes = [IsAuthenticated]
@@ -881,25 +1112,19 @@ class ImageStatusViewSet(viewsets.ModelViewSet):
     search_fields = ['code', 'name', 'description']
     ordering = ['order', 'name']
     
-    @method_decorator(cache_page(3600))  # Cache for 1 hour (rarely changes)
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        # Qidiruv/filter parametrlari bo'lsa oddiy queryset yo'li
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        statuses = [item for item in reference_data.all(ImageStatus) if item.is_active]
+        return Response(self.get_serializer(statuses, many=True).data)
     
-    @method_decorator(cache_page(3600))
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
-    
-    def perform_create(self, serializer):
-        super().perform_create(serializer)
-        cache.clear()
-    
-    def perform_update(self, serializer):
-        super().perform_update(serializer)
-        cache.clear()
-    
-    def perform_destroy(self, instance):
-        super().perform_destroy(instance)
-        cache.clear()
+        instance = reference_data.get(ImageStatus, kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        if instance is None or not instance.is_active:
+            return super().retrieve(request, *args, **kwargs)
+        self.check_object_permissions(request, instance)
+        return Response(self.get_serializer(instance).data)
 
 
 @extend_schema_view(
@@ -938,6 +1163,164 @@ class ImageSourceViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
 
+@extend_schema_view(
+    create=extend_schema(
+        tags=['Uploads'],
+        summary="Chunked upload sessiyasini ochish",
+        description=(
+            "Katta rasmni bo'laklab yuklash uchun sessiya ochadi. Keyin bo'laklar `PUT` bilan "
+            "`Content-Range: bytes start-end/total` sarlavhasi orqali yuboriladi."
+        ),
+        request=UploadSessionCreateSerializer,
+        responses={201: UploadSessionSerializer},
+    ),
+    retrieve=extend_schema(
+        tags=['Uploads'],
+        summary="Sessiya holati va joriy offset",
+        description="Uzilishdan keyin qaysi baytdan davom ettirishni bilish uchun (`Upload-Offset` sarlavhasi ham qaytadi).",
+        responses={200: UploadSessionSerializer},
+    ),
+    update=extend_schema(
+        tags=['Uploads'],
+        summary="Bo'lak (byte range) yuborish",
+        description=(
+            "So'rov tanasi - xom baytlar (`application/octet-stream`). Bo'lak joriy offset'dan yoki "
+            "undan oldin boshlanishi kerak, aks holda 409 va joriy offset qaytadi."
+        ),
+        parameters=[
+            OpenApiParameter(
+                'Content-Range', OpenApiTypes.STR, OpenApiParameter.HEADER, required=True,
+                description="bytes start-end/total",
+            ),
+        ],
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+        responses={200: UploadSessionSerializer},
+    ),
+    destroy=extend_schema(
+        tags=['Uploads'],
+        summary="Sessiyani bekor qilish",
+    ),
+)
+class UploadSessionViewSet(viewsets.GenericViewSet):
+    """Davom ettiriladigan (resumable) chunked rasm yuklash"""
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'upload_id'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    @staticmethod
+    def _error_response(error):
+        response = Response({'error': error.message, 'offset': error.offset}, status=error.status_code)
+        if error.offset is not None:
+            response['Upload-Offset'] = str(error.offset)
+        return response
+
+    @staticmethod
+    def _session_response(session, status_code=status.HTTP_200_OK):
+        response = Response(UploadSessionSerializer(session).data, status=status_code)
+        response['Upload-Offset'] = str(session.received_bytes)
+        return response
+
+    def create(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = ChunkedUploadService.create_session(request.user, **serializer.validated_data)
+        except UploadSessionError as e:
+            return self._error_response(e)
+        return self._session_response(session, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, upload_id=None):
+        return self._session_response(self.get_object())
+
+    def update(self, request, upload_id=None):
+        session = self.get_object()
+        try:
+            start, length = ChunkedUploadService.parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE'), session.total_size
+            )
+            session = ChunkedUploadService.write_chunk(session, start, length, request.stream)
+        except UploadSessionError as e:
+            return self._error_response(e)
+        return self._session_response(session)
+
+    def destroy(self, request, upload_id=None):
+        ChunkedUploadService.abort(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def _result_data(result, request):
+        if isinstance(result, ClientImage):
+            from client.serializers import ClientImageSerializer
+            return ClientImageSerializer(result, context={'request': request}).data
+        if isinstance(result, NomenklaturaImage):
+            from nomenklatura.serializers import NomenklaturaImageSerializer
+            return NomenklaturaImageSerializer(result, context={'request': request}).data
+        from visits.serializers import VisitImageSerializer
+        return VisitImageSerializer(result).data
+
+    @extend_schema(
+        tags=['Uploads'],
+        summary="Yuklashni yakunlash",
+        description=(
+            "Barcha baytlar qabul qilingach fayl tekshiriladi (ixtiyoriy SHA-256), EXIF normalize qilinadi "
+            "va ClientImage, NomenklaturaImage yoki VisitImage yaratiladi."
+        ),
+        request=None,
+        responses={
+            201: inline_serializer(
+                name='UploadSessionFinalizeResponse',
+                fields={
+                    'session': UploadSessionSerializer(),
+                    'result': serializers.DictField(),
+                },
+            ),
+            409: OpenApiResponse(description="Fayl hali to'liq yuklanmagan"),
+        },
+    )
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, upload_id=None):
+        try:
+            session, result = ChunkedUploadService.finalize(self.get_object(), request=request)
+        except UploadSessionError as e:
+            return self._error_response(e)
+        return Response({
+            'session': UploadSessionSerializer(session).data,
+            'result': self._result_data(result, request),
+        }, status=status.HTTP_201_CREATED)
+
+
+class FeedContext:
+    """
+    Feed builder'lari uchun request'dan olingan oddiy qiymatlar: kesh fonda
+    qayta qurilganda request (va foydalanuvchi obyekti) ushlab turilmaydi.
+    `region_codes` None bo'lsa client rasmlari cheklanmaydi.
+    """
+    __slots__ = ('origin', 'webp', 'region_codes')
+
+    def __init__(self, origin='', webp=False, region_codes=None):
+        self.origin = origin
+        self.webp = webp
+        self.region_codes = region_codes
+
+    @classmethod
+    def from_request(cls, request):
+        user = request.user
+        region_codes = None
+        if not user.is_anonymous and not user.is_staff:
+            region_codes = get_principal_scope(user).region_codes
+        return cls(f"{request.scheme}://{request.get_host()}", prefers_webp(request), region_codes)
+
+    def absolute_url(self, url):
+        return iri_to_uri(urljoin(f'{self.origin}/', url)) if self.origin else url
+
+
 class ThumbnailFeedMixin:
     """Reusable helper mixin for thumbnail responses"""
 
@@ -973,46 +1356,33 @@ class ThumbnailFeedMixin:
             return None
         return raw.strip().lower() in ('1', 'true', 'yes')
 
-    def _collect_project_thumbnails(self, request, limit, is_main, status_code, code_1c=None):
+    def _project_image_queryset(self, ctx, is_main, status_code, code_1c=None):
         qs = ProjectImage.objects.filter(
             is_deleted=False,
             is_active=True,
             project__is_deleted=False,
-        ).select_related('project', 'status', 'source').order_by('-created_at')
+        ).select_related('project', 'status', 'source').order_by('-created_at', '-id')
         if is_main is not None:
             qs = qs.filter(is_main=is_main)
         if status_code:
             qs = qs.filter(status__code=status_code)
         if code_1c:
             qs = qs.filter(project__code_1c=code_1c)
-        qs = qs[:limit]
-        return [
-            self._build_entry(
-                request,
-                entity_type='project',
-                entity=image.project,
-                image=image,
-                code_attr='code_1c'
-            )
-            for image in qs
-        ]
+        return qs
 
-    def _collect_client_thumbnails(self, request, limit, is_main, status_code, client_id=None, client_code_1c=None):
+    def _client_image_queryset(self, ctx, is_main, status_code, client_id=None, client_code_1c=None):
         qs = ClientImage.objects.filter(
             is_deleted=False,
             is_active=True,
             client__is_deleted=False,
-        ).select_related('client', 'status', 'source').order_by('-created_at')
+        ).select_related('client', 'status', 'source').order_by('-created_at', '-id')
         
         # Region-based filtering for agents
-        user = request.user
-        if not user.is_anonymous and not user.is_staff:
-            from users.models import AgentBusinessRegion
-            region_codes = AgentBusinessRegion.objects.filter(profile__user=user).values_list('code', flat=True)
-            if region_codes:
-                qs = qs.filter(client__business_region_code__in=list(region_codes))
+        if ctx.region_codes is not None:
+            if ctx.region_codes:
+                qs = qs.filter(client__business_region_code__in=ctx.region_codes)
             else:
-                return []
+                return qs.none()
         if is_main is not None:
             qs = qs.filter(is_main=is_main)
         if status_code:
@@ -1021,24 +1391,14 @@ class ThumbnailFeedMixin:
             qs = qs.filter(client_id=client_id)
         if client_code_1c:
             qs = qs.filter(client__client_code_1c=client_code_1c)
-        qs = qs[:limit]
-        return [
-            self._build_entry(
-                request,
-                entity_type='client',
-                entity=image.client,
-                image=image,
-                code_attr='client_code_1c'
-            )
-            for image in qs
-        ]
+        return qs
 
-    def _collect_nomenklatura_thumbnails(self, request, limit, is_main, status_code, nomenklatura_id=None, code_1c=None, article_code=None):
+    def _nomenklatura_image_queryset(self, ctx, is_main, status_code, nomenklatura_id=None, code_1c=None, article_code=None):
         qs = NomenklaturaImage.objects.filter(
             is_deleted=False,
             is_active=True,
             nomenklatura__is_deleted=False,
-        ).select_related('nomenklatura', 'status', 'source').order_by('-created_at')
+        ).select_related('nomenklatura', 'status', 'source').order_by('-created_at', '-id')
         if is_main is not None:
             qs = qs.filter(is_main=is_main)
         if status_code:
@@ -1049,136 +1409,159 @@ class ThumbnailFeedMixin:
             qs = qs.filter(nomenklatura__code_1c=code_1c)
         if article_code:
             qs = qs.filter(nomenklatura__article_code=article_code)
-        qs = qs[:limit]
-        return [
-            self._build_entry(
-                request,
-                entity_type='nomenklatura',
-                entity=image.nomenklatura,
-                image=image,
-                code_attr='code_1c'
-            )
-            for image in qs
-        ]
+        return qs
+
+    def _collect_project_thumbnails(self, ctx, limit, is_main, status_code, code_1c=None):
+        qs = self._project_image_queryset(ctx, is_main, status_code, code_1c=code_1c)[:limit]
+        return [self._build_typed_entry(ctx, 'project', image) for image in qs]
+
+    def _collect_client_thumbnails(self, ctx, limit, is_main, status_code, client_id=None, client_code_1c=None):
+        qs = self._client_image_queryset(
+            ctx, is_main, status_code, client_id=client_id, client_code_1c=client_code_1c
+        )[:limit]
+        return [self._build_typed_entry(ctx, 'client', image) for image in qs]
+
+    def _collect_nomenklatura_thumbnails(self, ctx, limit, is_main, status_code, nomenklatura_id=None, code_1c=None, article_code=None):
+        qs = self._nomenklatura_image_queryset(
+            ctx, is_main, status_code, nomenklatura_id=nomenklatura_id, code_1c=code_1c, article_code=article_code
+        )[:limit]
+        return [self._build_typed_entry(ctx, 'nomenklatura', image) for image in qs]
+
+    # entity_type -> (parent attr, code attr)
+    ENTITY_ATTRS = {
+        'project': ('project', 'code_1c'),
+        'client': ('client', 'client_code_1c'),
+        'nomenklatura': ('nomenklatura', 'code_1c'),
+    }
+
+    def _build_typed_entry(self, ctx, entity_type, image):
+        entity_attr, code_attr = self.ENTITY_ATTRS[entity_type]
+        return self._build_entry(
+            ctx,
+            entity_type=entity_type,
+            entity=getattr(image, entity_attr),
+            image=image,
+            code_attr=code_attr
+        )
+
+    def _build_size_summary(self, entries):
+        """Qaytarilgan elementlarning umumiy thumbnail/original hajmi"""
+        total_thumbnail_size_bytes = sum(entry.get('thumbnail_size_bytes', 0) or 0 for entry in entries)
+        total_original_size_bytes = sum(entry.get('original_size_bytes', 0) or 0 for entry in entries)
+        return {
+            'thumbnail': {
+                'size_bytes': total_thumbnail_size_bytes,
+                'size': self._format_size(total_thumbnail_size_bytes)
+            },
+            'original': {
+                'size_bytes': total_original_size_bytes,
+                'size': self._format_size(total_original_size_bytes)
+            }
+        }
+
+    FEED_CACHE_TTL = 180  # 3 daqiqa yangi
+    FEED_CACHE_STALE_TTL = 300  # so'ng 5 daqiqa stale holida beriladi, fonda yangilanadi
+
+    @staticmethod
+    def _cache_scope(request):
+        """Javobni o'zgartiradigan foydalanuvchi konteksti (regional filtr faqat oddiy agentlarga)"""
+        user = request.user
+        if user.is_anonymous:
+            return 'anonymous'
+        if user.is_staff:
+            return 'staff'
+        return f'user:{user.id}'
+
+    # Feed yozuvlari bog'liq bo'lgan entity turlari (kesh teglari)
+    FEED_TAG_ENTITIES = {
+        'project': ('project', 'project_image'),
+        'client': ('client', 'client_image'),
+        'nomenklatura': ('nomenklatura', 'nomenklatura_image'),
+    }
+
+    @classmethod
+    def _feed_tags(cls, *entity_types):
+        tags = [cache_tag('image_status'), cache_tag('image_source')]
+        for entity_type in entity_types:
+            tags.extend(cache_tag(entity) for entity in cls.FEED_TAG_ENTITIES[entity_type])
+        return tags
+
+    def _cached_feed(self, request, prefix, params, builder, tags=()):
+        """
+        Normallashtirilgan parametrlar bo'yicha umumiy kesh (single-flight + stale-while-revalidate).
+
+        `builder(feed, ctx)` fonda ham ishlashi mumkin, shuning uchun unga request
+        va joriy view emas, request'siz view nusxasi va `FeedContext` beriladi.
+        """
+        ctx = FeedContext.from_request(request)
+        key = build_cache_key(prefix, {
+            'scope': self._cache_scope(request),
+            'origin': ctx.origin,
+            'webp': ctx.webp,
+            **params,
+        })
+        data = get_or_build(
+            key, partial(builder, self.__class__(), ctx),
+            ttl=self.FEED_CACHE_TTL, stale_ttl=self.FEED_CACHE_STALE_TTL, tags=tags,
+        )
+        response = Response(data, status=status.HTTP_200_OK)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def _build_entries_response(self, entries):
+        serialized = ThumbnailEntrySerializer(entries, many=True)
+        return {
+            'results': serialized.data,
+            'total_count': len(entries),
+            'total_size': self._build_size_summary(entries),
+        }
 
-    def _get_image_size_bytes(self, image_field) -> Optional[int]:
-        """Rasm hajmini bayt'larda olish"""
-        if not image_field:
-            return None
-        try:
-            if hasattr(image_field, 'file') and image_field.file:
-                return image_field.file.size
-        except Exception:
-            pass
-        return None
-    
-    def _get_image_size(self, image_field) -> Optional[str]:
-        """Rasm hajmini olish (KB yoki MB formatida)"""
-        size_bytes = self._get_image_size_bytes(image_field)
-        if size_bytes is None:
-            return None
-        if size_bytes >= 1024 * 1024:  # MB
-            return f"{size_bytes / (1024 * 1024):.2f} MB"
-        elif size_bytes >= 1024:  # KB
-            return f"{size_bytes / 1024:.2f} KB"
-        else:  # Bytes
-            return f"{size_bytes} B"
-    
     def _format_size(self, size_bytes: int) -> str:
         """Bayt'larni KB yoki MB formatiga aylantirish"""
-        if size_bytes >= 1024 * 1024:  # MB
-            return f"{size_bytes / (1024 * 1024):.2f} MB"
-        elif size_bytes >= 1024:  # KB
-            return f"{size_bytes / 1024:.2f} KB"
-        else:  # Bytes
-            return f"{size_bytes} B"
-    
+        return format_size(size_bytes or 0)
+
     def _get_thumbnail_dimensions(self, image_obj):
-        """Thumbnail rasm o'lchamlari va hajmini olish"""
-        try:
-            thumb = image_obj.image_thumbnail
-            if not thumb:
-                return None
-            size_str = self._get_image_size(thumb)
-            return {
-                'width': 150,
-                'height': 150,
-                'format': 'JPEG',
-                'size': size_str
-            }
-        except Exception:
-            pass
-        return None
-    
+        """Thumbnail o'lchamlari - faqat DB'dagi metama'lumotlardan"""
+        if image_obj.thumbnail_size_bytes is None:
+            return None
+        return {
+            'width': image_obj.thumbnail_width,
+            'height': image_obj.thumbnail_height,
+            'format': 'JPEG',
+            'size': format_size(image_obj.thumbnail_size_bytes),
+        }
+
     def _get_original_dimensions(self, image_obj):
-        """Original rasm o'lchamlari va hajmini olish"""
-        try:
-            if not image_obj.image:
-                return None
-            from PIL import Image as PILImage
-            with PILImage.open(image_obj.image.file) as img:
-                file_size = 0
-                if hasattr(image_obj.image.file, 'size'):
-                    file_size = image_obj.image.file.size
-                elif hasattr(image_obj.image, 'size'):
-                    file_size = image_obj.image.size
-                
-                # KB yoki MB ga aylantirish
-                if file_size >= 1024 * 1024:  # MB
-                    size_str = f"{file_size / (1024 * 1024):.2f} MB"
-                elif file_size >= 1024:  # KB
-                    size_str = f"{file_size / 1024:.2f} KB"
-                else:  # Bytes
-                    size_str = f"{file_size} B"
-                
-                return {
-                    'width': img.width,
-                    'height': img.height,
-                    'format': img.format or 'JPEG',
-                    'size_bytes': file_size,
-                    'size': size_str
-                }
-        except Exception:
-            pass
-        return None
+        """Original rasm o'lchamlari - faqat DB'dagi metama'lumotlardan"""
+        if image_obj.width is None:
+            return None
+        return {
+            'width': image_obj.width,
+            'height': image_obj.height,
+            'format': image_obj.format or 'JPEG',
+            'size_bytes': image_obj.size_bytes,
+            'size': format_size(image_obj.size_bytes),
+        }
 
-    def _build_entry(self, request, entity_type, entity, image, code_attr):
+    def _build_entry(self, ctx, entity_type, entity, image, code_attr):
         status_obj = getattr(image, 'status', None)
         source_obj = getattr(image, 'source', None)
         code_value = getattr(entity, code_attr, None)
         if not code_value:
             code_value = ''
-        
-        # Rasm o'lchamlari va hajmini olish
-        thumbnail_dimensions = self._get_thumbnail_dimensions(image)
-        original_dimensions = self._get_original_dimensions(image)
-        
-        # Thumbnail va original hajmini bayt'larda olish (umumiy hajmni hisoblash uchun)
-        thumbnail_size_bytes = None
-        if thumbnail_dimensions and 'size' in thumbnail_dimensions:
-            # size_str dan bayt'larni olish (agar mavjud bo'lsa)
-            try:
-                thumb = image.image_thumbnail
-                if thumb and hasattr(thumb, 'file') and thumb.file:
-                    thumbnail_size_bytes = thumb.file.size
-            except Exception:
-                pass
-        
-        original_size_bytes = None
-        if original_dimensions and 'size_bytes' in original_dimensions:
-            original_size_bytes = original_dimensions['size_bytes']
-        
+
         return {
             'entity_type': entity_type,
             'entity_id': entity.id,
             'code_1c': code_value,
             'entity_name': getattr(entity, 'name', str(entity)),
             'image_id': image.id,
-            'thumbnail_url': self._absolute_url(request, image),
-            'thumbnail_dimensions': thumbnail_dimensions,
-            'original_dimensions': original_dimensions,
-            'thumbnail_size_bytes': thumbnail_size_bytes,  # Umumiy hajmni hisoblash uchun
-            'original_size_bytes': original_size_bytes,  # Umumiy hajmni hisoblash uchun
+            'thumbnail_url': self._absolute_url(ctx, image),
+            'placeholder': image.placeholder,
+            'thumbnail_dimensions': self._get_thumbnail_dimensions(image),
+            'original_dimensions': self._get_original_dimensions(image),
+            'thumbnail_size_bytes': image.thumbnail_size_bytes,  # Umumiy hajmni hisoblash uchun
+            'original_size_bytes': image.size_bytes,  # Umumiy hajmni hisoblash uchun
             'is_main': image.is_main,
             'category': image.category or None,
             'note': image.note or None,
@@ -1190,17 +1573,14 @@ class ThumbnailFeedMixin:
         }
 
     @staticmethod
-    def _absolute_url(request, image_obj):
-        try:
-            thumb = image_obj.image_thumbnail
-        except Exception:  # noqa: BLE001 - imagekit throws RuntimeError when image absent
-            return None
-        if not thumb:
+    def _absolute_url(ctx, image_obj):
+        # Thumbnail tayyor bo'lmasa original URL qaytadi - request ichida generatsiya yo'q
+        url = rendition_url(image_obj, 'image_thumbnail', webp=ctx.webp if ctx else False)
+        if not url:
             return None
-        url = thumb.url
-        if not request:
+        if not ctx:
             return url
-        return request.build_absolute_uri(url)
+        return ctx.absolute_url(url)
 
 
 @extend_schema(
@@ -1239,6 +1619,12 @@ class ThumbnailFeedMixin:
             required=False,
             description="Qaytariladigan maksimal elementlar soni (default: 60, max: 200)",
         ),
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.STR,
+            required=False,
+            description="Keyingi sahifa uchun oldingi javobdagi `next_cursor` qiymati",
+        ),
     ],
     responses={
         200: inline_serializer(
@@ -1246,6 +1632,8 @@ class ThumbnailFeedMixin:
             fields={
                 'results': ThumbnailEntrySerializer(many=True),
                 'total_count': serializers.IntegerField(),
+                'next_cursor': serializers.CharField(allow_null=True),
+                'has_more': serializers.BooleanField(),
                 'total_size': inline_serializer(
                     name='TotalSizeSummary',
                     fields={
@@ -1269,20 +1657,49 @@ class ThumbnailFeedMixin:
         )
     }
 )
-@method_decorator(cache_page(180), name='get')  # Cache for 3 minutes
 class ThumbnailFeedView(ThumbnailFeedMixin, APIView):
-    """Birlashtirilgan thumbnail feed (project/client/nomenklatura) - Cached"""
+    """Birlashtirilgan thumbnail feed (project/client/nomenklatura) - umumiy (Redis) keshda"""
 
     permission_classes = [AllowAny]
 
+    # Birlashtirilgan tartib: (created_at DESC, entity turi, id DESC) - cursor barqarorligi uchun o'zgarmas
+    FEED_TYPE_ORDER = ('project', 'client', 'nomenklatura')
+
+    @staticmethod
+    def _encode_cursor(entry_type_rank, image):
+        raw = json.dumps([image.created_at.isoformat(), entry_type_rank, image.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(raw):
+        """Cursor -> (created_at, type_rank, id). Noto'g'ri bo'lsa ValueError."""
+        try:
+            padded = raw + '=' * (-len(raw) % 4)
+            created_at_raw, rank, image_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            created_at = parse_datetime(created_at_raw)
+            if created_at is None:
+                raise ValueError('created_at')
+            return created_at, int(rank), int(image_id)
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error) as exc:
+            raise ValueError(str(exc))
+
+    @staticmethod
+    def _after_cursor(qs, rank, cursor):
+        """Keyset sharti: cursor'dan keyin (kichik) keladigan yozuvlar"""
+        created_at, cursor_rank, cursor_id = cursor
+        if rank < cursor_rank:
+            return qs.filter(created_at__lt=created_at)
+        if rank > cursor_rank:
+            return qs.filter(created_at__lte=created_at)
+        return qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=cursor_id))
+
+    @staticmethod
+    def _feed_stream(qs, rank, entity_type):
+        """Merge uchun (created_at, -rank, id, rank, entity_type, image) kortejlari"""
+        for image in qs:
+            yield image.created_at, -rank, image.id, rank, entity_type, image
+
     def get(self, request):
-        # Cache key based on query parameters AND user to respect regional filtering
-        user_id = request.user.id if request.user.is_authenticated else 'anonymous'
-        cache_key = f"thumbnail_feed_{user_id}_{hash(str(request.query_params))}"
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
         requested_types = self._parse_entity_types(request.query_params.get('entity_type'))
         limit = self._parse_limit(request.query_params.get('limit'))
         is_main = self._parse_bool(request.query_params.get('is_main'))
@@ -1291,55 +1708,72 @@ class ThumbnailFeedView(ThumbnailFeedMixin, APIView):
         client_code_1c = request.query_params.get('client_code_1c') or code_1c
         article_code = request.query_params.get('article_code')
 
-        per_type_limit = max(limit, 1)
-        entries = []
+        cursor = None
+        if request.query_params.get('cursor'):
+            try:
+                cursor = self._decode_cursor(request.query_params['cursor'])
+            except ValueError:
+                return Response({'error': "cursor noto'g'ri."}, status=status.HTTP_400_BAD_REQUEST)
+
+        params = {
+            'entity_type': sorted(requested_types),
+            'limit': limit,
+            'is_main': is_main,
+            'status': status_code,
+            'code_1c': code_1c,
+            'client_code_1c': client_code_1c,
+            'article_code': article_code,
+            'cursor': request.query_params.get('cursor'),
+        }
+        return self._cached_feed(
+            request,
+            'thumbnail_feed',
+            params,
+            lambda feed, ctx: feed._build_feed(
+                ctx, requested_types, limit, is_main, status_code, code_1c, client_code_1c, article_code, cursor
+            ),
+            tags=self._feed_tags(*requested_types),
+        )
+
+    def _build_feed(self, ctx, requested_types, limit, is_main, status_code, code_1c, client_code_1c, article_code, cursor):
+        querysets = {
+            'project': lambda: self._project_image_queryset(ctx, is_main, status_code, code_1c=code_1c),
+            'client': lambda: self._client_image_queryset(ctx, is_main, status_code, client_code_1c=client_code_1c),
+            'nomenklatura': lambda: self._nomenklatura_image_queryset(
+                ctx, is_main, status_code, code_1c=code_1c, article_code=article_code
+            ),
+        }
 
-        if 'project' in requested_types:
-            entries.extend(
-                self._collect_project_thumbnails(request, per_type_limit, is_main, status_code, code_1c=code_1c)
-            )
-        if 'client' in requested_types:
-            entries.extend(
-                self._collect_client_thumbnails(request, per_type_limit, is_main, status_code, client_code_1c=client_code_1c)
-            )
-        if 'nomenklatura' in requested_types:
-            entries.extend(
-                self._collect_nomenklatura_thumbnails(request, per_type_limit, is_main, status_code, code_1c=code_1c, article_code=article_code)
-            )
+        # Har bir tur o'z (created_at, id) indeksi bo'yicha keyset bilan limit+1 tagacha o'qiladi,
+        # so'ng k-way merge qilinadi; entry faqat sahifaga tushgan qatorlar uchun quriladi.
+        streams = []
+        for rank, entity_type in enumerate(self.FEED_TYPE_ORDER):
+            if entity_type not in requested_types:
+                continue
+            qs = querysets[entity_type]()
+            if cursor:
+                qs = self._after_cursor(qs, rank, cursor)
+            streams.append(self._feed_stream(qs[:limit + 1], rank, entity_type))
+
+        merged = heapq.merge(*streams, key=lambda item: item[:3], reverse=True)
+        page = list(itertools.islice(merged, limit + 1))
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        final_entries = [self._build_typed_entry(ctx, entity_type, image) for *_, entity_type, image in page]
+        next_cursor = None
+        if has_more and page:
+            last = page[-1]
+            next_cursor = self._encode_cursor(last[3], last[5])
 
-        entries.sort(key=lambda item: item['created_at'], reverse=True)
-        final_entries = entries[:limit]
         serialized = ThumbnailEntrySerializer(final_entries, many=True)
-        
-        # Umumiy hajmni hisoblash
-        total_thumbnail_size_bytes = sum(
-            entry.get('thumbnail_size_bytes', 0) or 0 
-            for entry in final_entries
-        )
-        total_original_size_bytes = sum(
-            entry.get('original_size_bytes', 0) or 0 
-            for entry in final_entries
-        )
-        
-        response_data = {
+        return {
             'results': serialized.data,
             'total_count': len(final_entries),
-            'total_size': {
-                'thumbnail': {
-                    'size_bytes': total_thumbnail_size_bytes,
-                    'size': self._format_size(total_thumbnail_size_bytes)
-                },
-                'original': {
-                    'size_bytes': total_original_size_bytes,
-                    'size': self._format_size(total_original_size_bytes)
-                }
-            }
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total_size': self._build_size_summary(final_entries),
         }
-        
-        # Cache the response
-        cache.set(cache_key, response_data, 180)  # 3 minutes
-        
-        return Response(response_data, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -1382,35 +1816,16 @@ class ProjectThumbnailView(ThumbnailFeedMixin, APIView):
         status_code = request.query_params.get('status')
         code_1c = request.query_params.get('code_1c')
 
-        entries = self._collect_project_thumbnails(request, limit, is_main, status_code, code_1c=code_1c)
-        serialized = ThumbnailEntrySerializer(entries, many=True)
-        
-        # Umumiy hajmni hisoblash
-        total_thumbnail_size_bytes = sum(
-            entry.get('thumbnail_size_bytes', 0) or 0 
-            for entry in entries
-        )
-        total_original_size_bytes = sum(
-            entry.get('original_size_bytes', 0) or 0 
-            for entry in entries
+        params = {'limit': limit, 'is_main': is_main, 'status': status_code, 'code_1c': code_1c}
+        return self._cached_feed(
+            request,
+            'thumbnail_feed_project',
+            params,
+            lambda feed, ctx: feed._build_entries_response(
+                feed._collect_project_thumbnails(ctx, limit, is_main, status_code, code_1c=code_1c)
+            ),
+            tags=self._feed_tags('project'),
         )
-        
-        response_data = {
-            'results': serialized.data,
-            'total_count': len(entries),
-            'total_size': {
-                'thumbnail': {
-                    'size_bytes': total_thumbnail_size_bytes,
-                    'size': self._format_size(total_thumbnail_size_bytes)
-                },
-                'original': {
-                    'size_bytes': total_original_size_bytes,
-                    'size': self._format_size(total_original_size_bytes)
-                }
-            }
-        }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -1454,44 +1869,29 @@ class ClientThumbnailView(ThumbnailFeedMixin, APIView):
         client_id = request.query_params.get('client_id')
         client_code_1c = request.query_params.get('client_code_1c')
 
-        entries = self._collect_client_thumbnails(
-            request=request,
-            limit=limit,
-            is_main=is_main,
-            status_code=status_code,
-            client_id=client_id,
-            client_code_1c=client_code_1c,
-        )
-        
-        # entries = self._collect_client_thumbnails(request, limit, is_main, status_code)
-        serialized = ThumbnailEntrySerializer(entries, many=True)
-        
-        # Umumiy hajmni hisoblash
-        total_thumbnail_size_bytes = sum(
-            entry.get('thumbnail_size_bytes', 0) or 0 
-            for entry in entries
-        )
-        total_original_size_bytes = sum(
-            entry.get('original_size_bytes', 0) or 0 
-            for entry in entries
-        )
-        
-        response_data = {
-            'results': serialized.data,
-            'total_count': len(entries),
-            'total_size': {
-                'thumbnail': {
-                    'size_bytes': total_thumbnail_size_bytes,
-                    'size': self._format_size(total_thumbnail_size_bytes)
-                },
-                'original': {
-                    'size_bytes': total_original_size_bytes,
-                    'size': self._format_size(total_original_size_bytes)
-                }
-            }
+        params = {
+            'limit': limit,
+            'is_main': is_main,
+            'status': status_code,
+            'client_id': client_id,
+            'client_code_1c': client_code_1c,
         }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+        return self._cached_feed(
+            request,
+            'thumbnail_feed_client',
+            params,
+            lambda feed, ctx: feed._build_entries_response(
+                feed._collect_client_thumbnails(
+                    ctx=ctx,
+                    limit=limit,
+                    is_main=is_main,
+                    status_code=status_code,
+                    client_id=client_id,
+                    client_code_1c=client_code_1c,
+                )
+            ),
+            tags=self._feed_tags('client'),
+        )
 
 
 @extend_schema(
@@ -1535,49 +1935,258 @@ class NomenklaturaThumbnailView(ThumbnailFeedMixin, APIView):
         code_1c = request.query_params.get('code_1c')
         article_code = request.query_params.get('article_code')
 
-        entries = self._collect_nomenklatura_thumbnails(request, limit, is_main, status_code, code_1c=code_1c, article_code=article_code)
-        serialized = ThumbnailEntrySerializer(entries, many=True)
-        
-        # Umumiy hajmni hisoblash
-        total_thumbnail_size_bytes = sum(
-            entry.get('thumbnail_size_bytes', 0) or 0 
-            for entry in entries
+        params = {'limit': limit, 'is_main': is_main, 'status': status_code, 'code_1c': code_1c, 'article_code': article_code}
+        return self._cached_feed(
+            request,
+            'thumbnail_feed_nomenklatura',
+            params,
+            lambda feed, ctx: feed._build_entries_response(
+                feed._collect_nomenklatura_thumbnails(
+                    ctx, limit, is_main, status_code, code_1c=code_1c, article_code=article_code
+                )
+            ),
+            tags=self._feed_tags('nomenklatura'),
         )
-        total_original_size_bytes = sum(
-            entry.get('original_size_bytes', 0) or 0 
-            for entry in entries
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """`?format=` DRF renderer tanlovi uchun emas, rasm formati uchun ishlatiladi"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+@extend_schema(
+    tags=['Thumbnails'],
+    summary="Rasmni kerakli o'lchamga keltirish (on-demand resize)",
+    description=(
+        "Project, client yoki nomenklatura rasmini whitelist'dagi o'lchamga keltirib qaytaradi. "
+        "Natija LRU disk keshida saqlanadi. `v` parametri rasmning joriy versiyasiga (content hash "
+        "prefiksi) mos kelsa javob `immutable` sifatida keshlanadi."
+    ),
+    parameters=[
+        OpenApiParameter('width', OpenApiTypes.INT, description="Kenglik (px, whitelist)", required=False),
+        OpenApiParameter('height', OpenApiTypes.INT, description="Balandlik (px, whitelist)", required=False),
+        OpenApiParameter('fit', OpenApiTypes.STR, enum=['cover', 'contain'], description="Default: cover", required=False),
+        OpenApiParameter('format', OpenApiTypes.STR, enum=['jpeg', 'webp', 'png'], description="Default: Accept bo'yicha webp yoki jpeg", required=False),
+        OpenApiParameter('v', OpenApiTypes.STR, description="Rasm versiyasi (content hash prefiksi)", required=False),
+    ],
+    responses={
+        (200, 'image/*'): OpenApiTypes.BINARY,
+        304: OpenApiResponse(description="O'zgarmagan (ETag)"),
+        400: OpenApiResponse(description="Noto'g'ri parametrlar"),
+        404: OpenApiResponse(description="Rasm topilmadi"),
+    },
+)
+class ImageResizeView(APIView):
+    permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    IMAGE_MODELS = {
+        'project': ProjectImage,
+        'client': ClientImage,
+        'nomenklatura': NomenklaturaImage,
+    }
+    IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+    MUTABLE_MAX_AGE = 300
+    VERSION_LENGTH = 12
+
+    def get(self, request, entity_type, image_id):
+        model = self.IMAGE_MODELS.get(entity_type)
+        if model is None:
+            return Response({'error': "entity_type project, client yoki nomenklatura bo'lishi kerak"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            width, height, fit, output = parse_resize_params(
+                request.query_params, default_format='webp' if prefers_webp(request) else 'jpeg'
+            )
+        except ResizeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        image = model.objects.filter(pk=image_id, is_deleted=False).exclude(image='').only(
+            'id', 'image', 'content_hash'
+        ).first()
+        if image is None:
+            return Response({'error': 'Rasm topilmadi'}, status=status.HTTP_404_NOT_FOUND)
+
+        source_key = image.content_hash or image.image.name
+        try:
+            path, key = resize_get_or_create(
+                source_key, lambda: image.image.open('rb'), width, height, fit, output
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Resize failed ({entity_type} #{image_id}): {e}")
+            return Response({'error': "Rasmni o'qib bo'lmadi"}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{key[:32]}"'
+        version = (request.query_params.get('v') or '').strip()
+        immutable = bool(version) and source_key.startswith(version) and len(version) >= 8
+        if immutable:
+            cache_control = f'public, max-age={self.IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            cache_control = f'public, max-age={self.MUTABLE_MAX_AGE}'
+
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=RESIZE_OUTPUT_FORMATS[output][1])
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        if not request.query_params.get('format'):
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+
+@extend_schema(
+    tags=['Thumbnails'],
+    summary="Thumbnail sprite sheet (katalog gridi uchun)",
+    description=(
+        "Bir sahifadagi nomenklatura, client yoki project rasmlarini bitta sprite rasmga yig'adi va "
+        "har bir rasmning koordinatalarini qaytaradi. Sprite rasm id'lari va versiyalari bo'yicha "
+        "keshlanadi; `sprite_url` o'zgarmas (immutable) fayl. Rasmlar `ids` bo'yicha yoki feed "
+        "filtrlari + `limit`/`offset` sahifasi bo'yicha tanlanadi."
+    ),
+    parameters=[
+        OpenApiParameter('entity_type', OpenApiTypes.STR, enum=['nomenklatura', 'client', 'project'], description="Default: nomenklatura", required=False),
+        OpenApiParameter('ids', OpenApiTypes.STR, description="Vergul bilan ajratilgan rasm id'lari (tartib saqlanadi)", required=False),
+        OpenApiParameter('cell', OpenApiTypes.INT, description="Katak o'lchami (px, whitelist). Default: 150", required=False),
+        OpenApiParameter('columns', OpenApiTypes.INT, description="Ustunlar soni (default: 10, max: 20)", required=False),
+        OpenApiParameter('limit', OpenApiTypes.INT, description="Sahifadagi rasmlar soni (default: 60, max: IMAGE_SPRITE_MAX_ITEMS)", required=False),
+        OpenApiParameter('offset', OpenApiTypes.INT, description="Sahifa boshi", required=False),
+        OpenApiParameter('format', OpenApiTypes.STR, enum=['jpeg', 'webp', 'png'], description="Default: Accept bo'yicha webp yoki jpeg", required=False),
+        OpenApiParameter('is_main', OpenApiTypes.BOOL, required=False),
+        OpenApiParameter('status', OpenApiTypes.STR, required=False),
+        OpenApiParameter('code_1c', OpenApiTypes.STR, description="Nomenklatura yoki project kodi", required=False),
+        OpenApiParameter('article_code', OpenApiTypes.STR, required=False),
+        OpenApiParameter('client_id', OpenApiTypes.INT, required=False),
+        OpenApiParameter('client_code_1c', OpenApiTypes.STR, required=False),
+    ],
+    responses={
+        200: inline_serializer(
+            name='ThumbnailSpriteResponse',
+            fields={
+                'key': serializers.CharField(),
+                'sprite_url': serializers.CharField(),
+                'format': serializers.CharField(),
+                'cell': serializers.IntegerField(),
+                'columns': serializers.IntegerField(),
+                'width': serializers.IntegerField(),
+                'height': serializers.IntegerField(),
+                'total_count': serializers.IntegerField(),
+                'items': serializers.ListField(child=serializers.DictField()),
+            },
+        ),
+        400: OpenApiResponse(description="Noto'g'ri parametrlar"),
+    },
+)
+class ThumbnailSpriteView(ThumbnailFeedMixin, APIView):
+    permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    DEFAULT_CELL = 150
+    DEFAULT_COLUMNS = 10
+    MAX_COLUMNS = 20
+
+    @staticmethod
+    def _parse_int(raw, default, minimum=0):
+        try:
+            return max(minimum, int(raw)) if raw not in (None, '') else default
+        except (TypeError, ValueError):
+            return default
+
+    def _get_queryset(self, request, entity_type):
+        params = request.query_params
+        ctx = FeedContext.from_request(request)
+        is_main = self._parse_bool(params.get('is_main'))
+        status_code = params.get('status')
+        if entity_type == 'client':
+            return self._client_image_queryset(
+                ctx, is_main, status_code,
+                client_id=params.get('client_id'), client_code_1c=params.get('client_code_1c'),
+            )
+        if entity_type == 'project':
+            return self._project_image_queryset(ctx, is_main, status_code, code_1c=params.get('code_1c'))
+        return self._nomenklatura_image_queryset(
+            ctx, is_main, status_code,
+            code_1c=params.get('code_1c'), article_code=params.get('article_code'),
         )
-        
-        response_data = {
-            'results': serialized.data,
-            'total_count': len(entries),
-            'total_size': {
-                'thumbnail': {
-                    'size_bytes': total_thumbnail_size_bytes,
-                    'size': self._format_size(total_thumbnail_size_bytes)
-                },
-                'original': {
-                    'size_bytes': total_original_size_bytes,
-                    'size': self._format_size(total_original_size_bytes)
-                }
-            }
-        }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+
+    def get(self, request):
+        params = request.query_params
+        entity_type = (params.get('entity_type') or 'nomenklatura').lower()
+        if entity_type not in self.ENTITY_ATTRS:
+            return Response({'error': "entity_type project, client yoki nomenklatura bo'lishi kerak"}, status=status.HTTP_400_BAD_REQUEST)
+        cell = self._parse_int(params.get('cell'), self.DEFAULT_CELL)
+        if cell not in settings.IMAGE_SPRITE_CELL_SIZES:
+            return Response({'error': f"cell ruxsat etilgan o'lchamlardan biri bo'lishi kerak: {settings.IMAGE_SPRITE_CELL_SIZES}"}, status=status.HTTP_400_BAD_REQUEST)
+        columns = min(self._parse_int(params.get('columns'), self.DEFAULT_COLUMNS, minimum=1), self.MAX_COLUMNS)
+        output = (params.get('format') or ('webp' if prefers_webp(request) else 'jpeg')).lower()
+        output = 'jpeg' if output == 'jpg' else output
+        if output not in RESIZE_OUTPUT_FORMATS:
+            return Response({'error': f"format quyidagilardan biri bo'lishi kerak: {', '.join(RESIZE_OUTPUT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.IMAGE_SPRITE_MAX_ITEMS
+        queryset = self._get_queryset(request, entity_type).exclude(image='')
+        if params.get('ids'):
+            try:
+                ids = [int(part) for part in params['ids'].split(',') if part.strip()]
+            except ValueError:
+                return Response({'error': "ids butun sonlar ro'yxati bo'lishi kerak"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(ids) > max_items:
+                return Response({'error': f"ids soni {max_items} tadan oshmasligi kerak"}, status=status.HTTP_400_BAD_REQUEST)
+            by_id = {image.pk: image for image in queryset.filter(pk__in=ids)}
+            images = [by_id[pk] for pk in dict.fromkeys(ids) if pk in by_id]
+        else:
+            limit = min(self._parse_limit(params.get('limit')), max_items)
+            offset = self._parse_int(params.get('offset'), 0)
+            images = list(queryset[offset:offset + limit])
+
+        if not images:
+            return Response({
+                'key': None, 'sprite_url': None, 'format': output, 'cell': cell, 'columns': columns,
+                'width': 0, 'height': 0, 'total_count': 0, 'items': [],
+            }, status=status.HTTP_200_OK)
+
+        sprite = get_or_create_sprite(entity_type, images, cell, columns, output)
+        entity_attr, code_attr = self.ENTITY_ATTRS[entity_type]
+        by_id = {image.pk: image for image in images}
+        items = []
+        for frame in sprite['frames']:
+            image = by_id[frame['id']]
+            entity = getattr(image, entity_attr)
+            items.append({
+                **frame,
+                'entity_id': entity.pk,
+                'code': getattr(entity, code_attr, None),
+                'placeholder': image.placeholder,
+            })
+        return Response({
+            'key': sprite['key'],
+            'sprite_url': request.build_absolute_uri(default_storage.url(sprite['name'])),
+            'format': output,
+            'cell': cell,
+            'columns': columns,
+            'width': sprite['width'],
+            'height': sprite['height'],
+            'total_count': len(items),
+            'items': items,
+        }, status=status.HTTP_200_OK)
+
 
 class ClearDatabaseView(APIView):
     """
     Adminlar uchun bazani tozalash messodi.
-    Tanlangan table'lardagi barcha ma'lumotlarni o'chirib tashlaydi.
+    Tanlangan table'lardagi barcha ma'lumotlarni fon rejimida o'chiradi (batch DELETE / TRUNCATE),
+    media fayllar DB bosqichidan keyin tozalanadi. Javob darhol job id bilan qaytadi.
     """
     permission_classes = [IsAuthenticated, IsAdminUser]
 
-    def post(self, request):
-        # Import visit models
+    @staticmethod
+    def _models_map():
         from visits.models import Visit, VisitPlan, VisitImage as VImage
-        
-        # Model mapping
-        MODELS_MAP = {
+
+        return {
             'client': Client,
             'client_image': ClientImage,
             'nomenklatura': Nomenklatura,
@@ -1592,31 +2201,67 @@ class ClearDatabaseView(APIView):
             'image_status': ImageStatus,
         }
 
+    @staticmethod
+    def _job_payload(request, job):
+        return {
+            'job_id': job.pk,
+            'status': job.status,
+            'tables': job.tables,
+            'total_rows': job.total_rows,
+            'deleted_rows': job.deleted_rows,
+            'progress': min(100, round(job.deleted_rows * 100 / job.total_rows)) if job.total_rows else (
+                100 if job.status != 'processing' else 0
+            ),
+            'stats': job.stats,
+            'errors': job.errors_json,
+            'media_status': job.media_status,
+            'media_deleted': job.media_deleted,
+            'finished_at': job.finished_at,
+            'status_url': request.build_absolute_uri(reverse('clear-database-job', args=[job.pk])),
+        }
+
+    @extend_schema(
+        tags=['Admin'],
+        summary="Tozalash jarayoni holati",
+        description="`job_id` berilmasa oxirgi 20 ta tozalash jarayoni qaytariladi.",
+        responses={200: OpenApiResponse(description="Job holati va progress")},
+    )
+    def get(self, request, job_id=None):
+        if job_id is None:
+            jobs = ClearDatabaseJob.objects.all()[:20]
+            return Response([self._job_payload(request, job) for job in jobs])
+        job = get_object_or_404(ClearDatabaseJob, pk=job_id)
+        return Response(self._job_payload(request, job))
+
+    @extend_schema(
+        tags=['Admin'],
+        summary="Tanlangan table'larni tozalash (fon rejimida)",
+        request=inline_serializer(
+            name='ClearDatabasePayload',
+            fields={'models': serializers.ListField(child=serializers.CharField())},
+        ),
+        responses={
+            202: OpenApiResponse(description="Tozalash boshlandi (job_id, status_url)"),
+            400: OpenApiResponse(description="Table tanlanmagan yoki noma'lum"),
+        },
+    )
+    def post(self, request, job_id=None):
+        models_map = self._models_map()
         selected_models = request.data.get('models', [])
         if not selected_models:
             return Response(
                 {'error': 'Hech qanday table tanlanmadi'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        unknown = [key for key in selected_models if key not in models_map]
+        if unknown:
+            return Response(
+                {'error': f"Noma'lum table'lar: {', '.join(map(str, unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        stats = {}
-        errors = []
-
-        # Transaction bilan o'rash tavsiya etiladi, lekin bu "dangerous" operation
-        # shuning uchun har biri alohida o'chgani ma'qul bo'lishi mumkin (partial success).
-        
-        for key in selected_models:
-            model = MODELS_MAP.get(key)
-            if model:
-                try:
-                    # cascade delete bo'ladi
-                    count, _ = model.objects.all().delete()
-                    stats[key] = count
-                except Exception as e:
-                    errors.append(f"{key}: {str(e)}")
-        
-        return Response({
-            'message': 'Tozalash yakunlandi',
-            'stats': stats,
-            'errors': errors
-        })
+        job = start_clear_database(list(dict.fromkeys(selected_models)), models_map, request.user)
+        return Response(
+            {'message': 'Tozalash boshlandi', **self._job_payload(request, job)},
+            status=status.HTTP_202_ACCEPTED,
+        )
@@ -1,18 +1,18 @@
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from jwt import decode as jwt_decode
-from django.conf import settings
 from urllib.parse import parse_qs
+from users.tokens import principal_from_token
 
 User = get_user_model()
 
 @database_sync_to_async
 def get_user(user_id):
     try:
-        return User.objects.get(id=user_id)
+        return User.objects.get(id=user_id, is_active=True)
     except User.DoesNotExist:
         return AnonymousUser()
 
@@ -49,14 +49,15 @@ class JwtAuthMiddleware:
         if token:
             try:
                 # This will automatically validate the token and raise an error if invalid
-                UntypedToken(token)
-                
-                # Decode the token to get the user ID
-                decoded_data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-                # SimpleJWT uses 'user_id' by default
-                user_id = decoded_data.get("user_id")
-                
-                if user_id:
+                validated_token = UntypedToken(token)
+
+                # Oddiy foydalanuvchi - token claim'laridan (bazasiz), staff/admin - bazadan
+                user = await database_sync_to_async(principal_from_token)(validated_token)
+                user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+
+                if user is not None:
+                    scope["user"] = user
+                elif user_id:
                     scope["user"] = await get_user(user_id)
                 else:
                     scope["user"] = AnonymousUser()
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0012_client_business_region_code_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientimage',
+            name='format',
+            field=models.CharField(blank=True, default='', help_text='Original format (JPEG, PNG, ...)', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='clientimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, help_text='Original balandlik (px)', null=True),
+        ),
+        migrations.AddField(
+            model_name='clientimage',
+            name='size_bytes',
+            field=models.BigIntegerField(blank=True, help_text='Original hajmi (bayt)', null=True),
+        ),
+        migrations.AddField(
+            model_name='clientimage',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, help_text='Thumbnail balandligi (px)', null=True),
+        ),
+        migrations.AddField(
+            model_name='clientimage',
+            name='thumbnail_size_bytes',
+            field=models.BigIntegerField(blank=True, help_text='Thumbnail hajmi (bayt)', null=True),
+        ),
+        migrations.AddField(
+            model_name='clientimage',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, help_text='Thumbnail kengligi (px)', null=True),
+        ),
+        migrations.AddField(
+            model_name='clientimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, help_text='Original kenglik (px)', null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:30
+
+import utils.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0014_clientimage_renditions_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Rasm faylining SHA-256 xeshi (blob)', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='clientimage',
+            name='image',
+            field=models.ImageField(storage=utils.storage.get_image_storage, upload_to='clients/'),
+        ),
+    ]
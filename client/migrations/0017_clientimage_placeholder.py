@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0016_clientimage_is_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientimage',
+            name='placeholder',
+            field=models.TextField(blank=True, help_text="LQIP: kichik (16px) JPEG base64 data URI, thumbnail yuklanguncha ko'rsatiladi", null=True),
+        ),
+    ]
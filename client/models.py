@@ -2,6 +2,9 @@ from django.db import models
 from ckeditor.fields import RichTextField
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
+from utils.images import has_new_image, prepare_new_image
+from utils.renditions import schedule_renditions
+from utils.storage import get_image_storage
 
 # Create your models here.
 class BaseModel(models.Model):
@@ -87,7 +90,9 @@ class Client(BaseModel):
 
 class ClientImage(BaseModel):
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='images', db_index=True)
-    image = models.ImageField(upload_to='clients/')
+    image = models.ImageField(upload_to='clients/', storage=get_image_storage)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, help_text="Rasm faylining SHA-256 xeshi (blob)")
+    is_normalized = models.BooleanField(default=False, help_text="Original project siyosati bo'yicha normalize qilinganmi")
     is_main = models.BooleanField(default=False, db_index=True)
     category = models.CharField(
         max_length=120,
@@ -120,6 +125,17 @@ class ClientImage(BaseModel):
         help_text="Rasmni yuboruvchi ma'lumotlari"
     )
     
+    # Metama'lumotlar (yuklash/rendition vaqtida bir marta hisoblanadi)
+    width = models.PositiveIntegerField(null=True, blank=True, help_text="Original kenglik (px)")
+    height = models.PositiveIntegerField(null=True, blank=True, help_text="Original balandlik (px)")
+    format = models.CharField(max_length=10, blank=True, default='', help_text="Original format (JPEG, PNG, ...)")
+    size_bytes = models.BigIntegerField(null=True, blank=True, help_text="Original hajmi (bayt)")
+    thumbnail_width = models.PositiveIntegerField(null=True, blank=True, help_text="Thumbnail kengligi (px)")
+    thumbnail_height = models.PositiveIntegerField(null=True, blank=True, help_text="Thumbnail balandligi (px)")
+    thumbnail_size_bytes = models.BigIntegerField(null=True, blank=True, help_text="Thumbnail hajmi (bayt)")
+    placeholder = models.TextField(null=True, blank=True, help_text="LQIP: kichik (16px) JPEG base64 data URI, thumbnail yuklanguncha ko'rsatiladi")
+    renditions_ready = models.BooleanField(default=False, help_text="image_thumbnail/sm/md/lg fonda yaratib bo'lindimi")
+
     # Turli o'lchamlarda rasmlar
     image_sm = ImageSpecField(
         source='image',
@@ -146,6 +162,32 @@ class ClientImage(BaseModel):
         options={'quality': 80}
     )
 
+    # WebP variantlari (Accept: image/webp yoki ?webp=1 bo'lsa qaytariladi)
+    image_sm_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(300, 300)],
+        format='WEBP',
+        options={'quality': 80}
+    )
+    image_md_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(600, 600)],
+        format='WEBP',
+        options={'quality': 80}
+    )
+    image_lg_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(1200, 1200)],
+        format='WEBP',
+        options={'quality': 85}
+    )
+    image_thumbnail_webp = ImageSpecField(
+        source='image',
+        processors=[ResizeToFill(150, 150)],
+        format='WEBP',
+        options={'quality': 75}
+    )
+
     def __str__(self):
         return self.client.name
     
@@ -158,6 +200,10 @@ class ClientImage(BaseModel):
             models.Index(fields=['created_at', 'is_deleted']),
         ]
 
+    def get_project(self):
+        """Normalize siyosati olinadigan api.Project"""
+        return self.client.project if self.client_id else None
+
     def save(self, *args, **kwargs):
         if self.is_main:
             # Ushbu client uchun boshqa barcha rasmlarni is_main=False qilish
@@ -165,4 +211,9 @@ class ClientImage(BaseModel):
                 client=self.client, 
                 is_main=True
             ).exclude(pk=self.pk).update(is_main=False)
+
+        needs_renditions = has_new_image(self) and prepare_new_image(self)
         super().save(*args, **kwargs)
+        if needs_renditions:
+            # Rendition'lar request ichida emas, fon pool'da yaratiladi
+            schedule_renditions(self)
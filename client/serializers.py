@@ -6,6 +6,8 @@ from PIL import Image
 from api.serializers import ImageStatusSerializer, ImageSourceSerializer, ProjectSerializer, ProjectSimpleSerializer, ProjectNestedSerializer
 from api.models import ImageStatus, ImageSource, Project
 from .models import Client, ClientImage
+from utils.refdata import reference_data
+from utils.renditions import prefers_webp, rendition_url
 
 class ClientImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
@@ -13,9 +15,9 @@ class ClientImageSerializer(serializers.ModelSerializer):
     image_md_url = serializers.SerializerMethodField()
     image_lg_url = serializers.SerializerMethodField()
     image_thumbnail_url = serializers.SerializerMethodField()
-    status = ImageStatusSerializer(read_only=True)
+    status = ImageStatusSerializer(source='status_id', read_only=True)
     status_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
-    source = ImageSourceSerializer(read_only=True)
+    source = ImageSourceSerializer(source='source_id', read_only=True)
     source_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     project = ProjectNestedSerializer(source='client.project', read_only=True)
     client_code_1c = serializers.CharField(source='client.client_code_1c', read_only=True)
@@ -35,6 +37,7 @@ class ClientImageSerializer(serializers.ModelSerializer):
             'image_md_url',
             'image_lg_url',
             'image_thumbnail_url',
+            'placeholder',
             'is_main',
             'status',
             'status_id',
@@ -42,7 +45,7 @@ class ClientImageSerializer(serializers.ModelSerializer):
             'source_id',
             'created_at',
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'placeholder', 'created_at']
     
     def create(self, validated_data):
         """Create qilganda status_id va source_id ni to'g'ri ishlatish"""
@@ -52,16 +55,10 @@ class ClientImageSerializer(serializers.ModelSerializer):
         instance = super().create(validated_data)
         
         if status_id:
-            try:
-                instance.status = ImageStatus.objects.get(id=status_id, is_deleted=False)
-            except ImageStatus.DoesNotExist:
-                pass
+            instance.status = reference_data.get(ImageStatus, status_id)
         
         if source_id:
-            try:
-                instance.source = ImageSource.objects.get(id=source_id, is_deleted=False)
-            except ImageSource.DoesNotExist:
-                pass
+            instance.source = reference_data.get(ImageSource, source_id)
         
         instance.save()
         return instance
@@ -74,22 +71,10 @@ class ClientImageSerializer(serializers.ModelSerializer):
         instance = super().update(instance, validated_data)
         
         if status_id is not None:
-            if status_id:
-                try:
-                    instance.status = ImageStatus.objects.get(id=status_id, is_deleted=False)
-                except ImageStatus.DoesNotExist:
-                    instance.status = None
-            else:
-                instance.status = None
+            instance.status = reference_data.get(ImageStatus, status_id)
         
         if source_id is not None:
-            if source_id:
-                try:
-                    instance.source = ImageSource.objects.get(id=source_id, is_deleted=False)
-                except ImageSource.DoesNotExist:
-                    instance.source = None
-            else:
-                instance.source = None
+            instance.source = reference_data.get(ImageSource, source_id)
         
         instance.save()
         return instance
@@ -105,38 +90,42 @@ class ClientImageSerializer(serializers.ModelSerializer):
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_sm_url(self, obj) -> Optional[str]:
-        if obj.image_sm:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_sm', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_sm.url)
-            return obj.image_sm.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_md_url(self, obj) -> Optional[str]:
-        if obj.image_md:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_md', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_md.url)
-            return obj.image_md.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_lg_url(self, obj) -> Optional[str]:
-        if obj.image_lg:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_lg', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_lg.url)
-            return obj.image_lg.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_thumbnail_url(self, obj) -> Optional[str]:
-        if obj.image_thumbnail:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_thumbnail', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_thumbnail.url)
-            return obj.image_thumbnail.url
+                return request.build_absolute_uri(url)
+            return url
         return None
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -197,7 +186,8 @@ class ClientImageBulkUploadSerializer(serializers.Serializer):
     )
 
     images = serializers.ListField(
-        child=serializers.ImageField(),
+        # Rasmlar upload pipeline'da parallel tekshiriladi va dekodlanadi
+        child=serializers.FileField(),
         allow_empty=False,
         help_text="Multipart form-data formatidagi bir yoki bir nechta rasm fayllari",
     )
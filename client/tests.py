@@ -34,3 +34,70 @@ class ClientAPITestCase(TestCase):
         response = self.client.get('/api/v1/client/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
+
+    def test_export_formats(self):
+        """Test client eksporti CSV, NDJSON va XLSX formatlarda oqim bilan qaytariladi"""
+        import json
+        from io import BytesIO
+        from openpyxl import load_workbook
+        from utils.excel import iterate_keyset
+
+        for idx in range(3):
+            Client.objects.create(client_code_1c=f'CLI00{idx}', name=f'Client {idx}')
+        self.assertEqual(
+            [obj.client_code_1c for obj in iterate_keyset(Client.objects.all(), chunk_size=2)],
+            ['CLI000', 'CLI001', 'CLI002'],
+        )
+
+        response = self.client.get('/api/v1/client/export/', {'file_format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertTrue(lines[0].startswith('client_code_1c,name,'))
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get('/api/v1/client/export/', {'file_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[1]['client_code_1c'], 'CLI001')
+
+        response = self.client.get('/api/v1/client/export-xlsx/')
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 4)
+        self.assertEqual(sheet['B3'].value, 'Client 1')
+
+        response = self.client.get('/api/v1/client/export/', {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClientRegionScopeTestCase(TestCase):
+    def setUp(self):
+        from api.models import Project
+        from users.models import AgentBusinessRegion, AuthProject
+        from utils.cache import local_cache
+        local_cache.clear()
+        auth_project = AuthProject.objects.create(
+            name='Evyap', project_code='evyap', wsdl_url='http://example.com/ws?wsdl',
+        )
+        project = Project.objects.create(code_1c='EVYAP', name='Evyap')
+        self.user = User.objects.create_user(username='agent', password='test')
+        profile = self.user.profile
+        profile.project = auth_project
+        profile.save()
+        AgentBusinessRegion.objects.create(profile=profile, code='R1', name='Region 1')
+        Client.objects.create(client_code_1c='C-1', name='Region 1 client', project=project, business_region_code='R1')
+        Client.objects.create(client_code_1c='C-2', name='Region 2 client', project=project, business_region_code='R2')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_agent_sees_only_region_clients(self):
+        """Test agent faqat o'z regionlaridagi clientlarni ko'radi (scope orqali)"""
+        from users.models import AgentBusinessRegion
+
+        response = self.client.get('/api/v1/client/')
+        self.assertEqual([row['client_code_1c'] for row in response.data['results']], ['C-1'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AgentBusinessRegion.objects.create(profile=self.user.profile, code='R2', name='Region 2')
+        # Scope so'rov davomida user obyektida saqlanadi - keyingi so'rov yangi obyekt bilan
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        response = self.client.get('/api/v1/client/')
+        self.assertEqual(sorted(row['client_code_1c'] for row in response.data['results']), ['C-1', 'C-2'])
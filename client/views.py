@@ -6,8 +6,7 @@ from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from drf_spectacular.types import OpenApiTypes
-from django.core.cache import cache
-from utils.cache import smart_cache_get, smart_cache_set, smart_cache_delete
+from utils.cache import entity_tags, invalidate_entity, smart_cache_get, smart_cache_set, smart_cache_delete
 from drf_spectacular.utils import (
     OpenApiExample,
     OpenApiParameter,
@@ -17,7 +16,17 @@ from drf_spectacular.utils import (
     inline_serializer,
 )
 from openpyxl import load_workbook
-from utils.excel import build_template_workbook, workbook_to_response, parse_bool_cell, clean_cell
+from utils.excel import (
+    EXPORT_FORMATS,
+    build_template_workbook,
+    clean_cell,
+    export_response,
+    parse_bool_cell,
+    parse_export_format,
+    workbook_to_response,
+)
+from utils.imports import BulkImporter, import_job_payload, start_excel_import
+from utils.record_import import RECORD_FORMATS, RecordImportError, import_records, parse_mapping
 from .models import Client, ClientImage
 from .serializers import ClientImageBulkUploadSerializer, ClientImageSerializer, ClientSerializer
 
@@ -97,6 +106,8 @@ class ClientImageFilterSet(django_filters.FilterSet):
 
 
 from utils.mixins import ProjectScopedMixin
+from utils.scope import get_principal_scope
+from utils.uploads import BulkImageUploader
 
 @extend_schema_view(
     list=extend_schema(
@@ -186,10 +197,9 @@ class ClientViewSet(viewsets.ModelViewSet):
         
         # Region-based filtering for agents
         if not user.is_anonymous and not user.is_staff:
-            from users.models import AgentBusinessRegion
-            region_codes = AgentBusinessRegion.objects.filter(profile__user=user).values_list('code', flat=True)
+            region_codes = get_principal_scope(user).region_codes
             if region_codes:
-                queryset = queryset.filter(business_region_code__in=list(region_codes))
+                queryset = queryset.filter(business_region_code__in=region_codes)
             else:
                 # If agent has no regions, they see nothing (safe default)
                 queryset = queryset.none()
@@ -215,6 +225,16 @@ class ClientViewSet(viewsets.ModelViewSet):
                 serializer.save()
         else:
             serializer.save()
+        invalidate_entity('client', serializer.instance.project_id)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_entity('client', serializer.instance.project_id)
+
+    def perform_destroy(self, instance):
+        project_id = instance.project_id
+        super().perform_destroy(instance)
+        invalidate_entity('client', project_id)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -266,6 +286,11 @@ class ClientViewSet(viewsets.ModelViewSet):
         normalized = [clean_cell(value).lower() for value in header_row[:len(expected)]]
         return normalized == expected, expected, normalized
 
+    def _export(self, request, export_format):
+        # Export uchun alohida queryset - prefetch_related kerak emas; yozuvlar keyset bo'yicha oqim bilan yoziladi
+        queryset = self.filter_queryset(Client.objects.filter(is_deleted=False))
+        return export_response(export_format, 'clients', 'Clients', self._client_excel_headers(), queryset)
+
     @extend_schema(
         tags=['Clients'],
         summary="Client ma'lumotlarini Excel formatda eksport qilish",
@@ -273,63 +298,34 @@ class ClientViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAuthenticated])
     def export_xlsx(self, request):
-        # Export uchun alohida queryset - prefetch_related kerak emas va SQLite limit muammosini oldini oladi
-        base_queryset = Client.objects.filter(is_deleted=False)
-        queryset = self.filter_queryset(base_queryset)
-        
-        workbook = build_template_workbook('Clients', self._client_excel_headers())
-        sheet = workbook.active
-        
-        # iterator() ishlatish - memory-efficient va SQLite limit muammosini hal qiladi
-        # Chunking bilan ishlash - har safar 1000 ta yozuvni qayta ishlash
-        chunk_size = 1000
-        offset = 0
-        
-        while True:
-            chunk = queryset[offset:offset + chunk_size]
-            if not chunk.exists():
-                break
-            
-            for client in chunk.iterator():
-                sheet.append([
-                    client.client_code_1c,
-                    client.name,
-                    client.email or '',
-                    client.phone or '',
-                    client.description or '',
-                    client.is_active,
-                    client.company_name or '',
-                    client.tax_id or '',
-                    client.registration_number or '',
-                    client.legal_address or '',
-                    client.actual_address or '',
-                    client.fax or '',
-                    client.website or '',
-                    client.industry or '',
-                    client.business_type or '',
-                    client.employee_count or '',
-                    client.annual_revenue or '',
-                    client.established_date.strftime('%Y-%m-%d') if client.established_date else '',
-                    client.payment_terms or '',
-                    client.credit_limit or '',
-                    client.currency or '',
-                    client.city or '',
-                    client.region or '',
-                    client.country or '',
-                    client.postal_code or '',
-                    client.contact_person or '',
-                    client.contact_position or '',
-                    client.contact_email or '',
-                    client.contact_phone or '',
-                    client.notes or '',
-                    client.rating or '',
-                    client.priority or '',
-                    client.source or '',
-                ])
-            
-            offset += chunk_size
-        
-        return workbook_to_response(workbook, 'clients.xlsx')
+        return self._export(request, 'xlsx')
+
+    @extend_schema(
+        tags=['Clients'],
+        summary="Client ma'lumotlarini XLSX, CSV yoki NDJSON formatda eksport qilish",
+        parameters=[
+            OpenApiParameter(
+                name='file_format',
+                type=OpenApiTypes.STR,
+                enum=list(EXPORT_FORMATS),
+                required=False,
+                description="Fayl formati (default: xlsx)",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="XLSX, CSV yoki NDJSON fayl (oqim)"),
+            400: OpenApiResponse(description="Noto'g'ri format"),
+        },
+    )
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAuthenticated])
+    def export(self, request):
+        export_format = parse_export_format(request.query_params.get('file_format'))
+        if export_format is None:
+            return Response(
+                {'error': f"file_format quyidagilardan biri bo'lishi kerak: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self._export(request, export_format)
 
     @extend_schema(
         tags=['Clients'],
@@ -348,6 +344,10 @@ class ClientViewSet(viewsets.ModelViewSet):
     @extend_schema(
         tags=['Clients'],
         summary="Client ma'lumotlarini Excel fayldan import qilish",
+        description=(
+            "Fayl headerlari tekshirilgach import fon rejimida bajariladi. Progress va natijani "
+            "`status_url` (`GET /api/v1/core/import-logs/{import_id}/`) orqali kuzatish mumkin."
+        ),
         request={
             'multipart/form-data': inline_serializer(
                 name='ClientImportPayload',
@@ -357,7 +357,7 @@ class ClientViewSet(viewsets.ModelViewSet):
             )
         },
         responses={
-            200: OpenApiResponse(description="Import natijalari (created/updated/errors)"),
+            202: OpenApiResponse(description="Import fon rejimida boshlandi (import_id, status_url)"),
             400: OpenApiResponse(description="Yaroqsiz fayl yoki header mos emas"),
         },
     )
@@ -374,7 +374,7 @@ class ClientViewSet(viewsets.ModelViewSet):
             )
         },
         responses={
-            200: OpenApiResponse(description="Import natijalari (created/updated/errors)"),
+            202: OpenApiResponse(description="Import fon rejimida boshlandi (import_id, status_url)"),
             400: OpenApiResponse(description="Yaroqsiz fayl yoki header mos emas"),
         },
     )
@@ -391,12 +391,14 @@ class ClientViewSet(viewsets.ModelViewSet):
             return Response({'error': 'file field talab qilinadi'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            workbook = load_workbook(uploaded, data_only=True)
+            workbook = load_workbook(uploaded, read_only=True, data_only=True)
         except Exception:
             return Response({'error': 'XLSX faylni o\'qib bo\'lmadi'}, status=status.HTTP_400_BAD_REQUEST)
 
-        sheet = workbook.active
-        is_valid, expected, received = self._validate_client_headers(sheet)
+        try:
+            is_valid, expected, received = self._validate_client_headers(workbook.active)
+        finally:
+            workbook.close()
         if not is_valid:
             return Response(
                 {'error': 'Excel headerlari mos emas', 'expected': expected, 'received': received},
@@ -409,50 +411,102 @@ class ClientViewSet(viewsets.ModelViewSet):
                 project_id = int(str(project_id).strip())
             except (ValueError, TypeError):
                 project_id = None
-        
-        stats = {'created': 0, 'updated': 0, 'errors': []}
-        for idx, row in enumerate(
-            sheet.iter_rows(min_row=2, max_col=len(expected), values_only=True),
-            start=2,
-        ):
-            if not row or all(value in (None, '') for value in row):
-                continue
-            code = clean_cell(row[0])
-            if not code:
-                stats['errors'].append(f"Row {idx}: client_code_1c bo'sh bo'lishi mumkin emas")
-                continue
-            name = clean_cell(row[1]) or code
-            email = clean_cell(row[2]) or None
-            phone = clean_cell(row[3]) or None
-            description = row[4] if row[4] is not None else ''
-            is_active = parse_bool_cell(row[5], default=True)
-
-            defaults = {
-                'name': name,
-                'email': email or None,
-                'phone': phone or None,
-                'description': description,
-                'is_active': is_active,
-                'is_deleted': False,
-            }
+
+        lookup = {'is_deleted': False}
+        if project_id:
+            lookup['project_id'] = project_id
+        importer = BulkImporter(
+            Client,
+            'client_code_1c',
+            self._parse_import_row,
+            lookup=lookup,
+            cache_tags=entity_tags('client', project_id),
+        )
+        import_log = start_excel_import('client', uploaded, request.user, importer, len(expected))
+        return Response(import_job_payload(request, import_log), status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _parse_import_row(row):
+        """Excel qatoridan (client_code_1c, defaults)"""
+        code = clean_cell(row[0])
+        if not code:
+            raise ValueError("client_code_1c bo'sh bo'lishi mumkin emas")
+        return code, {
+            'name': clean_cell(row[1]) or code,
+            'email': clean_cell(row[2]) or None,
+            'phone': clean_cell(row[3]) or None,
+            'description': row[4] if row[4] is not None else '',
+            'is_active': parse_bool_cell(row[5], default=True),
+            'is_deleted': False,
+        }
+
+    @extend_schema(
+        tags=['Clients'],
+        summary="Client'larni CSV/NDJSON fayldan ommaviy import qilish",
+        description="""
+CSV yoki NDJSON (JSON lines) fayl, ixtiyoriy gzip bilan siqilgan (`.csv.gz`, `.ndjson.gz`).
+
+- Ustunlar Excel headerlari bilan bir xil nomlansa avtomatik bog'lanadi;
+  boshqa nomlar uchun `mapping` - `{"fayldagi ustun": "maydon"}` JSON.
+- Faqat faylda bor maydonlar yangilanadi, noma'lum ustunlar `ignored_columns` da qaytariladi.
+- Import sinxron bajariladi; javobda natija va tezlik (`rows_per_second`).
+- Fayl hajmi `RECORD_IMPORT_MAX_SIZE` (standart 20 MB) bilan cheklangan; kattaroq fayllar uchun `import-xlsx`.
+""",
+        request={
+            'multipart/form-data': inline_serializer(
+                name='ClientBulkImportPayload',
+                fields={
+                    'file': serializers.FileField(help_text='CSV yoki NDJSON fayl (gzip bo\'lishi mumkin)'),
+                    'file_format': serializers.ChoiceField(choices=RECORD_FORMATS, required=False, help_text='Fayl nomidan aniqlanadi'),
+                    'mapping': serializers.CharField(required=False, help_text='JSON: {"ustun": "maydon"}'),
+                    'delimiter': serializers.CharField(required=False, help_text="CSV ajratuvchisi: , ; | tab"),
+                    'project_id': serializers.IntegerField(required=False, help_text='Optionally assign to this project ID'),
+                },
+            )
+        },
+        responses={
+            200: OpenApiResponse(description="Import natijasi (created, updated, errors, rows_per_second)"),
+            400: OpenApiResponse(description="Yaroqsiz fayl, format yoki mapping"),
+        },
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_import(self, request):
+        uploaded = request.FILES.get('file')
+        if not uploaded:
+            return Response({'error': 'file field talab qilinadi'}, status=status.HTTP_400_BAD_REQUEST)
+
+        project_id = request.data.get('project_id')
+        if project_id:
             try:
-                lookup = {'client_code_1c': code, 'is_deleted': False}
-                if project_id:
-                    lookup['project_id'] = project_id
-                    defaults['project_id'] = project_id
-                
-                obj, created_flag = Client.objects.update_or_create(
-                    **lookup,
-                    defaults=defaults,
-                )
-
-                if created_flag:
-                    stats['created'] += 1
-                else:
-                    stats['updated'] += 1
-            except Exception as exc:  # noqa: BLE001
-                stats['errors'].append(f"Row {idx}: {exc}")
-        return Response(stats, status=status.HTTP_200_OK)
+                project_id = int(str(project_id).strip())
+            except (ValueError, TypeError):
+                project_id = None
+        lookup = {'is_deleted': False}
+        if project_id:
+            lookup['project_id'] = project_id
+        try:
+            result = import_records(
+                uploaded,
+                entity_type='client',
+                model=Client,
+                code_field='client_code_1c',
+                fields=self._client_excel_headers(),
+                user=request.user,
+                lookup=lookup,
+                cache_tags=entity_tags('client', project_id),
+                mapping=parse_mapping(request.data.get('mapping')),
+                file_format=request.data.get('file_format'),
+                delimiter=request.data.get('delimiter') or ',',
+            )
+        except RecordImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
 
 @extend_schema_view(
     list=extend_schema(
@@ -529,16 +583,16 @@ class ClientImageViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         super().perform_create(serializer)
-        cache.clear()
+        invalidate_entity('client_image', serializer.instance.client.project_id)
 
     def perform_update(self, serializer):
         super().perform_update(serializer)
-        cache.clear()
+        invalidate_entity('client_image', serializer.instance.client.project_id)
 
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted', 'updated_at'])
-        cache.clear()
+        invalidate_entity('client_image', instance.client.project_id)
     
     @extend_schema(
         tags=['Clients'],
@@ -553,20 +607,22 @@ class ClientImageViewSet(viewsets.ModelViewSet):
         
         client_obj = serializer.validated_data['client']
         images = serializer.validated_data['images']
-        category = serializer.validated_data.get('category', 'other')
-        note = serializer.validated_data.get('note', '')
-        
-        created_images = []
-        for img_file in images:
-            image_obj = ClientImage.objects.create(
-                client=client_obj,
-                image=img_file,
-                category=category,
-                note=note
+        uploader = BulkImageUploader(
+            ClientImage,
+            {
+                'client': client_obj,
+                'category': serializer.validated_data.get('category', 'other'),
+                'note': serializer.validated_data.get('note', ''),
+            },
+            cache_tags=entity_tags('client_image', client_obj.project_id),
+        )
+        created_images, errors = uploader.upload(images)
+        if errors:
+            return Response(
+                {'error': 'Yaroqsiz rasm fayllari', 'files': errors},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            created_images.append(image_obj)
-            
-        cache.clear()
+
         return Response(
             ClientImageSerializer(created_images, many=True, context={'request': request}).data,
             status=status.HTTP_201_CREATED
@@ -579,10 +635,9 @@ class ClientImageViewSet(viewsets.ModelViewSet):
 
         # Region-based filtering for agents
         if not user.is_anonymous and not user.is_staff:
-            from users.models import AgentBusinessRegion
-            region_codes = AgentBusinessRegion.objects.filter(profile__user=user).values_list('code', flat=True)
+            region_codes = get_principal_scope(user).region_codes
             if region_codes:
-                queryset = queryset.filter(client__business_region_code__in=list(region_codes))
+                queryset = queryset.filter(client__business_region_code__in=region_codes)
             else:
                 queryset = queryset.none()
 
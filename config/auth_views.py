@@ -1,15 +1,13 @@
 from drf_spectacular.utils import extend_schema, OpenApiExample
-from rest_framework_simplejwt.serializers import (
-    TokenObtainPairSerializer,
-    TokenRefreshSerializer,
-    TokenVerifySerializer,
-)
+from rest_framework_simplejwt.serializers import TokenVerifySerializer
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
 
+from users.serializers import ScopedTokenObtainPairSerializer, ScopedTokenRefreshSerializer
+
 
 @extend_schema(
     tags=['Authentication'],
@@ -17,10 +15,11 @@ from rest_framework_simplejwt.views import (
     description=(
         "Foydalanuvchi `username` va `password` ma'lumotlari asosida JWT token juftligini qaytaradi. "
         "Qaytgan `access` token'ni API so'rovlarida `Authorization: Bearer <access_token>` header'i orqali yuboring. "
-        "`refresh` token esa keyinchalik yangi access token olish uchun ishlatiladi."
+        "`refresh` token esa keyinchalik yangi access token olish uchun ishlatiladi. "
+        "Access token'da foydalanuvchi scope claim'lari (project, profil, agent kodi, region kodlari) bo'ladi."
     ),
-    request=TokenObtainPairSerializer,
-    responses=TokenObtainPairSerializer,
+    request=ScopedTokenObtainPairSerializer,
+    responses=ScopedTokenObtainPairSerializer,
     examples=[
         OpenApiExample(
             name="Curl misoli",
@@ -43,8 +42,8 @@ class APITokenObtainPairView(TokenObtainPairView):
         "Oldin olingan refresh token'ni yuborib yangi access token yarating. "
         "Agar `ROTATE_REFRESH_TOKENS=True` bo'lsa, javobda yangi refresh ham qaytadi."
     ),
-    request=TokenRefreshSerializer,
-    responses=TokenRefreshSerializer,
+    request=ScopedTokenRefreshSerializer,
+    responses=ScopedTokenRefreshSerializer,
     examples=[
         OpenApiExample(
             name="HTTPie misoli",
@@ -274,10 +274,56 @@ WHITENOISE_USE_FINDERS = DEBUG
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Image renditions (imagekit): list endpoint'larda sinxron generatsiya yo'q,
+# rendition'lar yuklashdan keyin fon thread pool'da yaratiladi
+IMAGEKIT_DEFAULT_CACHEFILE_STRATEGY = 'utils.renditions.BackgroundRenditionStrategy'
+IMAGE_RENDITION_WORKERS = int(os.environ.get('IMAGE_RENDITION_WORKERS', '2'))
+IMAGE_RENDITIONS_ASYNC = os.environ.get('IMAGE_RENDITIONS_ASYNC', 'True') == 'True'
+# On-demand resize: ruxsat etilgan o'lchamlar (px) va LRU disk keshi
+IMAGE_RESIZE_SIZES = [64, 96, 128, 160, 200, 240, 320, 400, 480, 640, 800, 960, 1080, 1280, 1600]
+IMAGE_RESIZE_QUALITY = int(os.environ.get('IMAGE_RESIZE_QUALITY', '82'))
+IMAGE_RESIZE_CACHE_ROOT = os.environ.get('IMAGE_RESIZE_CACHE_ROOT', str(MEDIA_ROOT / 'CACHE' / 'resized'))
+IMAGE_RESIZE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_RESIZE_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+# Thumbnail sprite sheet'lar: katak o'lchamlari (px) va bitta sprite'dagi maksimal rasmlar
+IMAGE_SPRITE_CELL_SIZES = [64, 96, 128, 150, 160, 200, 240, 300]
+IMAGE_SPRITE_MAX_ITEMS = int(os.environ.get('IMAGE_SPRITE_MAX_ITEMS', '100'))
+# Bulk upload: fayllarni dekodlash va yozish uchun thread'lar soni
+IMAGE_UPLOAD_WORKERS = int(os.environ.get('IMAGE_UPLOAD_WORKERS', '4'))
+
+# Excel import: fon rejimida (thread), batch hajmi va vaqtinchalik fayllar papkasi
+EXCEL_IMPORT_ASYNC = os.environ.get('EXCEL_IMPORT_ASYNC', 'True') == 'True'
+EXCEL_IMPORT_BATCH_SIZE = int(os.environ.get('EXCEL_IMPORT_BATCH_SIZE', '500'))
+EXCEL_IMPORT_TMP_ROOT = os.environ.get('EXCEL_IMPORT_TMP_ROOT', str(BASE_DIR / 'tmp' / 'imports'))
+# CSV/NDJSON bulk-import so'rov ichida bajariladi - yuklangan fayl hajmi chegarasi
+RECORD_IMPORT_MAX_SIZE = int(os.environ.get('RECORD_IMPORT_MAX_SIZE', str(20 * 1024 * 1024)))
+
+# Admin bazani tozalash: fon rejimida (thread) va DELETE batch hajmi
+CLEAR_DB_ASYNC = os.environ.get('CLEAR_DB_ASYNC', 'True') == 'True'
+CLEAR_DB_BATCH_SIZE = int(os.environ.get('CLEAR_DB_BATCH_SIZE', '5000'))
+
+# Ma'lumotnomalar registry'si: umumiy keshdagi versiyani tekshirish oralig'i (soniya)
+REFERENCE_DATA_CHECK_INTERVAL = float(os.environ.get('REFERENCE_DATA_CHECK_INTERVAL', '5'))
+
+# Ikki qatlamli kesh: jarayon ichidagi L1 (LRU) hajmi, TTL va L2'da yo'q kalitlar uchun TTL (soniya)
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', '2048'))
+CACHE_L1_TTL = float(os.environ.get('CACHE_L1_TTL', '5'))
+CACHE_L1_NEGATIVE_TTL = float(os.environ.get('CACHE_L1_NEGATIVE_TTL', '1'))
+# Eskirgan (stale) kesh kalitlarini fonda qayta quradigan thread'lar soni
+CACHE_REBUILD_WORKERS = int(os.environ.get('CACHE_REBUILD_WORKERS', '4'))
+
+# Foydalanuvchi scope'i (AuthProject, api.Project, region kodlari) kesh muddati (soniya)
+PRINCIPAL_SCOPE_TTL = int(os.environ.get('PRINCIPAL_SCOPE_TTL', '600'))
+
 # Upload limits
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 
+# Chunked (resumable) upload sessiyalari: vaqtinchalik fayllar va muddati
+UPLOAD_SESSION_ROOT = os.environ.get('UPLOAD_SESSION_ROOT', str(BASE_DIR / 'tmp' / 'upload_sessions'))
+UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', '24'))
+UPLOAD_SESSION_MAX_SIZE = int(os.environ.get('UPLOAD_SESSION_MAX_SIZE', str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_MAX_SIZE = int(os.environ.get('UPLOAD_CHUNK_MAX_SIZE', str(8 * 1024 * 1024)))
+
 
 CKEDITOR_UPLOAD_PATH = 'uploads/ckeditor/'
 
@@ -359,7 +405,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ScopedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -584,6 +630,9 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Access token'ga scope claim'lari (users.tokens)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ScopedTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.ScopedTokenRefreshSerializer',
 }
 
 # CORS Settings
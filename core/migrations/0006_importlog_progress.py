@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_aimodel_provider'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='processed_rows',
+            field=models.IntegerField(default=0, help_text='Qayta ishlangan qatorlar soni (progress)'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_importlog_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClearDatabaseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tables', models.JSONField(default=list, help_text='Tanlangan table kalitlari')),
+                ('status', models.CharField(choices=[('processing', 'Processing'), ('completed', 'Completed'), ('error', 'Error')], default='processing', max_length=50)),
+                ('total_rows', models.BigIntegerField(default=0)),
+                ('deleted_rows', models.BigIntegerField(default=0, help_text="O'chirilgan qatorlar soni (progress)")),
+                ('stats', models.JSONField(blank=True, default=dict, help_text="Table bo'yicha o'chirilgan qatorlar")),
+                ('errors_json', models.JSONField(blank=True, default=list)),
+                ('media_status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('skipped', 'Skipped'), ('error', 'Error')], default='pending', max_length=50)),
+                ('media_deleted', models.IntegerField(default=0, help_text="O'chirilgan media fayllar soni")),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clear_database_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clear Database Job',
+                'verbose_name_plural': 'Clear Database Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -32,12 +32,14 @@ class ImportLog(BaseModel):
     )
     
     total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0, help_text="Qayta ishlangan qatorlar soni (progress)")
     created_count = models.IntegerField(default=0)
     updated_count = models.IntegerField(default=0)
     error_count = models.IntegerField(default=0)
     
     errors_json = models.JSONField(default=list, blank=True, help_text="Qatorlar bo'yicha xatoliklar")
     summary = models.TextField(blank=True, null=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     
     performed_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -55,6 +57,47 @@ class ImportLog(BaseModel):
     def __str__(self):
         return f"{self.get_entity_type_display()} - {self.filename} - {self.status}"
 
+class ClearDatabaseJob(BaseModel):
+    """Admin panelidan bazani tozalash (fon jarayoni) holati"""
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('error', 'Error'),
+    ]
+    MEDIA_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('skipped', 'Skipped'),
+        ('error', 'Error'),
+    ]
+
+    tables = models.JSONField(default=list, help_text="Tanlangan table kalitlari")
+    status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='processing')
+    total_rows = models.BigIntegerField(default=0)
+    deleted_rows = models.BigIntegerField(default=0, help_text="O'chirilgan qatorlar soni (progress)")
+    stats = models.JSONField(default=dict, blank=True, help_text="Table bo'yicha o'chirilgan qatorlar")
+    errors_json = models.JSONField(default=list, blank=True)
+    media_status = models.CharField(max_length=50, choices=MEDIA_STATUS_CHOICES, default='pending')
+    media_deleted = models.IntegerField(default=0, help_text="O'chirilgan media fayllar soni")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    performed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='clear_database_jobs'
+    )
+
+    class Meta:
+        verbose_name = "Clear Database Job"
+        verbose_name_plural = "Clear Database Jobs"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Clear DB #{self.pk} - {self.status}"
+
 class ErrorLog(BaseModel):
     """Tizimda yuz bergan kutilmagan xatoliklarni saqlash uchun log"""
     error_type = models.CharField(max_length=255)
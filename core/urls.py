@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import HealthViewSet, SystemSettingsViewSet, AITokenUsageViewSet, AIModelViewSet
+from .views import HealthViewSet, SystemSettingsViewSet, AITokenUsageViewSet, AIModelViewSet, ImportLogViewSet
 
 router = DefaultRouter()
 router.register(r'health', HealthViewSet, basename='health')
 router.register(r'system-settings', SystemSettingsViewSet, basename='system-settings')
 router.register(r'ai-usage', AITokenUsageViewSet, basename='ai-usage')
 router.register(r'ai-models', AIModelViewSet, basename='ai-models')
+router.register(r'import-logs', ImportLogViewSet, basename='import-log')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,10 +2,11 @@ from django.shortcuts import render
 from rest_framework import viewsets, status, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAdminUser, AllowAny
-from .models import SystemSettings, AITokenUsage, AIModel
+from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
+from .models import SystemSettings, AITokenUsage, AIModel, ImportLog
 from django.db import connection as db_connection
 from django.core.cache import cache
+from utils.cache import cache_metrics, local_cache
 import os
 try:
     import psutil
@@ -74,6 +75,18 @@ class HealthViewSet(viewsets.ViewSet):
             print(traceback.format_exc())
             return Response({"status": "error", "message": str(e)}, status=500)
 
+    @extend_schema(
+        responses={200: OpenApiResponse(description="Cache metrics")},
+        summary="Cache metrics",
+        description=(
+            "Joriy jarayon bo'yicha: L1 holati, kalit prefiksi bo'yicha L1/L2 hit va miss'lar, "
+            "single-flight yuklashlar va teglar invalidatsiyasi."
+        )
+    )
+    @action(detail=False, methods=['get'])
+    def cache(self, request):
+        return Response({'l1': local_cache.stats(), **cache_metrics.snapshot()})
+
     def _check_db(self):
         start = time.time()
         try:
@@ -287,3 +300,33 @@ class AIModelViewSet(viewsets.ModelViewSet):
     queryset = AIModel.objects.filter(is_deleted=False)
     serializer_class = AIModelSerializer
     permission_classes = [IsAdminUser]
+
+class ImportLogSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportLog
+        fields = [
+            'id', 'entity_type', 'filename', 'status', 'total_rows', 'processed_rows', 'progress',
+            'created_count', 'updated_count', 'error_count', 'errors_json', 'summary',
+            'created_at', 'finished_at',
+        ]
+
+    def get_progress(self, obj):
+        """Taxminiy foiz (read_only workbook'da total_rows tugaguncha taxminiy)"""
+        if obj.status != 'processing':
+            return 100
+        if not obj.total_rows:
+            return 0
+        return min(99, int(obj.processed_rows * 100 / obj.total_rows))
+
+class ImportLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for tracking background Excel imports"""
+    serializer_class = ImportLogSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = ImportLog.objects.filter(is_deleted=False)
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(performed_by=self.request.user)
+        return queryset
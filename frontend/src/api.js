@@ -351,6 +351,22 @@ export const userAPI = {
   },
 };
 
+// Excel import (fon rejimida) holati
+export const importAPI = {
+  getImportLog: (importId) => {
+    return apiClient.get(`/core/import-logs/${importId}/`);
+  },
+  waitForImport: async (importId, { interval = 1000, onProgress } = {}) => {
+    // Import tugaguncha (status != processing) holatni so'rab turish
+    for (;;) {
+      const { data } = await apiClient.get(`/core/import-logs/${importId}/`);
+      if (onProgress) onProgress(data);
+      if (data.status !== "processing") return data;
+      await new Promise((resolve) => setTimeout(resolve, interval));
+    }
+  },
+};
+
 // Integration API
 export const integrationAPI = {
   getIntegrations: () => {
@@ -48,9 +48,16 @@ const ClearDbPage = () => {
 
     try {
       const response = await api.post('/admin/clear-db/', { models: selectedModels });
-      setResult(response.data);
       setSelectedModels([]);
       setConfirming(false);
+      // Tozalash fon rejimida: tugaguncha holatni so'rab turish
+      let job = response.data;
+      setResult(job);
+      while (job.status === 'processing' || job.media_status === 'processing' || job.media_status === 'pending') {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        job = (await api.get(`/admin/clear-db/${job.job_id}/`)).data;
+        setResult(job);
+      }
     } catch (err) {
       console.error("Clear DB error:", err);
       setError(err.response?.data?.error || "Xatolik yuz berdi");
@@ -135,6 +142,13 @@ const ClearDbPage = () => {
         {result && (
           <div className="results-box">
             <h3>Natijalar:</h3>
+            <p>
+              {result.status === 'processing'
+                ? `O'chirilmoqda... ${result.progress}% (${result.deleted_rows} / ${result.total_rows})`
+                : result.status === 'completed' ? 'Tozalash yakunlandi' : 'Tozalash xato bilan tugadi'}
+              {result.media_status === 'processing' && " - media fayllar tozalanmoqda..."}
+              {result.media_status === 'completed' && ` - ${result.media_deleted} ta media fayl o'chirildi`}
+            </p>
             <div className="stats-grid">
               {Object.entries(result.stats).map(([key, count]) => (
                 <div key={key} className="stat-item">
@@ -1,6 +1,6 @@
 import React, { useEffect, useState, useCallback } from "react";
 import QuillEditor from "./QuillEditor";
-import { clientAPI, projectAPI } from "../../api";
+import { clientAPI, importAPI, projectAPI } from "../../api";
 import { useNotification } from "../../contexts/NotificationContext";
 import "./AdminCRUD.css";
 
@@ -277,9 +277,10 @@ const ClientAdmin = () => {
     try {
       setLoading(true);
       const response = await clientAPI.importClients(file, project_id);
-      success(`Import yakunlandi: ${response.data.created} yaratildi, ${response.data.updated} yangilandi`);
-      if (response.data.errors.length > 0) {
-        console.warn("Import errors:", response.data.errors);
+      const result = await importAPI.waitForImport(response.data.import_id);
+      success(`Import yakunlandi: ${result.created_count} yaratildi, ${result.updated_count} yangilandi`);
+      if (result.error_count > 0) {
+        console.warn("Import errors:", result.errors_json);
       }
       loadClients();
     } catch (err) {
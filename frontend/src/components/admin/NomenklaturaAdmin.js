@@ -1,6 +1,6 @@
 import React, { useEffect, useState, useCallback } from "react";
 import QuillEditor from "./QuillEditor";
-import { nomenklaturaAPI, projectAPI } from "../../api";
+import { importAPI, nomenklaturaAPI, projectAPI } from "../../api";
 import { useNotification } from "../../contexts/NotificationContext";
 import "./AdminCRUD.css";
 
@@ -318,7 +318,14 @@ const NomenklaturaAdmin = () => {
       setImportLoading(true);
       setImportResult(null);
       const response = await nomenklaturaAPI.importNomenklatura(importFile, filterProject);
-      setImportResult(response.data);
+      const result = await importAPI.waitForImport(response.data.import_id);
+      setImportResult({
+        created: result.created_count,
+        updated: result.updated_count,
+        errors: (result.errors_json || []).map(
+          (err) => `Row ${err.row}${err.code ? ` (${err.code})` : ""}: ${err.error}`
+        ),
+      });
       success("Import muvaffaqiyatli yakunlandi");
       loadNomenklatura();
     } catch (err) {
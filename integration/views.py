@@ -6,7 +6,6 @@ from django.db import transaction, OperationalError
 import random
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from django.core.cache import cache
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample, OpenApiParameter, inline_serializer
 import threading
 from zeep import Client as ZeepClient, Settings
@@ -15,6 +14,7 @@ from zeep.transports import Transport
 
 from nomenklatura.models import Nomenklatura
 from client.models import Client
+from utils.cache import invalidate_entity
 from .models import Integration, IntegrationLog
 from .serializers import (
     IntegrationSerializer,
@@ -911,8 +911,8 @@ def sync_nomenklatura_async(integration_id, task_id):
         log_obj.message = f'Completed: {created} created, {updated} updated, {errors} errors'
         log_obj.save(update_fields=['status', 'end_time', 'processed_items', 'created_items', 'updated_items', 'error_items', 'message'])
         
-        # Invalidate cache after sync
-        cache.clear()
+        # Faqat shu project nomenklaturasiga bog'liq kesh yozuvlari eskiradi
+        invalidate_entity('nomenklatura', integration.project_id)
     except Exception as e:
         logger.error(f"Error in sync_nomenklatura_async: {e}")
         log_obj.status = 'error'
@@ -961,8 +961,8 @@ def sync_clients_async(integration_id, task_id):
         log_obj.message = f'Completed: {created} created, {updated} updated, {errors} errors'
         log_obj.save(update_fields=['status', 'end_time', 'processed_items', 'created_items', 'updated_items', 'error_items', 'message'])
         
-        # Invalidate cache after sync
-        cache.clear()
+        # Faqat shu project client'lariga bog'liq kesh yozuvlari eskiradi
+        invalidate_entity('client', integration.project_id)
     except Exception as e:
         logger.error(f"Error in sync_clients_async: {e}")
         log_obj.status = 'error'
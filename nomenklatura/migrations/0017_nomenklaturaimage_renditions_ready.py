@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomenklatura', '0016_nomenklaturaimage_format_nomenklaturaimage_height_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nomenklaturaimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, help_text="image_thumbnail/sm/md/lg fonda yaratib bo'lindimi"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomenklatura', '0018_nomenklaturaimage_content_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nomenklaturaimage',
+            name='is_normalized',
+            field=models.BooleanField(default=False, help_text="Original project siyosati bo'yicha normalize qilinganmi"),
+        ),
+    ]
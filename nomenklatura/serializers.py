@@ -6,6 +6,8 @@ from PIL import Image
 from api.serializers import ImageStatusSerializer, ImageSourceSerializer, ProjectSerializer, ProjectSimpleSerializer, ProjectNestedSerializer
 from api.models import ImageStatus, ImageSource, Project
 from .models import Nomenklatura, NomenklaturaImage
+from utils.refdata import reference_data
+from utils.renditions import prefers_webp, rendition_url
 
 class NomenklaturaImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
@@ -13,9 +15,9 @@ class NomenklaturaImageSerializer(serializers.ModelSerializer):
     image_md_url = serializers.SerializerMethodField()
     image_lg_url = serializers.SerializerMethodField()
     image_thumbnail_url = serializers.SerializerMethodField()
-    status = ImageStatusSerializer(read_only=True)
+    status = ImageStatusSerializer(source='status_id', read_only=True)
     status_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
-    source = ImageSourceSerializer(read_only=True)
+    source = ImageSourceSerializer(source='source_id', read_only=True)
     source_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     project = ProjectNestedSerializer(source='nomenklatura.project', read_only=True)
     code_1c = serializers.CharField(source='nomenklatura.code_1c', read_only=True)
@@ -45,6 +47,7 @@ class NomenklaturaImageSerializer(serializers.ModelSerializer):
             'image_md_url',
             'image_lg_url',
             'image_thumbnail_url',
+            'placeholder',
             'is_main',
             'status',
             'status_id',
@@ -53,7 +56,7 @@ class NomenklaturaImageSerializer(serializers.ModelSerializer):
             'is_ai_generated',
             'created_at',
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'placeholder', 'created_at']
         extra_kwargs = {
             'image': {'required': False}
         }
@@ -66,16 +69,10 @@ class NomenklaturaImageSerializer(serializers.ModelSerializer):
         instance = super().create(validated_data)
         
         if status_id:
-            try:
-                instance.status = ImageStatus.objects.get(id=status_id, is_deleted=False)
-            except ImageStatus.DoesNotExist:
-                pass
+            instance.status = reference_data.get(ImageStatus, status_id)
         
         if source_id:
-            try:
-                instance.source = ImageSource.objects.get(id=source_id, is_deleted=False)
-            except ImageSource.DoesNotExist:
-                pass
+            instance.source = reference_data.get(ImageSource, source_id)
         
         instance.save()
         return instance
@@ -88,22 +85,10 @@ class NomenklaturaImageSerializer(serializers.ModelSerializer):
         instance = super().update(instance, validated_data)
         
         if status_id is not None:
-            if status_id:
-                try:
-                    instance.status = ImageStatus.objects.get(id=status_id, is_deleted=False)
-                except ImageStatus.DoesNotExist:
-                    instance.status = None
-            else:
-                instance.status = None
+            instance.status = reference_data.get(ImageStatus, status_id)
         
         if source_id is not None:
-            if source_id:
-                try:
-                    instance.source = ImageSource.objects.get(id=source_id, is_deleted=False)
-                except ImageSource.DoesNotExist:
-                    instance.source = None
-            else:
-                instance.source = None
+            instance.source = reference_data.get(ImageSource, source_id)
         
         instance.save()
         return instance
@@ -119,38 +104,42 @@ class NomenklaturaImageSerializer(serializers.ModelSerializer):
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_sm_url(self, obj) -> Optional[str]:
-        if obj.image_sm:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_sm', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_sm.url)
-            return obj.image_sm.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_md_url(self, obj) -> Optional[str]:
-        if obj.image_md:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_md', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_md.url)
-            return obj.image_md.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_lg_url(self, obj) -> Optional[str]:
-        if obj.image_lg:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_lg', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_lg.url)
-            return obj.image_lg.url
+                return request.build_absolute_uri(url)
+            return url
         return None
     
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_thumbnail_url(self, obj) -> Optional[str]:
-        if obj.image_thumbnail:
-            request = self.context.get('request')
+        request = self.context.get('request')
+        url = rendition_url(obj, 'image_thumbnail', webp=prefers_webp(request))
+        if url:
             if request:
-                return request.build_absolute_uri(obj.image_thumbnail.url)
-            return obj.image_thumbnail.url
+                return request.build_absolute_uri(url)
+            return url
         return None
 
 class NomenklaturaSerializer(serializers.ModelSerializer):
@@ -5,7 +5,9 @@ from django.core.files.base import ContentFile
 from django.utils import timezone
 from nomenklatura.models import Nomenklatura, NomenklaturaImage
 from utils.ai.factory import AIService
+from utils.cache import entity_tags, invalidate_tags
 from utils.settings import get_system_setting
+from utils.storage import delete_unreferenced
 import os
 
 logger = logging.getLogger(__name__)
@@ -164,8 +166,15 @@ class NomenklaturaEnrichmentService:
         nomenklatura.enrichment_status = 'COMPLETED'
         nomenklatura.last_enriched_at = timezone.now()
         nomenklatura.save()
+        self._invalidate_feeds(nomenklatura)
         return True, "Muvaffaqiyatli boyitildi"
 
+    @staticmethod
+    def _invalidate_feeds(nomenklatura):
+        """Mahsulot va uning rasmlari o'zgardi - tegishli kesh teglarini yangilash"""
+        project_id = nomenklatura.project_id
+        invalidate_tags(*entity_tags('nomenklatura', project_id), *entity_tags('nomenklatura_image', project_id))
+
     def _save_enrichment_image(self, nomenklatura, img_data, index, note):
         """Helper to save images to NomenklaturaImage model"""
         try:
@@ -217,13 +226,16 @@ class NomenklaturaEnrichmentService:
         nomenklatura.description = ""
         
         # 2. Delete AI generated images
-        ai_images = nomenklatura.images.filter(is_ai_generated=True)
+        # Blob'lar tarkib bo'yicha umumiy - fayl faqat boshqa yozuv ishlatmasa o'chiriladi
+        ai_images = list(nomenklatura.images.filter(is_ai_generated=True))
         for img in ai_images:
-            img.image.delete(save=False)
             img.delete()
+        if ai_images:
+            delete_unreferenced(ai_images[0].image.storage, [img.image.name for img in ai_images])
             
         # 3. Reset status
         nomenklatura.enrichment_status = 'PENDING'
         nomenklatura.last_enriched_at = None
         nomenklatura.save()
+        self._invalidate_feeds(nomenklatura)
         return True
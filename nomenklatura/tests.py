@@ -1,3 +1,144 @@
-from django.test import TestCase
+import tempfile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import Project
+from .models import Nomenklatura
 
-# Create your tests here.
+
+@override_settings(EXCEL_IMPORT_ASYNC=False, EXCEL_IMPORT_TMP_ROOT=tempfile.mkdtemp(), EXCEL_IMPORT_BATCH_SIZE=2)
+class NomenklaturaImportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def _workbook(self, headers, rows):
+        from io import BytesIO
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(headers)
+        for row in rows:
+            workbook.active.append(row)
+        buffer = BytesIO()
+        workbook.save(buffer)
+        return SimpleUploadedFile('import.xlsx', buffer.getvalue())
+
+    def test_background_nomenklatura_import(self):
+        """Test import fon jarayonida batch'lar bo'yicha upsert qiladi va progressni ImportLog'ga yozadi"""
+        from .views import NomenklaturaViewSet
+
+        project = Project.objects.create(code_1c='PROJ001', name='Test Project')
+        Nomenklatura.objects.create(code_1c='NOM001', name='Eski nom', project=project)
+        headers = NomenklaturaViewSet._nomenklatura_excel_headers()
+        rows = [
+            ['NOM001', 'Yangi nom', '', '', True],
+            ['NOM002', 'Mahsulot 2', '', '', True, 'SKU2'],
+            ['', 'Kodsiz', '', '', True],
+            ['NOM003', 'Mahsulot 3', '', '', False],
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/v1/nomenklatura/import-xlsx/',
+                {'file': self._workbook(headers, rows), 'project_id': project.id},
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.get(response.data['status_url'])
+        self.assertEqual(response.data['status'], 'error')
+        self.assertEqual((response.data['created_count'], response.data['updated_count']), (2, 1))
+        self.assertEqual(response.data['error_count'], 1)
+        self.assertEqual(response.data['errors_json'][0]['row'], 4)
+        self.assertEqual(response.data['progress'], 100)
+        self.assertEqual(Nomenklatura.objects.get(code_1c='NOM001').name, 'Yangi nom')
+        self.assertEqual(Nomenklatura.objects.get(code_1c='NOM002').sku, 'SKU2')
+        self.assertFalse(Nomenklatura.objects.get(code_1c='NOM003').is_active)
+        self.assertEqual(Nomenklatura.objects.filter(project=project).count(), 3)
+
+    def test_bulk_import_gzip_csv_and_ndjson(self):
+        """Test gzip CSV (mapping bilan) va NDJSON import faqat berilgan maydonlarni yangilaydi"""
+        import gzip
+        import json
+
+        Nomenklatura.objects.create(code_1c='NOM001', name='Eski nom', brand='Brand A', base_price=10)
+        csv_data = 'Kod;Nomi;Narx;Rang\nNOM001;Yangi nom;12.50;qizil\nNOM002;;7;\n'
+        response = self.client.post(
+            '/api/v1/nomenklatura/bulk-import/',
+            {
+                'file': SimpleUploadedFile('items.csv.gz', gzip.compress(csv_data.encode('utf-8'))),
+                'mapping': json.dumps({'Kod': 'code_1c', 'Nomi': 'name', 'Narx': 'base_price'}),
+                'delimiter': ';',
+            },
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(response.data['ignored_columns'], ['Rang'])
+        self.assertIn('rows_per_second', response.data)
+        item = Nomenklatura.objects.get(code_1c='NOM001')
+        self.assertEqual((item.name, item.brand, str(item.base_price)), ('Yangi nom', 'Brand A', '12.50'))
+        self.assertEqual(Nomenklatura.objects.get(code_1c='NOM002').name, 'NOM002')
+
+        lines = [
+            {'code_1c': 'NOM002', 'stock_quantity': '5', 'is_active': 'false'},
+            {'name': 'Kodsiz'},
+            '{yaroqsiz',
+        ]
+        payload = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        response = self.client.post(
+            '/api/v1/nomenklatura/bulk-import/',
+            {'file': SimpleUploadedFile('items.ndjson', payload.encode('utf-8'))},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['updated'], response.data['error_count']), (1, 2))
+        item = Nomenklatura.objects.get(code_1c='NOM002')
+        self.assertFalse(item.is_active)
+        self.assertEqual(item.stock_quantity, 5)
+
+        response = self.client.post(
+            '/api/v1/nomenklatura/bulk-import/',
+            {'file': SimpleUploadedFile('items.csv', b'Kod,Nomi\nX,Y\n')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(RECORD_IMPORT_MAX_SIZE=8):
+            response = self.client.post(
+                '/api/v1/nomenklatura/bulk-import/',
+                {'file': SimpleUploadedFile('items.csv', b'code_1c,name\nX,Y\n')},
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_import_logs_partial_writes(self):
+        """Test import o'rtasida xato bo'lsa ham yozilgan batch'lar ImportLog'da qayd etiladi"""
+        from unittest import mock
+        from core.models import ImportLog
+        from utils.imports import BulkImporter
+        from utils.record_import import import_records
+
+        real_process = BulkImporter.process_batch
+        calls = []
+
+        def failing_process(importer, batch, stats):
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError('DB uzildi')
+            return real_process(importer, batch, stats)
+
+        csv_data = b'code_1c,name\nN1,A\nN2,B\nN3,C\n'
+        with mock.patch.object(BulkImporter, 'process_batch', failing_process):
+            with self.assertRaises(RuntimeError):
+                import_records(
+                    SimpleUploadedFile('items.csv', csv_data), entity_type='nomenklatura', model=Nomenklatura,
+                    code_field='code_1c', fields=['code_1c', 'name'], user=self.user,
+                )
+        log = ImportLog.objects.get()
+        self.assertEqual((log.status, log.created_count, log.processed_rows), ('error', 2, 2))
+        self.assertIn('DB uzildi', log.summary)
+        self.assertIsNotNone(log.finished_at)
@@ -7,7 +7,7 @@ from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from django.core.cache import cache
-from utils.cache import smart_cache_get, smart_cache_set, smart_cache_delete
+from utils.cache import entity_tags, invalidate_entity, smart_cache_get, smart_cache_set, smart_cache_delete
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiExample,
@@ -18,8 +18,17 @@ from drf_spectacular.utils import (
     inline_serializer,
 )
 from openpyxl import load_workbook
-from utils.excel import build_template_workbook, workbook_to_response, parse_bool_cell, clean_cell
-from core.models import ImportLog
+from utils.excel import (
+    EXPORT_FORMATS,
+    build_template_workbook,
+    clean_cell,
+    export_response,
+    parse_bool_cell,
+    parse_export_format,
+    workbook_to_response,
+)
+from utils.imports import BulkImporter, import_job_payload, start_excel_import
+from utils.record_import import RECORD_FORMATS, RecordImportError, import_records, parse_mapping
 from .serializers import (
     NomenklaturaImageBulkUploadSerializer,
     NomenklaturaImageSerializer,
@@ -129,6 +138,7 @@ class NomenklaturaImageFilterSet(django_filters.FilterSet):
 
 
 from utils.mixins import ProjectScopedMixin
+from utils.uploads import BulkImageUploader
 
 @extend_schema_view(
     list=extend_schema(
@@ -224,6 +234,16 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
                 serializer.save()
         else:
             serializer.save()
+        invalidate_entity('nomenklatura', serializer.instance.project_id)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_entity('nomenklatura', serializer.instance.project_id)
+
+    def perform_destroy(self, instance):
+        project_id = instance.project_id
+        super().perform_destroy(instance)
+        invalidate_entity('nomenklatura', project_id)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -361,6 +381,11 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
         normalized = [clean_cell(value).lower() for value in header_row[:len(expected)]]
         return normalized == expected, expected, normalized
 
+    def _export(self, request, export_format):
+        # Export uchun alohida queryset - prefetch_related kerak emas; yozuvlar keyset bo'yicha oqim bilan yoziladi
+        queryset = self.filter_queryset(Nomenklatura.objects.filter(is_deleted=False))
+        return export_response(export_format, 'nomenklatura', 'Nomenklatura', self._nomenklatura_excel_headers(), queryset)
+
     @extend_schema(
         tags=['Nomenklatura'],
         summary="Nomenklatura ma'lumotlarini Excel formatda eksport qilish",
@@ -368,68 +393,34 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAuthenticated])
     def export_xlsx(self, request):
-        # Export uchun alohida queryset - prefetch_related kerak emas va SQLite limit muammosini oldini oladi
-        base_queryset = Nomenklatura.objects.filter(is_deleted=False)
-        queryset = self.filter_queryset(base_queryset)
-        
-        workbook = build_template_workbook('Nomenklatura', self._nomenklatura_excel_headers())
-        sheet = workbook.active
-        
-        # iterator() ishlatish - memory-efficient va SQLite limit muammosini hal qiladi
-        # Chunking bilan ishlash - har safar 1000 ta yozuvni qayta ishlash
-        chunk_size = 1000
-        offset = 0
-        
-        while True:
-            chunk = queryset[offset:offset + chunk_size]
-            if not chunk.exists():
-                break
-            
-            for item in chunk.iterator():
-                sheet.append([
-                    item.code_1c,
-                    item.name,
-                    item.title or '',
-                    item.description or '',
-                    item.is_active,
-                    item.sku or '',
-                    item.barcode or '',
-                    item.brand or '',
-                    item.manufacturer or '',
-                    item.model or '',
-                    item.series or '',
-                    item.vendor_code or '',
-                    item.base_price or '',
-                    item.sale_price or '',
-                    item.cost_price or '',
-                    item.currency or '',
-                    item.discount_percent or '',
-                    item.tax_rate or '',
-                    item.stock_quantity or '',
-                    item.min_stock or '',
-                    item.max_stock or '',
-                    item.unit_of_measure or '',
-                    item.weight or '',
-                    item.dimensions or '',
-                    item.volume or '',
-                    item.category or '',
-                    item.subcategory or '',
-                    item.color or '',
-                    item.size or '',
-                    item.material or '',
-                    item.warranty_period or '',
-                    item.expiry_date.strftime('%Y-%m-%d') if item.expiry_date else '',
-                    item.production_date.strftime('%Y-%m-%d') if item.production_date else '',
-                    item.notes or '',
-                    item.rating or '',
-                    item.popularity_score or '',
-                    item.seo_keywords or '',
-                    item.source or '',
-                ])
-            
-            offset += chunk_size
-        
-        return workbook_to_response(workbook, 'nomenklatura.xlsx')
+        return self._export(request, 'xlsx')
+
+    @extend_schema(
+        tags=['Nomenklatura'],
+        summary="Nomenklatura ma'lumotlarini XLSX, CSV yoki NDJSON formatda eksport qilish",
+        parameters=[
+            OpenApiParameter(
+                name='file_format',
+                type=OpenApiTypes.STR,
+                enum=list(EXPORT_FORMATS),
+                required=False,
+                description="Fayl formati (default: xlsx)",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="XLSX, CSV yoki NDJSON fayl (oqim)"),
+            400: OpenApiResponse(description="Noto'g'ri format"),
+        },
+    )
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAuthenticated])
+    def export(self, request):
+        export_format = parse_export_format(request.query_params.get('file_format'))
+        if export_format is None:
+            return Response(
+                {'error': f"file_format quyidagilardan biri bo'lishi kerak: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self._export(request, export_format)
 
     @extend_schema(
         tags=['Nomenklatura'],
@@ -448,6 +439,10 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
     @extend_schema(
         tags=['Nomenklatura'],
         summary="Nomenklatura ma'lumotlarini Excel fayldan import qilish",
+        description=(
+            "Fayl headerlari tekshirilgach import fon rejimida bajariladi. Progress va natijani "
+            "`status_url` (`GET /api/v1/core/import-logs/{import_id}/`) orqali kuzatish mumkin."
+        ),
         request={
             'multipart/form-data': inline_serializer(
                 name='NomenklaturaImportPayload',
@@ -458,7 +453,7 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
             )
         },
         responses={
-            200: OpenApiResponse(description="Import natijalari (created/updated/errors)"),
+            202: OpenApiResponse(description="Import fon rejimida boshlandi (import_id, status_url)"),
             400: OpenApiResponse(description="Yaroqsiz fayl yoki header mos emas"),
         },
     )
@@ -475,12 +470,14 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
             return Response({'error': 'file field talab qilinadi'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            workbook = load_workbook(uploaded, data_only=True)
+            workbook = load_workbook(uploaded, read_only=True, data_only=True)
         except Exception:
             return Response({'error': 'XLSX faylni o\'qib bo\'lmadi'}, status=status.HTTP_400_BAD_REQUEST)
 
-        sheet = workbook.active
-        is_valid, expected, received = self._validate_nomenklatura_headers(sheet)
+        try:
+            is_valid, expected, received = self._validate_nomenklatura_headers(workbook.active)
+        finally:
+            workbook.close()
         if not is_valid:
             return Response(
                 {'error': 'Excel headerlari mos emas', 'expected': expected, 'received': received},
@@ -493,127 +490,142 @@ class NomenklaturaViewSet(viewsets.ModelViewSet):
                 project_id = int(str(project_id).strip())
             except (ValueError, TypeError):
                 project_id = None
-        
-        # Create persistent log
-        import_log = ImportLog.objects.create(
-            entity_type='nomenklatura',
-            filename=uploaded.name,
-            status='processing',
-            performed_by=request.user if request.user.is_authenticated else None
+
+        lookup = {'is_deleted': False}
+        if project_id:
+            lookup['project_id'] = project_id
+        importer = BulkImporter(
+            Nomenklatura,
+            'code_1c',
+            self._parse_import_row,
+            lookup=lookup,
+            cache_tags=entity_tags('nomenklatura', project_id),
         )
+        import_log = start_excel_import('nomenklatura', uploaded, request.user, importer, len(expected))
+        return Response(import_job_payload(request, import_log), status=status.HTTP_202_ACCEPTED)
 
-        stats = {'created': 0, 'updated': 0, 'errors': [], 'errors_json': []}
-        rows = list(sheet.iter_rows(min_row=2, max_col=len(expected), values_only=True))
-        import_log.total_rows = len(rows)
-        import_log.save()
+    @staticmethod
+    def _parse_import_row(row):
+        """Excel qatoridan (code_1c, defaults) - _nomenklatura_excel_headers tartibida"""
+        code = clean_cell(row[0])
+        if not code:
+            raise ValueError("code_1c bo'sh bo'lishi mumkin emas")
+
+        def number(value, types=(int, float)):
+            return value if isinstance(value, types) and not isinstance(value, bool) else None
+
+        defaults = {
+            'name': clean_cell(row[1]) or code,
+            'title': clean_cell(row[2]),
+            'description': row[3] if row[3] is not None else '',
+            'is_active': parse_bool_cell(row[4], default=True),
+            'is_deleted': False,
+            'sku': clean_cell(row[5]),
+            'barcode': clean_cell(row[6]),
+            'brand': clean_cell(row[7]),
+            'manufacturer': clean_cell(row[8]),
+            'model': clean_cell(row[9]),
+            'series': clean_cell(row[10]),
+            'vendor_code': clean_cell(row[11]),
+            'base_price': number(row[12]),
+            'sale_price': number(row[13]),
+            'cost_price': number(row[14]),
+            'currency': clean_cell(row[15]) or 'UZS',
+            'discount_percent': number(row[16]),
+            'tax_rate': number(row[17]),
+            'stock_quantity': number(row[18]),
+            'min_stock': number(row[19]),
+            'max_stock': number(row[20]),
+            'unit_of_measure': clean_cell(row[21]),
+            'weight': number(row[22]),
+            'dimensions': clean_cell(row[23]),
+            'volume': number(row[24]),
+            'category': clean_cell(row[25]),
+            'subcategory': clean_cell(row[26]),
+            'color': clean_cell(row[27]),
+            'size': clean_cell(row[28]),
+            'material': clean_cell(row[29]),
+            'warranty_period': number(row[30], int),
+            'notes': clean_cell(row[33]),
+            'rating': number(row[34]),
+            'popularity_score': number(row[35], int) or 0,
+            'seo_keywords': clean_cell(row[36]),
+            'source': clean_cell(row[37]),
+        }
+        # Date fields
+        if row[31]:  # expiry_date
+            defaults['expiry_date'] = row[31]
+        if row[32]:  # production_date
+            defaults['production_date'] = row[32]
+        return code, defaults
 
-        for idx, row in enumerate(rows, start=2):
-            if not row or all(value in (None, '') for value in row):
-                continue
-            
-            try:
-                # Basic fields
-                code = clean_cell(row[0])
-                if not code:
-                    error_msg = f"Row {idx}: code_1c bo'sh bo'lishi mumkin emas"
-                    stats['errors'].append(error_msg)
-                    continue
-                
-                name = clean_cell(row[1]) or code
-                title = clean_cell(row[2])
-                description = row[3] if row[3] is not None else ''
-                is_active = parse_bool_cell(row[4], default=True)
-
-                defaults = {
-                    'name': name,
-                    'title': title,
-                    'description': description,
-                    'is_active': is_active,
-                    'is_deleted': False,
-                    
-                    # Extended fields based on _nomenklatura_excel_headers
-                    'sku': clean_cell(row[5]),
-                    'barcode': clean_cell(row[6]),
-                    'brand': clean_cell(row[7]),
-                    'manufacturer': clean_cell(row[8]),
-                    'model': clean_cell(row[9]),
-                    'series': clean_cell(row[10]),
-                    'vendor_code': clean_cell(row[11]),
-                    'base_price': row[12] if isinstance(row[12], (int, float)) else None,
-                    'sale_price': row[13] if isinstance(row[13], (int, float)) else None,
-                    'cost_price': row[14] if isinstance(row[14], (int, float)) else None,
-                    'currency': clean_cell(row[15]) or 'UZS',
-                    'discount_percent': row[16] if isinstance(row[16], (int, float)) else None,
-                    'tax_rate': row[17] if isinstance(row[17], (int, float)) else None,
-                    'stock_quantity': row[18] if isinstance(row[18], (int, float)) else None,
-                    'min_stock': row[19] if isinstance(row[19], (int, float)) else None,
-                    'max_stock': row[20] if isinstance(row[20], (int, float)) else None,
-                    'unit_of_measure': clean_cell(row[21]),
-                    'weight': row[22] if isinstance(row[22], (int, float)) else None,
-                    'dimensions': clean_cell(row[23]),
-                    'volume': row[24] if isinstance(row[24], (int, float)) else None,
-                    'category': clean_cell(row[25]),
-                    'subcategory': clean_cell(row[26]),
-                    'color': clean_cell(row[27]),
-                    'size': clean_cell(row[28]),
-                    'material': clean_cell(row[29]),
-                    'warranty_period': row[30] if isinstance(row[30], int) else None,
-                    'notes': clean_cell(row[33]),
-                    'rating': row[34] if isinstance(row[34], (int, float)) else None,
-                    'popularity_score': row[35] if isinstance(row[35], int) else 0,
-                    'seo_keywords': clean_cell(row[36]),
-                    'source': clean_cell(row[37]),
-                }
-                
-                # Date fields
-                if row[31]: # expiry_date
-                    defaults['expiry_date'] = row[31]
-                if row[32]: # production_date
-                    defaults['production_date'] = row[32]
-
-                lookup = {'code_1c': code, 'is_deleted': False}
-                if project_id:
-                    lookup['project_id'] = project_id
-                    defaults['project_id'] = project_id
-                
-                # Use filter().first() instead of update_or_create to avoid MultipleObjectsReturned
-                # if there are duplicate codes across different projects or same project.
-                obj = Nomenklatura.objects.filter(**lookup).first()
-                if obj:
-                    for key, value in defaults.items():
-                        setattr(obj, key, value)
-                    obj.save()
-                    created_flag = False
-                else:
-                    obj = Nomenklatura.objects.create(**lookup, **defaults)
-                    created_flag = True
+    @extend_schema(
+        tags=['Nomenklatura'],
+        summary="Nomenklaturani CSV/NDJSON fayldan ommaviy import qilish",
+        description="""
+CSV yoki NDJSON (JSON lines) fayl, ixtiyoriy gzip bilan siqilgan (`.csv.gz`, `.ndjson.gz`).
 
-                if created_flag:
-                    stats['created'] += 1
-                else:
-                    stats['updated'] += 1
-                    
-            except Exception as exc:
-                error_item = f"Row {idx} ({code if 'code' in locals() else 'Unknown'}): {str(exc)}"
-                stats['errors'].append(error_item)
-                stats['errors_json'].append({'row': idx, 'code': code if 'code' in locals() else '', 'error': str(exc)})
-
-        # Finalize log
-        import_log.created_count = stats['created']
-        import_log.updated_count = stats['updated']
-        import_log.error_count = len(stats['errors'])
-        import_log.errors_json = stats.get('errors_json', [])
-        import_log.status = 'completed' if not stats['errors'] else 'error'
-        import_log.summary = f"Imported: {stats['created']}, Updated: {stats['updated']}, Errors: {len(stats['errors'])}"
-        import_log.save()
-        
-        # Clear cache
-        try:
-            cache.delete_pattern("nomenklatura_*")
-        except AttributeError:
-            cache.clear()
+- Ustunlar Excel headerlari bilan bir xil nomlansa avtomatik bog'lanadi;
+  boshqa nomlar uchun `mapping` - `{"fayldagi ustun": "maydon"}` JSON.
+- Faqat faylda bor maydonlar yangilanadi, noma'lum ustunlar `ignored_columns` da qaytariladi.
+- Import sinxron bajariladi; javobda natija va tezlik (`rows_per_second`).
+- Fayl hajmi `RECORD_IMPORT_MAX_SIZE` (standart 20 MB) bilan cheklangan; kattaroq fayllar uchun `import-xlsx`.
+""",
+        request={
+            'multipart/form-data': inline_serializer(
+                name='NomenklaturaBulkImportPayload',
+                fields={
+                    'file': serializers.FileField(help_text='CSV yoki NDJSON fayl (gzip bo\'lishi mumkin)'),
+                    'file_format': serializers.ChoiceField(choices=RECORD_FORMATS, required=False, help_text='Fayl nomidan aniqlanadi'),
+                    'mapping': serializers.CharField(required=False, help_text='JSON: {"ustun": "maydon"}'),
+                    'delimiter': serializers.CharField(required=False, help_text="CSV ajratuvchisi: , ; | tab"),
+                    'project_id': serializers.IntegerField(required=False, help_text='Loyiha ID'),
+                },
+            )
+        },
+        responses={
+            200: OpenApiResponse(description="Import natijasi (created, updated, errors, rows_per_second)"),
+            400: OpenApiResponse(description="Yaroqsiz fayl, format yoki mapping"),
+        },
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_import(self, request):
+        uploaded = request.FILES.get('file')
+        if not uploaded:
+            return Response({'error': 'file field talab qilinadi'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(stats, status=status.HTTP_200_OK)
+        project_id = request.data.get('project_id')
+        if project_id:
+            try:
+                project_id = int(str(project_id).strip())
+            except (ValueError, TypeError):
+                project_id = None
+        lookup = {'is_deleted': False}
+        if project_id:
+            lookup['project_id'] = project_id
+        try:
+            result = import_records(
+                uploaded,
+                entity_type='nomenklatura',
+                model=Nomenklatura,
+                code_field='code_1c',
+                fields=self._nomenklatura_excel_headers(),
+                user=request.user,
+                lookup=lookup,
+                cache_tags=entity_tags('nomenklatura', project_id),
+                mapping=parse_mapping(request.data.get('mapping')),
+                file_format=request.data.get('file_format'),
+                delimiter=request.data.get('delimiter') or ',',
+            )
+        except RecordImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
 
 @extend_schema_view(
     list=extend_schema(
@@ -679,6 +691,19 @@ class NomenklaturaImageViewSet(viewsets.ModelViewSet):
         return super().get_queryset().select_related(
             'nomenklatura', 'nomenklatura__project', 'status', 'source'
         ).order_by('-created_at')
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_entity('nomenklatura_image', serializer.instance.nomenklatura.project_id)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_entity('nomenklatura_image', serializer.instance.nomenklatura.project_id)
+
+    def perform_destroy(self, instance):
+        project_id = instance.nomenklatura.project_id
+        super().perform_destroy(instance)
+        invalidate_entity('nomenklatura_image', project_id)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -699,7 +724,7 @@ class NomenklaturaImageViewSet(viewsets.ModelViewSet):
                 response=NomenklaturaImageSerializer(many=True),
                 description="Yangi yuklangan rasmlar ro'yxati",
             ),
-            400: OpenApiResponse(description="Kerakli maydonlar yetishmaydi"),
+            400: OpenApiResponse(description="Kerakli maydonlar yetishmaydi yoki yaroqsiz rasm fayli"),
             404: OpenApiResponse(description="Nomenklatura topilmadi"),
         },
         examples=[
@@ -753,23 +778,26 @@ class NomenklaturaImageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        category = request.data.get('category', '')
-        note = request.data.get('note', '')
-        
-        created_images = []
-        for image in images:
-            image_obj = NomenklaturaImage.objects.create(
-                nomenklatura=nomenklatura,
-                image=image,
-                is_main=False,
-                is_active=True,
-                is_deleted=False,
-                category=category,
-                note=note,
+        uploader = BulkImageUploader(
+            NomenklaturaImage,
+            {
+                'nomenklatura': nomenklatura,
+                'is_main': False,
+                'is_active': True,
+                'is_deleted': False,
+                'category': request.data.get('category', ''),
+                'note': request.data.get('note', ''),
+            },
+            cache_tags=entity_tags('nomenklatura_image', nomenklatura.project_id),
+        )
+        created, errors = uploader.upload(images)
+        if errors:
+            return Response(
+                {'error': 'Yaroqsiz rasm fayllari', 'files': errors},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            serializer = NomenklaturaImageSerializer(image_obj, context={'request': request})
-            created_images.append(serializer.data)
-        
+
+        created_images = NomenklaturaImageSerializer(created, many=True, context={'request': request}).data
         return Response({
             'message': f'{len(created_images)} ta rasm muvaffaqiyatli yuklandi',
             'images': created_images
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.refdata import reference_data
+
+from .models import VisitPriority, VisitStatus, VisitType
+
+
+@receiver([post_save, post_delete], sender=VisitType)
+@receiver([post_save, post_delete], sender=VisitStatus)
+@receiver([post_save, post_delete], sender=VisitPriority)
+def invalidate_visit_references(sender, using=None, **kwargs):
+    """Ma'lumotnoma o'zgarsa reference registry versiyasini yangilash"""
+    reference_data.invalidate(sender, using=using)
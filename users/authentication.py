@@ -0,0 +1,17 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .tokens import principal_from_token
+
+
+class ScopedJWTAuthentication(JWTAuthentication):
+    """
+    Oddiy foydalanuvchilar token claim'laridan (bazasiz) autentifikatsiya qilinadi.
+    Staff/admin va scope claim'lari yo'q token'lar uchun `User` bazadan yuklanadi
+    (huquqlar va `is_active` har so'rovda tekshiriladi).
+    """
+
+    def get_user(self, validated_token):
+        user = principal_from_token(validated_token)
+        if user is None:
+            return super().get_user(validated_token)
+        return user
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from .models import UserProfile, AgentBusinessRegion
+from .tokens import ScopedRefreshToken
 
 User = get_user_model()
 
@@ -23,3 +25,13 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_active', 'profile']
         read_only_fields = ['id']
+
+
+class ScopedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Access token scope claim'lari bilan"""
+    token_class = ScopedRefreshToken
+
+
+class ScopedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh'da scope claim'lari bazadan qayta yoziladi"""
+    token_class = ScopedRefreshToken
@@ -2,8 +2,10 @@ import requests
 import xml.etree.ElementTree as ET
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import transaction
+from utils.scope import invalidate_principal_scope
 from .models import AuthProject, UserProfile, AgentBusinessRegion
+from .tokens import ScopedRefreshToken
 
 User = get_user_model()
 
@@ -267,27 +269,31 @@ class OneCAuthService:
                 regions_data = cls.parse_business_regions(response.content)
                 if regions_data:
                     # Remove old regions and add new ones
-                    AgentBusinessRegion.objects.filter(profile=profile).delete()
-                    for reg in regions_data:
-                        AgentBusinessRegion.objects.create(
-                            profile=profile,
-                            code=reg['code'],
-                            name=reg['name'] or f"Region {reg['code']}"
-                        )
+                    with transaction.atomic():
+                        AgentBusinessRegion.objects.filter(profile=profile).delete()
+                        AgentBusinessRegion.objects.bulk_create([
+                            AgentBusinessRegion(
+                                profile=profile,
+                                code=reg['code'],
+                                name=reg['name'] or f"Region {reg['code']}"
+                            )
+                            for reg in regions_data
+                        ])
+                        # bulk_create signal yubormaydi - scope'ni shu yerda yangilash
+                        invalidate_principal_scope(profile.user_id)
                     print(f"DEBUG: Synced {len(regions_data)} business regions for agent {user_code}")
         except Exception as e:
             print(f"ERROR: Failed to sync business regions: {e}")
 
     @staticmethod
     def get_tokens_for_user(user):
-        refresh = RefreshToken.for_user(user)
-        
-        # Calculate expiry times based on settings (or token payload)
-        # refresh.access_token.payload['exp'] is a timestamp
+        refresh = ScopedRefreshToken.for_user(user)
+        # Access token scope claim'lari bilan (project, profil, agent kodi, regionlar)
+        access = refresh.access_token
         
         return {
             'refresh': str(refresh),
-            'access': str(refresh.access_token),
-            'access_expires_at': refresh.access_token['exp'],
+            'access': str(access),
+            'access_expires_at': access['exp'],
             'refresh_expires_at': refresh['exp'],
         }
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.scope import invalidate_all_principal_scopes, invalidate_principal_scope
+
+from .models import AgentBusinessRegion, AuthProject, UserProfile
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_scope(sender, instance, using=None, **kwargs):
+    """Profil (project, kodlar) o'zgarsa foydalanuvchi scope'ini yangilash"""
+    invalidate_principal_scope(instance.user_id, using=using)
+
+
+@receiver([post_save, post_delete], sender=AgentBusinessRegion)
+def invalidate_region_scope(sender, instance, using=None, **kwargs):
+    user_id = UserProfile.objects.filter(pk=instance.profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_principal_scope(user_id, using=using)
+
+
+@receiver([post_save, post_delete], sender=AuthProject)
+def invalidate_auth_project_scopes(sender, using=None, **kwargs):
+    """project_code o'zgarsa AuthProject -> api.Project xaritasi ham o'zgaradi"""
+    invalidate_all_principal_scopes(using=using)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_stamp(sender, instance, using=None, update_fields=None, **kwargs):
+    """is_active yoki parol o'zgarsa token claim'lari eskiradi (stamp orqali)"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_principal_scope(instance.pk, using=using)
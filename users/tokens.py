@@ -0,0 +1,73 @@
+"""
+Scope claim'lari bilan JWT.
+
+Access token'ga foydalanuvchining principal scope'i (profil, AuthProject,
+api.Project, agent kodi, region kodlari) yoziladi. Shunda oddiy agent
+so'rovlari uchun `User`, `profile` va `profile.project` ni bazadan o'qish
+kerak bo'lmaydi - `principal_from_token` token'ning o'zidan foydalanuvchi
+yasaydi. Staff/admin token'lari va claim'siz (eski) token'lar uchun None
+qaytadi - ular odatdagidek bazadan yuklanadi.
+
+Claim'lar access token yaratilganda (login, refresh) yangilanadi. Token'dagi
+`scope_stamp` har so'rovda keshdagi `principal_stamp` bilan solishtiriladi:
+scope, `is_active` yoki parol o'zgargan bo'lsa (mos kelmasa) None qaytadi va
+foydalanuvchi bazadan yuklanadi - `is_active` va `CHECK_REVOKE_TOKEN` odatdagidek
+tekshiriladi.
+"""
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from utils.scope import PrincipalScope, get_principal_scope, principal_stamp
+
+# Token'dagi foydalanuvchi maydonlari; qolganlari (email, first_name, ...) deferred
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+SCOPE_CLAIMS = PrincipalScope.__slots__
+STAMP_CLAIM = 'scope_stamp'
+
+
+def add_scope_claims(token, user):
+    for name in USER_CLAIMS:
+        token[name] = getattr(user, name)
+    scope = get_principal_scope(user)
+    for name, value in scope.as_dict().items():
+        token[name] = list(value) if name == 'region_codes' else value
+    token[STAMP_CLAIM] = principal_stamp(user.pk)
+    return token
+
+
+class ScopedRefreshToken(RefreshToken):
+    """Har bir yangi access token'ga joriy scope claim'larini yozadi"""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            add_scope_claims(access, user)
+        return access
+
+
+def principal_from_token(token):
+    """
+    Token claim'laridan bazaga murojaatsiz `User`.
+    Faqat token'dagi maydonlar yuklangan, qolganlari birinchi murojaatda
+    bazadan o'qiladi (`user.profile` ham). Staff/admin, claim'siz yoki
+    stamp'i eskirgan token - None.
+    """
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None or 'profile_id' not in token or token.get('is_staff') or token.get('is_superuser'):
+        return None
+    stamp = token.get(STAMP_CLAIM)
+    if stamp is None or stamp != principal_stamp(user_id):
+        return None
+    User = get_user_model()
+    user = User.from_db(
+        DEFAULT_DB_ALIAS,
+        [User._meta.pk.attname, 'username', 'is_staff', 'is_superuser', 'is_active'],
+        [User._meta.pk.to_python(user_id), token.get('username', ''), False, False, True],
+    )
+    user._principal_scope = PrincipalScope(**{name: token.get(name) for name in SCOPE_CLAIMS if name in token})
+    return user
@@ -1,48 +1,152 @@
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from django.core.cache import caches, cache
+from django.db import close_old_connections
+import hashlib
+import json
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-def smart_cache_get(key, default=None):
+# L1 / L2 ----------------------------------------------------------------------
+#
+# L2 - umumiy kesh (Redis, ishlamasa `fallback` LocMem). L1 - har bir jarayondagi
+# chegaralangan LRU: qiymatlar pickle/zlib'siz saqlanadi va qisqa TTL bilan
+# yashaydi, shuning uchun tez-tez o'qiladigan kalitlar Redis'ga bormaydi.
+# L2'da yo'q kalitlar ham L1'da qisqa muddat eslab qolinadi (negative caching).
+# Boshqa jarayondagi yozish/o'chirish bu jarayonda ko'pi bilan L1 TTL'dan keyin
+# ko'rinadi - aniq invalidatsiya kerak bo'lsa teglardan foydalaning (pastda).
+
+_MISSING = object()
+
+
+def _key_prefix(key):
+    return str(key).split(':', 1)[0]
+
+
+class LocalLRUCache:
     """
-    Redis dan ma'lumot olishga harakat qiladi, agar Redis o'chiq bo'lsa 
-    LocMem (fallback) dan qidiradi.
+    L1: jarayon ichidagi LRU. Qaytarilgan qiymatlar jarayon bo'ylab umumiy -
+    ularni o'zgartirmang.
     """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'CACHE_L1_MAX_ENTRIES', 2048)
+
+    def get(self, key):
+        """(topildi, qiymat); qiymat `_MISSING` bo'lishi mumkin (negative entry)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries}
+
+
+local_cache = LocalLRUCache()
+
+
+def _l1_ttl(timeout):
+    ttl = getattr(settings, 'CACHE_L1_TTL', 5)
+    return ttl if timeout is None else min(ttl, timeout)
+
+
+def _l2_get(key):
+    """Redis, so'ng fallback LocMem. Yo'q bo'lsa `_MISSING`."""
     try:
-        # Default (Redis) dan olishga harakat
-        value = cache.get(key)
-        if value is not None:
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING and value is not None:
             return value
     except Exception as e:
         logger.warning(f"Primary cache (Redis) error: {e}")
-    
-    # Fallback (LocMem) dan ko'rish
+
     try:
-        return caches['fallback'].get(key, default)
+        return caches['fallback'].get(key, _MISSING)
     except Exception as e:
         logger.error(f"Fallback cache error: {e}")
+        return _MISSING
+
+
+def smart_cache_get(key, default=None, local=True):
+    """
+    L1 -> Redis -> LocMem (fallback). `local=False` - L1'ni chetlab o'tish
+    (masalan versiya kalitlari boshqa jarayonlar yozuvini darhol ko'rishi kerak).
+    """
+    prefix = _key_prefix(key)
+    if local:
+        found, value = local_cache.get(key)
+        if found:
+            cache_metrics.incr('hits_l1', prefix)
+            return default if value is _MISSING else value
+
+    value = _l2_get(key)
+    if value is _MISSING:
+        cache_metrics.incr('misses', prefix)
+        if local:
+            local_cache.set(key, _MISSING, getattr(settings, 'CACHE_L1_NEGATIVE_TTL', 1))
         return default
 
+    cache_metrics.incr('hits_l2', prefix)
+    if local:
+        local_cache.set(key, value, _l1_ttl(None))
+    return value
+
 def smart_cache_set(key, value, timeout=300):
     """
-    Redis va LocMem ikkalasiga ham yozadi.
+    L1 va Redis ga yozadi. Redis yozuvni qabul qilmasa (o'chiq) LocMem ga.
     """
-    # Redis ga yozish
+    local_cache.set(key, value, _l1_ttl(timeout))
+    written = None
     try:
-        cache.set(key, value, timeout)
+        # IGNORE_EXCEPTIONS rejimida ulanish xatosi None qaytaradi
+        written = cache.set(key, value, timeout)
     except Exception as e:
         logger.warning(f"Primary cache (Redis) write error: {e}")
-    
-    # LocMem ga ham zaxira sifatida yozish
-    try:
-        caches['fallback'].set(key, value, timeout)
-    except Exception as e:
-        logger.error(f"Fallback cache write error: {e}")
+
+    if written is False or written is None:
+        try:
+            caches['fallback'].set(key, value, timeout)
+        except Exception as e:
+            logger.error(f"Fallback cache write error: {e}")
 
 def smart_cache_delete(key):
     """
-    Har ikkala keshdan o'chiradi.
+    Barcha qatlamlardan o'chiradi.
     """
+    local_cache.delete(key)
     try:
         cache.delete(key)
     except Exception:
@@ -52,3 +156,337 @@ def smart_cache_delete(key):
         caches['fallback'].delete(key)
     except Exception:
         pass
+
+
+def smart_cache_delete_pattern(*patterns):
+    """
+    Kalitlarni pattern bo'yicha o'chirish (Redis `delete_pattern`).
+    Backend pattern'ni qo'llamasa kesh to'liq tozalanadi; fallback LocMem har doim tozalanadi.
+    """
+    local_cache.clear()
+    try:
+        for pattern in patterns:
+            cache.delete_pattern(pattern)
+    except AttributeError:
+        cache.clear()
+    except Exception as e:
+        logger.warning(f"Primary cache (Redis) delete_pattern error: {e}")
+
+    try:
+        caches['fallback'].clear()
+    except Exception:
+        pass
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Bir jarayonda bir kalit uchun bir vaqtda faqat bitta hisoblash (qolganlari natijani kutadi)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            cache_metrics.incr('coalesced', _key_prefix(key))
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        cache_metrics.incr('loads', _key_prefix(key))
+        try:
+            flight.value = fn()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+
+single_flight = SingleFlight()
+
+
+class CacheMetrics:
+    """Jarayon ichidagi kesh hisoblagichlari: guruh (masalan `invalidations`) -> nom -> son"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(Counter)
+
+    def incr(self, group, name, amount=1):
+        with self._lock:
+            self._counters[group][name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {group: dict(counter) for group, counter in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+cache_metrics = CacheMetrics()
+
+
+# Teglar (generation counter) ------------------------------------------------
+#
+# Keshlangan javob o'zi bog'liq teglarni e'lon qiladi: `client:*` (barcha
+# project'lardagi client'lar) yoki `client:12` (12-project client'lari).
+# Kalitga teglarning joriy generation'lari qo'shiladi, yozish esa faqat tegishli
+# teglarning counter'ini oshiradi - eski yozuvlar endi o'qilmaydi va TTL bilan
+# o'chib ketadi. `cache.clear()` kerak emas.
+
+TAG_VERSION_PREFIX = 'tagv:'
+ALL_PROJECTS = '*'
+
+
+def cache_tag(entity, project_id=None):
+    """(project, entity turi) tegi"""
+    return f"{entity}:{ALL_PROJECTS if project_id in (None, '') else project_id}"
+
+
+def entity_tags(entity, project_id=None):
+    """Yozish uchun teglar: project tegi va har doim barcha project'lar tegi"""
+    if project_id in (None, ''):
+        return (cache_tag(entity),)
+    return (cache_tag(entity, project_id), cache_tag(entity))
+
+
+def _initial_generation():
+    # Counter yo'qolsa (eviction, Redis qayta ishga tushishi) eski generation'lar qaytmasin
+    return int(time.time() * 1000)
+
+
+def tag_versions(tags):
+    """Teglarning joriy generation'lari: {tag: int}. Yo'q bo'lganlari yaratiladi."""
+    keys = {f"{TAG_VERSION_PREFIX}{tag}": tag for tag in tags}
+    found = {}
+    try:
+        found = cache.get_many(list(keys)) or {}
+    except Exception as e:
+        logger.warning(f"Primary cache (Redis) get_many error: {e}")
+    missing = [key for key in keys if key not in found]
+    if missing:
+        try:
+            found.update(caches['fallback'].get_many(missing))
+        except Exception as e:
+            logger.error(f"Fallback cache get_many error: {e}")
+    for key in keys:
+        if key not in found:
+            generation = _initial_generation()
+            if not _cache_add(key, generation, None):
+                generation = smart_cache_get(key, generation)
+            else:
+                _fallback_set(key, generation)
+            found[key] = generation
+    return {tag: found[key] for key, tag in keys.items()}
+
+
+def tagged_key(key, tags):
+    """Kalitga teglar generation'larini qo'shish: teg yangilansa kalit ham o'zgaradi"""
+    if not tags:
+        return key
+    versions = tag_versions(sorted(set(tags)))
+    digest = hashlib.sha256(
+        '|'.join(f"{tag}={version}" for tag, version in versions.items()).encode('utf-8')
+    ).hexdigest()[:16]
+    return f"{key}:g{digest}"
+
+
+def _fallback_set(key, value):
+    try:
+        caches['fallback'].set(key, value, None)
+    except Exception as e:
+        logger.error(f"Fallback cache write error: {e}")
+
+
+def invalidate_tags(*tags):
+    """Teglarning generation counter'ini oshirish (faqat shu teglarga bog'liq yozuvlar eskiradi)"""
+    for tag in dict.fromkeys(tags):
+        key = f"{TAG_VERSION_PREFIX}{tag}"
+        try:
+            generation = cache.incr(key)
+        except ValueError:
+            generation = _initial_generation()
+            cache.set(key, generation, None)
+        except Exception as e:
+            logger.warning(f"Primary cache (Redis) incr error: {e}")
+            generation = None
+        try:
+            caches['fallback'].incr(key)
+        except ValueError:
+            _fallback_set(key, generation or _initial_generation())
+        except Exception:
+            pass
+        cache_metrics.incr('invalidations', tag)
+    logger.debug(f"Cache tags invalidated: {', '.join(tags)}")
+
+
+def invalidate_entity(entity, project_id=None):
+    invalidate_tags(*entity_tags(entity, project_id))
+
+
+def _normalize_cache_part(value):
+    """Kesh kaliti uchun qiymatni barqaror (deterministik) ko'rinishga keltirish"""
+    if hasattr(value, 'getlist') and hasattr(value, 'keys'):
+        # QueryDict: har bir kalit uchun barcha qiymatlar, tartibdan qat'i nazar
+        return {str(k): sorted(str(v).strip() for v in value.getlist(k)) for k in value.keys()}
+    if isinstance(value, dict):
+        return {str(k): _normalize_cache_part(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_cache_part(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_normalize_cache_part(v) for v in value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def build_cache_key(prefix, params=None):
+    """
+    Deterministik kesh kaliti: `prefix:<sha256>`.
+
+    Python'ning `hash()` funksiyasidan farqli ravishda natija jarayonlar
+    (gunicorn workerlar) o'rtasida bir xil, shuning uchun kesh umumiy bo'ladi.
+    """
+    canonical = json.dumps(
+        _normalize_cache_part(params or {}),
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str,
+    )
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:40]
+    return f"{prefix}:{digest}"
+
+
+def _cache_add(key, value, timeout):
+    """Atomik `add` (Redis SET NX). Redis ishlamasa fallback keshga o'tadi."""
+    try:
+        added = cache.add(key, value, timeout)
+        if added is not None:
+            return bool(added)
+    except Exception as e:
+        logger.warning(f"Primary cache (Redis) add error: {e}")
+    try:
+        return bool(caches['fallback'].add(key, value, timeout))
+    except Exception as e:
+        logger.error(f"Fallback cache add error: {e}")
+        return True  # Lock olinmasa ham so'rov bloklanib qolmasin
+
+
+def _store_envelope(key, value, ttl, stale_ttl):
+    envelope = {'value': value, 'fresh_until': time.time() + ttl}
+    smart_cache_set(key, envelope, ttl + stale_ttl)
+
+
+_rebuild_executor = None
+
+
+def _get_rebuild_executor():
+    """Stale kalitlarni qayta qurish uchun chegaralangan pool (har kalitga thread emas)"""
+    global _rebuild_executor
+    if _rebuild_executor is None:
+        _rebuild_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'CACHE_REBUILD_WORKERS', 4),
+            thread_name_prefix='cache-rebuild',
+        )
+    return _rebuild_executor
+
+
+def _rebuild_in_background(key, lock_key, builder, ttl, stale_ttl):
+    """`builder` request'ni emas, oddiy parametrlarni saqlashi kerak - u so'rovdan keyin ishlaydi"""
+    def _run():
+        try:
+            _store_envelope(key, builder(), ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Background cache rebuild failed for {key}: {e}")
+        finally:
+            smart_cache_delete(lock_key)
+            close_old_connections()
+
+    _get_rebuild_executor().submit(_run)
+
+
+def get_or_build(key, builder, ttl=180, stale_ttl=300, lock_timeout=30, wait_timeout=5.0, tags=()):
+    """
+    Single-flight + stale-while-revalidate kesh.
+
+    - Yangi (fresh) qiymat bo'lsa darhol qaytaradi.
+    - Eskirgan (stale) qiymat bo'lsa uni qaytaradi, va faqat lock olgan bitta
+      worker fonda qayta quradi.
+    - Qiymat umuman bo'lmasa lock olgan worker quradi, qolganlari
+      `wait_timeout` soniyagacha natijani kutadi.
+    - `tags` berilsa kalit teglar generation'iga bog'lanadi (`invalidate_tags`).
+    """
+    key = tagged_key(key, tags)
+    lock_key = f"{key}:lock"
+    envelope = smart_cache_get(key)
+    if envelope is not None:
+        if envelope['fresh_until'] > time.time():
+            return envelope['value']
+        if _cache_add(lock_key, 1, lock_timeout):
+            _rebuild_in_background(key, lock_key, builder, ttl, stale_ttl)
+        return envelope['value']
+
+    # Bir jarayondagi parallel so'rovlar Redis lock'ini emas, leader natijasini kutadi
+    return single_flight.do(
+        key, lambda: _build_shared(key, lock_key, builder, ttl, stale_ttl, lock_timeout, wait_timeout),
+    )
+
+
+def _build_shared(key, lock_key, builder, ttl, stale_ttl, lock_timeout, wait_timeout):
+    """Jarayonlar o'rtasidagi single-flight: lock olgan worker quradi"""
+    if not _cache_add(lock_key, 1, lock_timeout):
+        deadline = time.time() + wait_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            envelope = smart_cache_get(key, local=False)
+            if envelope is not None:
+                return envelope['value']
+        logger.warning(f"Cache single-flight wait timed out for {key}, building locally")
+        return builder()
+
+    try:
+        value = builder()
+        _store_envelope(key, value, ttl, stale_ttl)
+        return value
+    finally:
+        smart_cache_delete(lock_key)
+
+
+def get_or_set(key, loader, timeout=300):
+    """
+    L1 -> L2 -> `loader()`. Bir jarayonda bir kalit uchun parallel miss'lar
+    `loader` ni bir marta chaqiradi. `loader` None qaytarsa keshlanmaydi.
+    """
+    value = smart_cache_get(key)
+    if value is not None:
+        return value
+
+    def _load():
+        # Leader kutayotgan paytda boshqa thread yozib ulgurgan bo'lishi mumkin
+        found, value = local_cache.get(key)
+        if found and value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            smart_cache_set(key, value, timeout)
+        return value
+
+    return single_flight.do(key, _load)
@@ -1,11 +1,24 @@
+import csv
+import json
+import tempfile
 from io import BytesIO
-from typing import Iterable, List, Sequence
+from typing import Callable, Iterable, Iterator, List, Sequence
 
-from django.http import HttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 
 EXCEL_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_FORMATS = {
+    "xlsx": (EXCEL_CONTENT_TYPE, "xlsx"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+EXPORT_CHUNK_SIZE = 1000
+# Spooled temp file keeps small workbooks in memory and spills big ones to disk
+XLSX_SPOOL_MAX_SIZE = 8 * 1024 * 1024
 
 
 def workbook_to_response(workbook: Workbook, filename: str) -> HttpResponse:
@@ -57,3 +70,99 @@ def clean_cell(value) -> str:
         return ""
     return str(value).strip()
 
+
+
+def iterate_keyset(queryset: QuerySet, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator:
+    """
+    Iterate a queryset in primary-key order using keyset pagination
+    (`WHERE pk > last ORDER BY pk LIMIT n`) instead of OFFSET slices.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1].pk
+
+
+def parse_export_format(value: str | None, default: str = "xlsx") -> str | None:
+    """Validate the requested export format; returns None when unsupported."""
+    normalized = (value or default).strip().lower()
+    return normalized if normalized in EXPORT_FORMATS else None
+
+
+def export_cell(value):
+    """Normalize a value for CSV/XLSX cells (None -> empty string, dates -> ISO)."""
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat") and not isinstance(value, bool):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_stream(headers: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens UTF-8 CSV (Cyrillic/Uzbek text) correctly
+    yield "\ufeff" + writer.writerow(list(headers))
+    for row in rows:
+        yield writer.writerow([export_cell(value) for value in row])
+
+
+def _ndjson_stream(headers: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    keys = list(headers)
+    for row in rows:
+        yield json.dumps(dict(zip(keys, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _xlsx_file(title: str, headers: Sequence[str], rows: Iterable[Sequence]):
+    """Write rows into a write_only workbook; returns a rewound temporary file."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    for idx, header in enumerate(headers, start=1):
+        sheet.column_dimensions[get_column_letter(idx)].width = max(len(str(header)) + 5, 15)
+    sheet.append(list(headers))
+    for row in rows:
+        sheet.append([export_cell(value) for value in row])
+    output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_response(
+    export_format: str,
+    filename: str,
+    title: str,
+    headers: Sequence[str],
+    queryset: QuerySet,
+    row_builder: Callable | None = None,
+) -> HttpResponse:
+    """
+    Stream a queryset export as XLSX (write_only), CSV or NDJSON.
+
+    Rows are fetched with keyset iteration and converted by `row_builder(obj)`
+    (default: model attributes named by `headers`), so memory use does not grow
+    with the number of rows. `filename` is given without extension.
+    """
+    content_type, extension = EXPORT_FORMATS[export_format]
+    if row_builder is None:
+        row_builder = lambda obj: [getattr(obj, header) for header in headers]  # noqa: E731
+    rows = (row_builder(obj) for obj in iterate_keyset(queryset))
+    if export_format == "xlsx":
+        response = FileResponse(_xlsx_file(title, headers, rows), content_type=content_type)
+    elif export_format == "csv":
+        response = StreamingHttpResponse(_csv_stream(headers, rows), content_type=content_type)
+    else:
+        response = StreamingHttpResponse(_ndjson_stream(headers, rows), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{extension}"'
+    return response
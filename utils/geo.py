@@ -0,0 +1,136 @@
+"""
+Geohash asosidagi oddiy spatial indeks yordamchilari (PostGIS talab qilinmaydi).
+
+Koordinatalar insert vaqtida geohash satriga aylantiriladi va indekslangan
+CharField'da saqlanadi. Qidiruv ikki bosqichda bajariladi:
+    1. bbox'ni qoplovchi geohash kataklari bo'yicha prefix (startswith) lookup;
+    2. topilgan nomzodlarni NumPy haversine bilan aniq filtrlash.
+"""
+import math
+
+import numpy as np
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~4.8m x 4.8m
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+# Bitta so'rovda ishlatiladigan prefix kataklarining maksimal soni
+MAX_COVER_CELLS = 32
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Koordinatani geohash satriga aylantirish"""
+    lat = float(latitude)
+    lng = float(longitude)
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bit = 0
+    ch = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_BASE32[ch])
+            bit = 0
+            ch = 0
+    return ''.join(chars)
+
+
+def safe_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Koordinata yo'q yoki noto'g'ri bo'lsa bo'sh satr qaytaradi"""
+    if latitude is None or longitude is None:
+        return ''
+    try:
+        lat = float(latitude)
+        lng = float(longitude)
+    except (TypeError, ValueError):
+        return ''
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return ''
+    return geohash_encode(lat, lng, precision)
+
+
+def cell_size_degrees(precision):
+    """Berilgan aniqlikdagi katak o'lchami (lat_deg, lng_deg)"""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def radius_to_bbox(latitude, longitude, radius_m):
+    """Markaz va radiusdan (min_lat, min_lng, max_lat, max_lng) bbox hisoblash"""
+    lat = float(latitude)
+    lng = float(longitude)
+    dlat = radius_m / METERS_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = radius_m / (METERS_PER_DEGREE * cos_lat)
+    return (
+        max(lat - dlat, -90.0),
+        max(lng - dlng, -180.0),
+        min(lat + dlat, 90.0),
+        min(lng + dlng, 180.0),
+    )
+
+
+def bbox_cover_cells(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """
+    Bbox'ni to'liq qoplaydigan geohash prefikslari ro'yxati.
+    Kataklar soni `max_cells` dan oshmaydigan eng aniq darajani tanlaydi.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlng = cell_size_degrees(precision)
+        lat_start = math.floor((min_lat + 90.0) / dlat)
+        lat_end = math.floor((max_lat + 90.0) / dlat)
+        lng_start = math.floor((min_lng + 180.0) / dlng)
+        lng_end = math.floor((max_lng + 180.0) / dlng)
+        count = (lat_end - lat_start + 1) * (lng_end - lng_start + 1)
+        if count > max_cells and precision > 1:
+            continue
+        cells = set()
+        for i in range(lat_start, lat_end + 1):
+            center_lat = min(-90.0 + (i + 0.5) * dlat, 90.0)
+            for j in range(lng_start, lng_end + 1):
+                center_lng = min(-180.0 + (j + 0.5) * dlng, 180.0)
+                cells.add(geohash_encode(center_lat, center_lng, precision))
+        return sorted(cells)
+    return []
+
+
+def haversine_m(lat, lng, lats, lngs):
+    """Bitta nuqtadan massivdagi nuqtalargacha masofa (metr), vektorlashgan"""
+    lat1 = np.radians(float(lat))
+    lng1 = np.radians(float(lng))
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lng2 = np.radians(np.asarray(lngs, dtype=np.float64))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def in_bbox_mask(lats, lngs, min_lat, min_lng, max_lat, max_lng):
+    """Bbox ichidagi nuqtalar uchun boolean mask"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
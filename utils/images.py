@@ -0,0 +1,261 @@
+"""
+Rasm metama'lumotlari (o'lcham, format, hajm) bilan ishlash.
+
+Metama'lumotlar yuklash yoki rendition yaratilgan paytda bir marta
+hisoblanib, modelda saqlanadi. Feed va ro'yxatlar faqat DB'dan o'qiydi.
+"""
+import base64
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from utils.storage import assign_content_hash
+
+logger = logging.getLogger(__name__)
+
+IMAGE_METADATA_FIELDS = ['width', 'height', 'format', 'size_bytes']
+THUMBNAIL_METADATA_FIELDS = ['thumbnail_width', 'thumbnail_height', 'thumbnail_size_bytes', 'placeholder']
+
+# Qayta kodlashda Pillow saqlay oladigan formatlar (MPO - iPhone JPEG'i)
+REENCODE_FORMATS = {'JPEG': 'JPEG', 'MPO': 'JPEG', 'PNG': 'PNG', 'WEBP': 'WEBP', 'TIFF': 'TIFF'}
+DEFAULT_JPEG_QUALITY = 90
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+FORMAT_EXTENSIONS = {'JPEG': ('.jpg', '.jpeg'), 'PNG': ('.png',), 'WEBP': ('.webp',), 'TIFF': ('.tif', '.tiff')}
+
+
+def read_image_metadata(file_obj):
+    """
+    Fayl obyektidan width/height/format/size_bytes ni o'qish.
+    PIL faqat headerni o'qiydi, piksel ma'lumotlari dekodlanmaydi.
+    """
+    if not file_obj:
+        return None
+    try:
+        size_bytes = getattr(file_obj, 'size', None)
+        if hasattr(file_obj, 'seek'):
+            file_obj.seek(0)
+        with PILImage.open(file_obj) as img:
+            width, height = img.size
+            image_format = img.format or ''
+        if hasattr(file_obj, 'seek'):
+            file_obj.seek(0)
+        return {
+            'width': width,
+            'height': height,
+            'format': image_format,
+            'size_bytes': size_bytes,
+        }
+    except Exception as e:
+        logger.warning(f"Image metadata read error: {e}")
+        return None
+
+
+def build_placeholder(file_obj, size=PLACEHOLDER_SIZE):
+    """
+    LQIP: rasmni `size` px gacha kichraytirib, past sifatli JPEG base64 data URI qaytarish
+    (odatda 400-700 bayt). Klient uni blur bilan cho'zib ko'rsatadi.
+    """
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    with PILImage.open(file_obj) as img:
+        img.draft('RGB', (size * 4, size * 4))
+        small = img.convert('RGB')
+        small.thumbnail((size, size), PILImage.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    small.save(buffer, format='JPEG', quality=PLACEHOLDER_QUALITY, optimize=True)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def normalize_image(img, image_format, max_edge=None, quality=None):
+    """
+    Auto-orient (EXIF), uzun tomonni `max_edge` gacha kichraytirish va EXIF/GPS
+    metama'lumotlarisiz qayta kodlash. `quality` berilsa shaffof bo'lmagan rasmlar
+    shu sifatda JPEG'ga siqiladi.
+    Qaytaradi: (bytes, (width, height), format) yoki format qo'llab-quvvatlanmasa None.
+    """
+    target_format = REENCODE_FORMATS.get(image_format)
+    if not target_format:
+        return None
+    icc_profile = img.info.get('icc_profile')
+    img = ImageOps.exif_transpose(img)
+    if max_edge and max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), PILImage.Resampling.LANCZOS)
+
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    if quality and not has_alpha:
+        target_format = 'JPEG'
+    options = {}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if target_format == 'JPEG':
+        if img.mode not in ('RGB', 'L', 'CMYK'):
+            img = img.convert('RGB')
+        options.update(quality=quality or DEFAULT_JPEG_QUALITY, optimize=True)
+    elif target_format == 'WEBP' and quality:
+        options['quality'] = quality
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=target_format, **options)
+    return buffer.getvalue(), img.size, target_format
+
+
+def normalize_image_bytes(data, max_edge=None, quality=None):
+    """`normalize_image` ning bayt'lar uchun varianti"""
+    with PILImage.open(io.BytesIO(data)) as img:
+        img.load()
+        return normalize_image(img, img.format or '', max_edge=max_edge, quality=quality)
+
+
+def has_embedded_metadata(data):
+    """Faylda EXIF (GPS ham shu yerda) yoki XMP metama'lumotlari bormi (piksellar dekodlanmaydi)"""
+    with PILImage.open(io.BytesIO(data)) as img:
+        if img.getexif():
+            return True
+        return any(key in img.info for key in ('exif', 'xmp', 'XML:com.adobe.xmp'))
+
+
+def with_format_extension(name, image_format):
+    """Fayl kengaytmasini formatga moslash (masalan, HEIC->JPEG bo'lsa .jpg)"""
+    extensions = FORMAT_EXTENSIONS.get(image_format)
+    root, ext = os.path.splitext(name)
+    if not extensions or ext.lower() in extensions:
+        return name
+    return f'{root}{extensions[0]}'
+
+
+def get_upload_policy(instance):
+    """Rasm tegishli project'ning normalize siyosati (`Project.upload_policy`) yoki None"""
+    get_project = getattr(instance, 'get_project', None)
+    project = get_project() if get_project else None
+    return project.upload_policy if project else None
+
+
+def apply_upload_policy(instance, policy, field_name='image'):
+    """Yangi yuklangan faylni saqlashdan oldin siyosat bo'yicha normalize qilish"""
+    field_file = getattr(instance, field_name)
+    try:
+        field_file.file.seek(0)
+        result = normalize_image_bytes(field_file.file.read(), **policy)
+    except Exception as e:
+        logger.warning(f"Upload normalization failed ({instance.__class__.__name__}): {e}")
+        return False
+    if not result:
+        return False
+    data, _, image_format = result
+    name = with_format_extension(os.path.basename(field_file.name), image_format)
+    setattr(instance, field_name, ContentFile(data, name=name))
+    instance.is_normalized = True
+    return True
+
+
+def is_new_upload(field_file):
+    """ImageField'ga yangi fayl biriktirilgan (hali storage'ga yozilmagan)mi"""
+    return bool(field_file) and not getattr(field_file, '_committed', True)
+
+
+def has_new_image(instance, field_name='image'):
+    """
+    Saqlanayotgan yozuvda yangi rasm bormi: yangi yuklangan fayl yoki
+    birinchi marta saqlanayotgan obyekt (`FieldFile.save(..., save=True)` holati).
+    """
+    field_file = getattr(instance, field_name)
+    return is_new_upload(field_file) or (instance._state.adding and bool(field_file))
+
+
+def populate_image_metadata(instance, field_name='image'):
+    """Instance'ning original rasm maydonlarini (width, height, format, size_bytes) to'ldirish"""
+    meta = read_image_metadata(getattr(instance, field_name))
+    if not meta:
+        return False
+    for field, value in meta.items():
+        setattr(instance, field, value)
+    return True
+
+
+def populate_thumbnail_metadata(instance, spec_name='image_thumbnail', save=True):
+    """
+    Thumbnail rendition'ni yaratish (agar yo'q bo'lsa), uning o'lcham/hajmini va
+    LQIP placeholder'ni saqlash. `save=True` bo'lsa faqat thumbnail maydonlari UPDATE qilinadi.
+    """
+    try:
+        thumb = getattr(instance, spec_name)
+        if not thumb:
+            return False
+        thumb.generate()
+        with thumb.storage.open(thumb.name) as fh:
+            meta = read_image_metadata(fh)
+            placeholder = build_placeholder(fh) if meta else None
+    except Exception as e:
+        logger.warning(f"Thumbnail metadata error ({instance.__class__.__name__} #{instance.pk}): {e}")
+        return False
+    if not meta:
+        return False
+    if meta['size_bytes'] is None:
+        meta['size_bytes'] = thumb.storage.size(thumb.name)
+
+    values = {
+        'thumbnail_width': meta['width'],
+        'thumbnail_height': meta['height'],
+        'thumbnail_size_bytes': meta['size_bytes'],
+        'placeholder': placeholder,
+    }
+    for field, value in values.items():
+        setattr(instance, field, value)
+    if save and instance.pk:
+        instance.__class__.objects.filter(pk=instance.pk).update(**values)
+    return True
+
+
+def format_size(size_bytes):
+    """Bayt'larni KB yoki MB formatiga aylantirish"""
+    if size_bytes is None:
+        return None
+    if size_bytes >= 1024 * 1024:
+        return f"{size_bytes / (1024 * 1024):.2f} MB"
+    if size_bytes >= 1024:
+        return f"{size_bytes / 1024:.2f} KB"
+    return f"{size_bytes} B"
+
+
+def copy_metadata_from_duplicate(instance):
+    """
+    Xuddi shu blob'ga (content_hash) ega, rendition'lari tayyor yozuv bo'lsa uning
+    metama'lumotlarini nusxalash - fayl ochilmaydi va rendition qayta yaratilmaydi.
+    """
+    if not instance.content_hash:
+        return False
+    fields = IMAGE_METADATA_FIELDS + THUMBNAIL_METADATA_FIELDS
+    duplicate = instance.__class__.objects.filter(
+        content_hash=instance.content_hash,
+        renditions_ready=True,
+    ).exclude(pk=instance.pk).values(*fields).first()
+    if not duplicate:
+        return False
+    for field, value in duplicate.items():
+        setattr(instance, field, value)
+    instance.renditions_ready = True
+    return True
+
+
+def prepare_new_image(instance):
+    """
+    Yangi rasm saqlanishidan oldin: project siyosati bo'yicha normalize, content hash,
+    metama'lumotlar va rendition holati.
+    Qaytaradi: rendition'larni fonda yaratish kerakmi.
+    """
+    policy = get_upload_policy(instance)
+    if policy and is_new_upload(instance.image):
+        apply_upload_policy(instance, policy)
+    assign_content_hash(instance)
+    if copy_metadata_from_duplicate(instance):
+        return False
+    populate_image_metadata(instance)
+    instance.renditions_ready = False
+    for field in THUMBNAIL_METADATA_FIELDS:
+        setattr(instance, field, None)
+    return True
@@ -0,0 +1,266 @@
+"""
+Excel importlarini fon rejimida bajarish.
+
+Project, Client va Nomenklatura `import_xlsx` action'lari uchun umumiy:
+    1. So'rov ichida faqat headerlar tekshiriladi, fayl vaqtinchalik papkaga
+       yoziladi va `ImportLog` yaratiladi (javob darhol qaytadi);
+    2. fon thread'ida workbook `read_only` rejimda qatorma-qator o'qiladi;
+    3. qatorlar batch'larga yig'ilib, mavjud kodlar bitta so'rov bilan topiladi
+       va `bulk_create`/`bulk_update` bilan yoziladi;
+    4. har bir batch'dan keyin progress `ImportLog` ga yoziladi.
+Batch yozishda xato bo'lsa, o'sha batch qatorma-qator yoziladi - xato qatorlar
+alohida qayd etiladi, qolganlari saqlanadi.
+"""
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from core.models import ImportLog
+from utils.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+# ImportLog.errors_json ga yoziladigan xatolar chegarasi
+MAX_LOGGED_ERRORS = 1000
+
+
+class BulkImporter:
+    """
+    Bitta model uchun upsert.
+
+    `code_field` - qator kaliti (masalan `code_1c`), `parse_row(row)` - qatordan
+    `(code, defaults)` qaytaradi yoki `ValueError` ko'taradi, `lookup` - mavjud
+    yozuvlarni qidirishda va yangi yozuvlarda qo'llanadigan qo'shimcha filtrlar
+    (masalan `{'is_deleted': False, 'project_id': 1}`), `on_finish` - import
+    tugagach (xato bilan tugasa ham) chaqiriladi: bulk yozuvlar `post_save`
+    signalini yubormaydi, shuning uchun signal'ga bog'liq invalidatsiya shu yerda.
+    """
+
+    def __init__(self, model, code_field, parse_row, lookup=None, cache_tags=(), batch_size=None,
+                 on_finish=None):
+        self.model = model
+        self.code_field = code_field
+        self.parse_row = parse_row
+        self.lookup = lookup or {}
+        self.cache_tags = tuple(cache_tags)
+        self.batch_size = batch_size or getattr(settings, 'EXCEL_IMPORT_BATCH_SIZE', 500)
+        self.on_finish = on_finish
+
+    def _existing(self, codes):
+        """Batch'dagi kodlar uchun mavjud yozuvlar (bir nechta bo'lsa - eng kichik pk)"""
+        existing = {}
+        queryset = self.model.objects.filter(**self.lookup, **{f'{self.code_field}__in': codes}).order_by('pk')
+        for obj in queryset:
+            existing.setdefault(getattr(obj, self.code_field), obj)
+        return existing
+
+    def process_batch(self, batch, stats):
+        """`batch` - [(qator raqami, qiymatlar), ...]"""
+        parsed = {}
+        for idx, row in batch:
+            try:
+                code, defaults = self.parse_row(row)
+            except (ValueError, TypeError) as e:
+                stats.error(idx, '', str(e))
+                continue
+            # Fayl ichidagi takroriy kod: oxirgi qator g'olib (ketma-ket upsert bilan bir xil)
+            parsed[code] = (idx, defaults)
+        if not parsed:
+            return
+
+        existing = self._existing(list(parsed))
+        now = timezone.now()
+        to_create, to_update, fields = [], [], set()
+        for code, (idx, defaults) in parsed.items():
+            obj = existing.get(code)
+            if obj is None:
+                to_create.append((idx, code, self.model(**{**self.lookup, self.code_field: code, **defaults})))
+                continue
+            for key, value in defaults.items():
+                setattr(obj, key, value)
+            obj.updated_at = now  # bulk_update auto_now'ni qo'llamaydi
+            fields.update(defaults)
+            to_update.append((idx, code, obj))
+
+        try:
+            with transaction.atomic():
+                if to_create:
+                    self.model.objects.bulk_create([obj for _, _, obj in to_create])
+                if to_update:
+                    self.model.objects.bulk_update([obj for _, _, obj in to_update], [*fields, 'updated_at'])
+        except Exception as e:  # noqa: BLE001 - xato qatorni topish uchun qatorma-qator yoziladi
+            logger.warning(f"Bulk import batch failed, retrying row by row: {e}")
+            self._save_rows(to_create, to_update, stats)
+            return
+        stats.created += len(to_create)
+        stats.updated += len(to_update)
+
+    def run(self, items, stats, on_batch=None):
+        """`items` - [(qator raqami, qiymatlar), ...] oqimi; har batch'dan keyin `on_batch(processed)`"""
+        processed = 0
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self.process_batch(batch, stats)
+                processed += len(batch)
+                batch = []
+                if on_batch:
+                    on_batch(processed)
+        if batch:
+            self.process_batch(batch, stats)
+            processed += len(batch)
+        return processed
+
+    def finish(self):
+        """Import tugagach: kesh teglari va `on_finish` hook'i"""
+        invalidate_tags(*self.cache_tags)
+        if self.on_finish:
+            self.on_finish()
+
+    @staticmethod
+    def _save_rows(to_create, to_update, stats):
+        for is_new, items in ((True, to_create), (False, to_update)):
+            for idx, code, obj in items:
+                if is_new:
+                    obj.pk = None
+                    obj._state.adding = True
+                try:
+                    with transaction.atomic():
+                        obj.save()
+                except Exception as e:  # noqa: BLE001
+                    stats.error(idx, code, str(e))
+                    continue
+                if is_new:
+                    stats.created += 1
+                else:
+                    stats.updated += 1
+
+
+class ImportStats:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row, code, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_LOGGED_ERRORS:
+            self.errors.append({'row': row, 'code': code, 'error': message})
+
+
+def _iter_rows(sheet, columns):
+    for idx, row in enumerate(sheet.iter_rows(min_row=2, max_col=columns, values_only=True), start=2):
+        if not row or all(value in (None, '') for value in row):
+            continue
+        row = tuple(row)
+        yield idx, row + (None,) * (columns - len(row))
+
+
+def run_excel_import(import_log_id, path, importer, columns):
+    """Fon jarayoni: faylni oqim bilan o'qib, batch'lar bo'yicha yozish"""
+    stats = ImportStats()
+    log_qs = ImportLog.objects.filter(pk=import_log_id)
+    processed = 0
+
+    def _progress(count):
+        nonlocal processed
+        processed = count
+        log_qs.update(
+            processed_rows=count,
+            created_count=stats.created,
+            updated_count=stats.updated,
+            error_count=stats.error_count,
+            updated_at=timezone.now(),
+        )
+
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            # read_only rejimda max_row fayldagi dimension'dan olinadi (taxminiy)
+            log_qs.update(total_rows=max((sheet.max_row or 1) - 1, 0))
+            processed = importer.run(_iter_rows(sheet, columns), stats, on_batch=_progress)
+        finally:
+            workbook.close()
+        status = 'completed' if not stats.error_count else 'error'
+        summary = f"Imported: {stats.created}, Updated: {stats.updated}, Errors: {stats.error_count}"
+    except Exception as e:  # noqa: BLE001
+        logger.error(f"Excel import #{import_log_id} failed: {e}")
+        status = 'error'
+        summary = f"Import to'xtadi: {e}"
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    log_qs.update(
+        status=status,
+        summary=summary,
+        total_rows=processed,
+        processed_rows=processed,
+        created_count=stats.created,
+        updated_count=stats.updated,
+        error_count=stats.error_count,
+        errors_json=stats.errors,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    importer.finish()
+    logger.info(f"Excel import #{import_log_id}: {summary}")
+
+
+def _run_in_thread(*args):
+    try:
+        run_excel_import(*args)
+    finally:
+        connection.close()
+
+
+def start_excel_import(entity_type, uploaded, user, importer, columns):
+    """
+    Faylni vaqtinchalik papkaga yozib, importni commit'dan keyin fon thread'ida boshlash.
+    Qaytaradi: ImportLog.
+    """
+    root = settings.EXCEL_IMPORT_TMP_ROOT
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f'{uuid.uuid4().hex}.xlsx')
+    uploaded.seek(0)
+    with open(path, 'wb') as fh:
+        for chunk in uploaded.chunks():
+            fh.write(chunk)
+
+    import_log = ImportLog.objects.create(
+        entity_type=entity_type,
+        filename=uploaded.name,
+        status='processing',
+        performed_by=user if user.is_authenticated else None,
+    )
+    args = (import_log.pk, path, importer, columns)
+
+    def _submit():
+        if getattr(settings, 'EXCEL_IMPORT_ASYNC', True):
+            threading.Thread(target=_run_in_thread, args=args, daemon=True).start()
+        else:
+            run_excel_import(*args)
+
+    transaction.on_commit(_submit)
+    return import_log
+
+
+def import_job_payload(request, import_log):
+    """202 javobi: import id va progressni kuzatish URL'i"""
+    return {
+        'import_id': import_log.pk,
+        'status': import_log.status,
+        'status_url': request.build_absolute_uri(reverse('import-log-detail', args=[import_log.pk])),
+    }
@@ -1,5 +1,36 @@
+import logging
+from functools import lru_cache
+
 from rest_framework import serializers
 
+from utils.scope import get_principal_scope
+
+logger = logging.getLogger(__name__)
+
+PROJECT_MODELS = ('AuthProject', 'Project')
+
+
+@lru_cache(maxsize=None)
+def project_field_target(model, field_path):
+    """
+    Project maydoni qaysi modelga bog'langan: 'AuthProject', 'Project' yoki None.
+    Nested yo'llar (masalan 'client__project') qo'llanadi; natija model bo'yicha keshlanadi.
+    """
+    # Special case: If the model itself is AuthProject or Project
+    if model.__name__ in PROJECT_MODELS:
+        return model.__name__
+    current_model = model
+    for part in field_path.split('__'):
+        try:
+            current_model = current_model._meta.get_field(part).related_model
+        except Exception:
+            return None
+        if current_model is None:
+            return None
+    # Fallback: noma'lum model - AuthProject kabi (exact match)
+    return 'Project' if current_model.__name__ == 'Project' else 'AuthProject'
+
+
 class ProjectScopedMixin:
     """
     Mixin to automatically filter querysets by the user's project.
@@ -14,77 +45,31 @@ class ProjectScopedMixin:
         # Superusers can see everything
         if user.is_superuser:
             return queryset
-            
-        try:
-            # Get AuthProject from user profile
-            user_auth_project = user.profile.project
-            if not user_auth_project:
-                return queryset.none()
-            
-            # Support nested field paths (e.g. 'client__project')
-            parts = self.project_field_name.split('__')
-            model_class = queryset.model
-            
-            # Special case: If the model itself is AuthProject or Project
-            if model_class.__name__ == 'AuthProject':
-                return queryset.filter(id=user_auth_project.id)
-            elif model_class.__name__ == 'Project':
-                if not user_auth_project.project_code:
-                    return queryset.none()
-                return queryset.filter(code_1c__iexact=user_auth_project.project_code, is_deleted=False)
-
-            # Resolve the target model of the project field
-            current_model = model_class
-            target_model = None
-            for i, part in enumerate(parts):
-                try:
-                    field = current_model._meta.get_field(part)
-                    if i < len(parts) - 1:
-                        current_model = field.related_model
-                    else:
-                        target_model = field.related_model
-                except Exception:
-                    # Field not found or other meta error
-                    return queryset.none()
-            
-            # Case 1: Model uses users.AuthProject
-            if target_model and target_model.__name__ == 'AuthProject':
-                return queryset.filter(**{self.project_field_name: user_auth_project})
-            
-            # Case 2: Model uses api.Project
-            elif target_model and target_model.__name__ == 'Project':
-                if not user_auth_project.project_code:
-                    return queryset.none()
-
-                # Map AuthProject (project_code) to Project (code_1c)
-                from api.models import Project
-                try:
-                    # Use iexact to handle case-sensitivity in Postgres vs SQLite
-                    target_project = Project.objects.filter(
-                        code_1c__iexact=user_auth_project.project_code, 
-                        is_deleted=False
-                    ).first()
-                    
-                    if not target_project:
-                        import logging
-                        logging.warning(f"ProjectScopedMixin: Project with code '{user_auth_project.project_code}' not found in api.Project.")
-                        return queryset.none()
-                        
-                    return queryset.filter(**{self.project_field_name: target_project})
-                except Exception as e:
-                    import logging
-                    logging.error(f"ProjectScopedMixin Error: {str(e)}")
-                    return queryset.none()
-            
-            # Fallback (exact Match)
-            return queryset.filter(**{self.project_field_name: user_auth_project})
-            
-        except (AttributeError, Exception) as e:
-            # Fallback if profile doesn't exist or other error
-            import logging
-            logging.error(f"ProjectScopedMixin unexpected error: {str(e)}")
+
+        # Scope (AuthProject id, api.Project id) keshdan - bu yerda faqat integer filtrlar
+        scope = get_principal_scope(user)
+        if scope is None or not scope.auth_project_id:
             return queryset.none()
 
+        target = project_field_target(queryset.model, self.project_field_name)
+        if target is None:
+            # Field not found or other meta error
+            return queryset.none()
+        if target == 'AuthProject':
+            return queryset.filter(**{self.project_lookup(queryset.model): scope.auth_project_id})
+
+        # api.Project: AuthProject.project_code -> Project.code_1c
+        if not scope.project_id:
+            logger.warning(f"ProjectScopedMixin: Project with code '{scope.project_code}' not found in api.Project.")
+            return queryset.none()
+        return queryset.filter(**{self.project_lookup(queryset.model): scope.project_id})
+
+    def project_lookup(self, model):
+        """`project` -> `project_id`, model o'zi project bo'lsa -> `id`"""
+        if model.__name__ in PROJECT_MODELS:
+            return 'id'
+        return f'{self.project_field_name}_id'
+
     def perform_create(self, serializer):
         """Automatically assign user's project on creation"""
         user = self.request.user
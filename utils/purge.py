@@ -0,0 +1,349 @@
+"""
+Admin panelidan table'larni tez tozalash (ClearDatabaseView).
+
+`Model.objects.all().delete()` har bir obyektni xotiraga yuklab, cascade va
+signal'larni Python'da bajaradi - millionlab qatorli `AgentLocation` yoki
+`ClientImage` da bu juda sekin va worker xotirasini tugatadi. Bu yerda:
+
+1. Tanlangan modellar va ularga bog'langan (`on_delete`) modellardan reja
+   tuziladi: CASCADE - bola table'lar oldin o'chiriladi, SET_NULL - bitta
+   UPDATE, PROTECT/RESTRICT - bog'langan qatorlar bo'lsa xato.
+2. Qatorlar pk bo'yicha batch'larda xom `DELETE ... WHERE pk IN (...)` bilan
+   o'chiriladi. PostgreSQL'da reja faqat to'liq table'lardan iborat bo'lsa
+   bitta `TRUNCATE` ishlatiladi.
+3. O'chirilgan qatorlardagi fayl nomlari vaqtinchalik faylga yig'iladi va
+   DB bosqichidan keyin boshqa yozuvlar ishlatmayotgan fayllar (va imagekit
+   rendition'lari) o'chiriladi.
+4. Xom SQL signal'larni chaqirmaydi, shuning uchun DB bosqichidan keyin
+   tegishli keshlar (reference registry, feed teglari, principal scope'lar)
+   shu yerda yangilanadi.
+Hammasi fon thread'ida bajariladi, progress `ClearDatabaseJob` ga yoziladi.
+"""
+import logging
+import os
+import tempfile
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection, models, transaction
+from django.db.models import Q
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+
+from core.models import ClearDatabaseJob
+from utils.cache import cache_tag, invalidate_tags
+from utils.refdata import reference_data
+from utils.scope import invalidate_all_principal_scopes
+from utils.storage import referenced_names
+
+logger = logging.getLogger(__name__)
+
+# Progress har shuncha batch'da yoziladi
+PROGRESS_EVERY = 5
+MEDIA_CHUNK_SIZE = 1000
+
+# Model -> kesh tegi entity'si (`invalidate_entity` bilan bir xil nomlar)
+CACHE_TAG_ENTITIES = {
+    'api.Project': 'project',
+    'api.ProjectImage': 'project_image',
+    'api.ImageStatus': 'image_status',
+    'api.ImageSource': 'image_source',
+    'client.Client': 'client',
+    'client.ClientImage': 'client_image',
+    'nomenklatura.Nomenklatura': 'nomenklatura',
+    'nomenklatura.NomenklaturaImage': 'nomenklatura_image',
+    'visits.Visit': 'visit',
+}
+# `reference_data` registry'dagi ma'lumotnomalar
+REFERENCE_MODELS = {
+    'api.ImageStatus', 'api.ImageSource', 'references.VisitType', 'references.VisitStatus', 'references.VisitPriority',
+}
+# Principal scope shu table'lardan aniqlanadi
+SCOPE_MODELS = {'auth.User', 'users.UserProfile', 'users.AgentBusinessRegion', 'users.AuthProject', 'api.Project'}
+
+
+class PurgeError(Exception):
+    """Rejani bajarib bo'lmaydi (masalan PROTECT bog'lanishlar)"""
+
+
+class PurgeStep:
+    """Bitta model uchun o'chirish: to'liq table yoki ota qatorlarga bog'langanlari"""
+
+    def __init__(self, model, full=False):
+        self.model = model
+        self.full = full
+        self.parents = []  # [(ota PurgeStep, FK maydoni), ...]
+        self.file_fields = [f.name for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+
+    @property
+    def label(self):
+        return self.model._meta.label
+
+    def queryset(self):
+        manager = self.model._base_manager
+        if self.full:
+            return manager.all()
+        condition = Q()
+        for parent, field in self.parents:
+            target = field.target_field.attname
+            condition |= Q(**{f'{field.name}__in': parent.queryset().values(target)})
+        return manager.filter(condition)
+
+
+def build_plan(selected):
+    """
+    Tanlangan modellar uchun reja.
+    Qaytaradi: (steps - bolalar otalaridan oldin, set_null - [(PurgeStep, model, field), ...]).
+    """
+    steps = {model: PurgeStep(model, full=True) for model in selected}
+    order, set_null, protected = [], [], []
+    expanded = set()
+
+    def expand(step):
+        if step.model in expanded:
+            return
+        expanded.add(step.model)
+        for rel in get_candidate_relations_to_delete(step.model._meta):
+            child, field = rel.related_model, rel.field
+            on_delete = field.remote_field.on_delete
+            if on_delete is models.DO_NOTHING:
+                continue
+            if on_delete is models.SET_NULL:
+                set_null.append((step, child, field))
+                continue
+            if on_delete is not models.CASCADE:
+                protected.append((step, child, field))
+                continue
+            child_step = steps.get(child)
+            if child_step is None:
+                # Ota to'liq o'chirilsa va FK majburiy bo'lsa - bola table ham to'liq
+                child_step = steps[child] = PurgeStep(child, full=step.full and not field.null)
+            if not child_step.full:
+                child_step.parents.append((step, field))
+            expand(child_step)
+        order.append(step)
+
+    for model in selected:
+        expand(steps[model])
+
+    for parent, child, field in protected:
+        if child in steps and steps[child].full:
+            continue
+        if child._base_manager.filter(**{f'{field.name}__in': parent.queryset().values(field.target_field.attname)}).exists():
+            raise PurgeError(
+                f"{parent.label}: {child._meta.label}.{field.name} bog'lanishi "
+                f"({field.remote_field.on_delete.__name__}) o'chirishga yo'l qo'ymaydi"
+            )
+    return order, set_null
+
+
+class _MediaSpool:
+    """O'chirilayotgan qatorlardagi fayl nomlari (xotiraga emas, vaqtinchalik faylga)"""
+
+    def __init__(self):
+        self.fh = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.count = 0
+
+    def add(self, step, rows):
+        for row in rows:
+            for field, name in zip(step.file_fields, row[1:]):
+                if name:
+                    self.fh.write(f'{step.label}\t{field}\t{name}\n')
+                    self.count += 1
+
+    def chunks(self, size):
+        self.fh.seek(0)
+        chunk = []
+        for line in self.fh:
+            chunk.append(line.rstrip('\n').split('\t', 2))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def close(self):
+        self.fh.close()
+
+
+class DatabasePurger:
+    def __init__(self, job, steps, set_null, batch_size=None):
+        self.job = job
+        self.steps = steps
+        self.set_null = set_null
+        self.batch_size = batch_size or getattr(settings, 'CLEAR_DB_BATCH_SIZE', 5000)
+        self.media = _MediaSpool()
+        self.deleted = 0
+        self.stats = {}
+
+    def _progress(self):
+        ClearDatabaseJob.objects.filter(pk=self.job.pk).update(
+            deleted_rows=self.deleted, stats=self.stats, updated_at=timezone.now(),
+        )
+
+    def _raw_delete(self, model, pks):
+        quote = connection.ops.quote_name
+        table, column = quote(model._meta.db_table), quote(model._meta.pk.column)
+        placeholders = ', '.join(['%s'] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', pks)
+            return cursor.rowcount
+
+    def _delete_step(self, step):
+        queryset = step.queryset().order_by().values_list('pk', *step.file_fields)
+        deleted = batches = 0
+        while True:
+            rows = list(queryset[:self.batch_size])
+            if not rows:
+                break
+            self.media.add(step, rows)
+            with transaction.atomic():
+                count = self._raw_delete(step.model, [row[0] for row in rows])
+            deleted += count
+            self.deleted += count
+            self.stats[step.label] = deleted
+            batches += 1
+            if batches % PROGRESS_EVERY == 0:
+                self._progress()
+        self.stats[step.label] = deleted
+
+    def _truncate(self):
+        """PostgreSQL: reja faqat to'liq table'lardan iborat bo'lsa bitta TRUNCATE"""
+        if connection.vendor != 'postgresql' or self.set_null or not all(step.full for step in self.steps):
+            return False
+        counts = {step.label: step.model._base_manager.count() for step in self.steps}
+        for step in self.steps:
+            if step.file_fields:
+                rows = step.model._base_manager.order_by().values_list('pk', *step.file_fields)
+                self.media.add(step, rows.iterator(chunk_size=self.batch_size))
+        tables = ', '.join(connection.ops.quote_name(step.model._meta.db_table) for step in self.steps)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # CASCADE'siz: rejadan tashqaridagi table bog'langan bo'lsa PostgreSQL rad etadi
+                cursor.execute(f'TRUNCATE {tables}')
+        except DatabaseError as e:
+            logger.info(f"Clear DB #{self.job.pk}: TRUNCATE rad etildi, batch DELETE ishlatiladi ({e})")
+            self.media.close()
+            self.media = _MediaSpool()
+            return False
+        self.stats = counts
+        self.deleted = sum(counts.values())
+        return True
+
+    def run(self):
+        total = sum(step.queryset().count() for step in self.steps)
+        ClearDatabaseJob.objects.filter(pk=self.job.pk).update(total_rows=total)
+        if not self._truncate():
+            for parent, child, field in self.set_null:
+                target = field.target_field.attname
+                child._base_manager.filter(**{f'{field.name}__in': parent.queryset().values(target)}).update(
+                    **{field.name: None}
+                )
+            for step in self.steps:
+                self._delete_step(step)
+        self._progress()
+
+    def invalidate_caches(self):
+        """O'chirilgan (yoki SET_NULL bilan o'zgargan) modellarga bog'liq keshlar"""
+        touched = {step.model for step in self.steps} | {child for _, child, _ in self.set_null}
+        labels = {model._meta.label for model in touched}
+        for model in touched:
+            if model._meta.label in REFERENCE_MODELS:
+                reference_data.invalidate(model)
+        tags = [cache_tag(CACHE_TAG_ENTITIES[label]) for label in sorted(labels) if label in CACHE_TAG_ENTITIES]
+        if tags:
+            invalidate_tags(*tags)
+        if labels & SCOPE_MODELS:
+            invalidate_all_principal_scopes()
+
+    def cleanup_media(self):
+        """DB'da boshqa yozuvlar ishlatmayotgan fayllarni va rendition'larni o'chirish"""
+        cache_dir = getattr(settings, 'IMAGEKIT_CACHEFILE_DIR', 'CACHE/images')
+        removed = 0
+        for chunk in self.media.chunks(MEDIA_CHUNK_SIZE):
+            referenced = referenced_names(name for _, _, name in chunk)
+            for label, field, name in chunk:
+                if name in referenced:
+                    continue
+                referenced.add(name)  # bir xil blob ikki marta o'chirilmasin
+                storage = apps.get_model(label)._meta.get_field(field).storage
+                try:
+                    if storage.exists(name):
+                        storage.delete(name)
+                        removed += 1
+                    _delete_renditions(f'{cache_dir}/{os.path.splitext(name)[0]}')
+                except OSError as e:
+                    logger.warning(f"Clear DB #{self.job.pk}: {name} o'chirilmadi: {e}")
+        self.media.close()
+        return removed
+
+
+def _delete_renditions(prefix):
+    if not default_storage.exists(prefix):
+        return
+    dirs, files = default_storage.listdir(prefix)
+    for filename in files:
+        default_storage.delete(f'{prefix}/{filename}')
+    for dirname in dirs:
+        _delete_renditions(f'{prefix}/{dirname}')
+
+
+def run_clear_database(job_id, model_labels):
+    job = ClearDatabaseJob.objects.get(pk=job_id)
+    job_qs = ClearDatabaseJob.objects.filter(pk=job_id)
+    purger = None
+    try:
+        steps, set_null = build_plan([apps.get_model(label) for label in model_labels])
+        purger = DatabasePurger(job, steps, set_null)
+        purger.run()
+    except Exception as e:  # noqa: BLE001
+        logger.error(f"Clear DB #{job_id} failed: {e}")
+        if purger:
+            purger.invalidate_caches()  # qisman o'chirilgan bo'lishi mumkin
+        job_qs.update(
+            status='error',
+            errors_json=[str(e)],
+            media_status='skipped',
+            deleted_rows=purger.deleted if purger else 0,
+            stats=purger.stats if purger else {},
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if purger:
+            purger.media.close()
+        return
+
+    purger.invalidate_caches()
+    job_qs.update(status='completed', finished_at=timezone.now(), media_status='processing', updated_at=timezone.now())
+    logger.info(f"Clear DB #{job_id}: {purger.deleted} rows deleted")
+    try:
+        removed = purger.cleanup_media()
+    except Exception as e:  # noqa: BLE001
+        logger.error(f"Clear DB #{job_id} media cleanup failed: {e}")
+        job_qs.update(media_status='error', errors_json=[f"media: {e}"], updated_at=timezone.now())
+        return
+    job_qs.update(media_status='completed', media_deleted=removed, updated_at=timezone.now())
+
+
+def _run_in_thread(*args):
+    try:
+        run_clear_database(*args)
+    finally:
+        connection.close()
+
+
+def start_clear_database(keys, models_map, user):
+    """`keys` - tanlangan table kalitlari. Qaytaradi: ClearDatabaseJob (ish commit'dan keyin boshlanadi)"""
+    job = ClearDatabaseJob.objects.create(tables=list(keys), performed_by=user if user.is_authenticated else None)
+    args = (job.pk, [models_map[key]._meta.label for key in keys])
+
+    def _submit():
+        if getattr(settings, 'CLEAR_DB_ASYNC', True):
+            threading.Thread(target=_run_in_thread, args=args, daemon=True).start()
+        else:
+            run_clear_database(*args)
+
+    transaction.on_commit(_submit)
+    return job
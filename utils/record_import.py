@@ -0,0 +1,256 @@
+"""
+CSV / NDJSON (ixtiyoriy gzip) ommaviy import.
+
+1C'da bo'lmagan integratorlar katalogni CSV yoki JSON lines ko'rinishida yuboradi.
+- Fayl qatorma-qator o'qiladi (gzip magic bytes bo'yicha aniqlanadi);
+- ustun nomlari `mapping` orqali model maydonlariga bog'lanadi, maydon nomi bilan
+  bir xil ustunlar avtomatik bog'lanadi;
+- qiymatlar model maydon turiga qarab 1C integratsiyasidagi `clean_*`
+  helperlari bilan o'giriladi;
+- faqat faylda bor ustunlar yangilanadi (qisman update);
+- yozuvlar `BulkImporter` orqali batch'lar bo'yicha set-based upsert qilinadi.
+
+Import so'rov ichida (sinxron) bajariladi, shuning uchun yuklangan fayl hajmi
+`RECORD_IMPORT_MAX_SIZE` bilan cheklanadi; kattaroq fayllar uchun Excel
+(`import-xlsx`) fon importi ishlatiladi. `ImportLog` import boshida yaratilib,
+oxirida (xato bo'lsa ham) yoziladi - qisman yozilgan batch'lar ham qayd etiladi.
+"""
+import csv
+import gzip
+import io
+import json
+import time
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from core.models import ImportLog
+from integration.views import clean_boolean, clean_date, clean_decimal, clean_integer, clean_json, clean_value
+from utils.imports import BulkImporter, ImportStats
+
+RECORD_FORMATS = ('csv', 'ndjson')
+CSV_DELIMITERS = {',': ',', ';': ';', 'tab': '\t', '\t': '\t', '|': '|'}
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class RecordImportError(ValueError):
+    """Import boshlanmasdan oldingi xato (format, mapping, header)"""
+
+
+def guess_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def parse_mapping(raw):
+    """Form field'dagi `mapping` JSON'ini o'qish"""
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        raise RecordImportError("mapping yaroqli JSON bo'lishi kerak")
+
+
+def open_text(uploaded):
+    """Yuklangan faylni (gzip bo'lsa ochib) matn oqimi sifatida qaytarish"""
+    uploaded.seek(0)
+    stream = uploaded.file if hasattr(uploaded, 'file') else uploaded
+    head = stream.read(2)
+    stream.seek(0)
+    if head == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def field_converter(field):
+    """Model maydoni uchun `clean_*` konverter"""
+    if isinstance(field, models.BooleanField):
+        convert = clean_boolean
+    elif isinstance(field, (models.IntegerField, models.BigIntegerField, models.SmallIntegerField)):
+        convert = clean_integer
+    elif isinstance(field, (models.DecimalField, models.FloatField)):
+        convert = clean_decimal
+    elif isinstance(field, models.DateTimeField):
+        convert = clean_value
+    elif isinstance(field, models.DateField):
+        convert = clean_date
+    elif isinstance(field, models.JSONField):
+        convert = clean_json
+    else:
+        convert = clean_value
+
+    def _convert(value):
+        value = convert(value)
+        if value is None and not field.null:
+            return field.get_default()
+        return value
+
+    return _convert
+
+
+class RecordImport:
+    """
+    `fields` - import qilish mumkin bo'lgan maydonlar (odatda Excel headerlari),
+    `mapping` - {"fayldagi ustun": "model maydoni"}, `lookup` va `cache_tags` -
+    `BulkImporter` ga beriladi.
+    """
+
+    def __init__(self, model, code_field, fields, mapping=None, lookup=None, cache_tags=()):
+        self.code_field = code_field
+        self.allowed = set(fields)
+        self.importer = BulkImporter(model, code_field, self.parse_item, lookup=lookup, cache_tags=cache_tags)
+        self.converters = {name: field_converter(model._meta.get_field(name)) for name in fields}
+
+        mapping = mapping or {}
+        if not isinstance(mapping, dict):
+            raise RecordImportError("mapping JSON obyekt bo'lishi kerak")
+        unknown = sorted({target for target in mapping.values() if target not in self.allowed})
+        if unknown:
+            raise RecordImportError(f"Noma'lum maydonlar: {', '.join(map(str, unknown))}")
+        self.mapping = {str(source).strip().lower(): target for source, target in mapping.items()}
+        self.ignored = set()
+
+    def target(self, column):
+        key = str(column).strip().lower()
+        if key in self.mapping:
+            return self.mapping[key]
+        return key if key in self.allowed else None
+
+    def parse_record(self, record):
+        if not isinstance(record, dict):
+            raise ValueError("Qator JSON obyekt bo'lishi kerak")
+        values = {}
+        for column, raw in record.items():
+            target = self.target(column)
+            if target is None:
+                self.ignored.add(str(column))
+                continue
+            values[target] = self.converters[target](raw)
+        code = values.pop(self.code_field, None)
+        if not code:
+            raise ValueError(f"{self.code_field} bo'sh bo'lishi mumkin emas")
+        if 'name' in values and not values['name']:
+            values['name'] = code
+        return str(code), values
+
+    def parse_item(self, record):
+        """`BulkImporter.parse_row`: NDJSON'dagi yaroqsiz qator xato sifatida keladi"""
+        if isinstance(record, ValueError):
+            raise record
+        return self.parse_record(record)
+
+    def iter_csv(self, text, delimiter):
+        reader = csv.reader(text, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            raise RecordImportError("CSV fayl bo'sh")
+        targets = [self.target(column) for column in header]
+        if self.code_field not in targets:
+            raise RecordImportError(f"{self.code_field} ustuni topilmadi (mapping orqali bog'lang)")
+        self.ignored.update(column for column, target in zip(header, targets) if target is None)
+        for line_no, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            yield line_no, dict(zip(header, row))
+
+    @staticmethod
+    def iter_ndjson(text):
+        for line_no, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                # Yaroqsiz qator parse bosqichida xato sifatida qayd etiladi
+                yield line_no, ValueError(f"JSON xatosi: {e.msg}")
+
+    def run(self, uploaded, file_format, stats, delimiter=',', on_batch=None):
+        """Qaytaradi: qayta ishlangan qatorlar soni"""
+        try:
+            text = open_text(uploaded)
+            records = self.iter_csv(text, delimiter) if file_format == 'csv' else self.iter_ndjson(text)
+            return self.importer.run(records, stats, on_batch=on_batch)
+        except (UnicodeDecodeError, gzip.BadGzipFile, EOFError, csv.Error) as e:
+            raise RecordImportError(f"Faylni o'qib bo'lmadi: {e}")
+        finally:
+            # Xato bo'lsa ham oldingi batch'lar yozilgan bo'lishi mumkin
+            self.importer.finish()
+
+
+def import_records(uploaded, *, entity_type, model, code_field, fields, user, lookup=None, cache_tags=(),
+                   mapping=None, file_format=None, delimiter=','):
+    """
+    Faylni import qilib, natija va o'tkazuvchanlik (rows/s) ni qaytarish.
+    Natija `ImportLog` ga ham yoziladi.
+    """
+    file_format = (file_format or guess_format(uploaded.name) or '').lower()
+    if file_format not in RECORD_FORMATS:
+        raise RecordImportError(f"file_format quyidagilardan biri bo'lishi kerak: {', '.join(RECORD_FORMATS)}")
+    if delimiter not in CSV_DELIMITERS:
+        raise RecordImportError(f"delimiter quyidagilardan biri bo'lishi kerak: {', '.join(CSV_DELIMITERS)}")
+    max_size = settings.RECORD_IMPORT_MAX_SIZE
+    if uploaded.size > max_size:
+        raise RecordImportError(
+            f"Fayl hajmi {max_size} baytdan oshmasligi kerak; katta fayllar uchun import-xlsx ishlating"
+        )
+
+    job = RecordImport(model, code_field, fields, mapping, lookup=lookup, cache_tags=cache_tags)
+    import_log = ImportLog.objects.create(
+        entity_type=entity_type,
+        filename=uploaded.name,
+        status='processing',
+        performed_by=user if user.is_authenticated else None,
+    )
+    stats = ImportStats()
+    rows = 0
+    status, summary = 'error', None
+
+    def _progress(count):
+        nonlocal rows
+        rows = count
+
+    started = time.monotonic()
+    try:
+        rows = job.run(uploaded, file_format, stats, CSV_DELIMITERS[delimiter], on_batch=_progress)
+        status = 'completed' if not stats.error_count else 'error'
+        summary = f"Imported: {stats.created}, Updated: {stats.updated}, Errors: {stats.error_count}"
+    except Exception as e:
+        summary = f"Import to'xtadi: {e}"
+        raise
+    finally:
+        duration = time.monotonic() - started
+        ImportLog.objects.filter(pk=import_log.pk).update(
+            status=status,
+            summary=summary,
+            total_rows=rows,
+            processed_rows=rows,
+            created_count=stats.created,
+            updated_count=stats.updated,
+            error_count=stats.error_count,
+            errors_json=stats.errors,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    return {
+        'import_id': import_log.pk,
+        'file_format': file_format,
+        'rows': rows,
+        'created': stats.created,
+        'updated': stats.updated,
+        'error_count': stats.error_count,
+        'errors': stats.errors[:100],
+        'ignored_columns': sorted(job.ignored),
+        'duration_ms': round(duration * 1000),
+        'rows_per_second': round(rows / duration) if duration > 0 else rows,
+    }
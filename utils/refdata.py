@@ -0,0 +1,117 @@
+"""
+Ma'lumotnomalar (reference data) uchun jarayon ichidagi registry.
+
+ImageStatus, ImageSource, VisitType, VisitStatus va VisitPriority kam o'zgaradi,
+lekin hot path'larda (check-in, har bir rasm serializatsiyasi) doim kerak bo'ladi.
+Har bir model jadvali bir marta xotiraga yuklanadi va id / code bo'yicha so'rovsiz
+qaytariladi.
+
+Invalidatsiya: umumiy keshda (Redis) har bir model uchun versiya kaliti saqlanadi.
+`post_save`/`post_delete` signal'lari (commit'dan keyin) versiyani almashtiradi;
+boshqa jarayonlar versiyani `REFERENCE_DATA_CHECK_INTERVAL` soniyada bir marta
+tekshiradi va o'zgargan bo'lsa jadvalni qayta yuklaydi. Boshqa kesh yozuvlari
+tegilmaydi.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from utils.cache import smart_cache_get, smart_cache_set
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = 'refdata:version:'
+
+
+def version_key(label):
+    return f'{VERSION_KEY_PREFIX}{label}'
+
+
+class _Entry:
+    def __init__(self, token, rows, checked_until):
+        self.token = token
+        self.rows = rows
+        self.checked_until = checked_until
+        self.by_id = {row.pk: row for row in rows}
+        self.by_code = {row.code: row for row in rows if getattr(row, 'code', None)}
+
+
+class ReferenceRegistry:
+    """
+    Qaytarilgan obyektlar jarayon bo'ylab umumiy - ularni o'zgartirmang,
+    faqat o'qish yoki FK ga tayinlash uchun ishlating.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _entry(self, model):
+        label = model._meta.label
+        entry = self._entries.get(label)
+        now = time.monotonic()
+        if entry is not None and now < entry.checked_until:
+            return entry
+
+        key = version_key(label)
+        token = smart_cache_get(key, local=False)
+        interval = getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', 5)
+        if entry is not None and token == entry.token:
+            entry.checked_until = now + interval
+            return entry
+
+        with self._lock:
+            current = self._entries.get(label)
+            if current is not None and current is not entry and current.token == token:
+                return current  # boshqa thread allaqachon yukladi
+            if token is None:
+                token = uuid.uuid4().hex
+                smart_cache_set(key, token, timeout=None)
+            # Soft-deleted yozuvlar ham yuklanadi: mavjud rasmlar ularga bog'langan bo'lishi mumkin
+            entry = _Entry(token, list(model._base_manager.all()), now + interval)
+            self._entries[label] = entry
+        logger.debug(f"Reference data loaded: {label} ({len(entry.rows)} rows)")
+        return entry
+
+    def get(self, model, pk, include_deleted=False):
+        """id bo'yicha obyekt yoki None"""
+        if pk in (None, ''):
+            return None
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        obj = self._entry(model).by_id.get(pk)
+        if obj is None or (obj.is_deleted and not include_deleted):
+            return None
+        return obj
+
+    def get_by_code(self, model, code):
+        obj = self._entry(model).by_code.get(code)
+        return None if obj is None or obj.is_deleted else obj
+
+    def all(self, model, include_deleted=False):
+        rows = self._entry(model).rows
+        return list(rows) if include_deleted else [row for row in rows if not row.is_deleted]
+
+    def invalidate(self, model, using=None):
+        """Joriy jarayonda darhol, qolganlarida - versiya orqali (commit'dan keyin)"""
+        label = model._meta.label
+        self._entries.pop(label, None)
+
+        def _bump():
+            self._entries.pop(label, None)
+            smart_cache_set(version_key(label), uuid.uuid4().hex, timeout=None)
+
+        transaction.on_commit(_bump, using=using)
+
+    def clear(self):
+        self._entries.clear()
+
+
+reference_data = ReferenceRegistry()
+
@@ -0,0 +1,130 @@
+"""
+Imagekit rendition'larini (image_thumbnail/sm/md/lg) fon rejimida yaratish.
+
+- `BackgroundRenditionStrategy` list endpoint'larda hech qachon sinxron
+  generatsiya qilmaydi va storage'da mavjudlikni tekshirmaydi.
+- Yuklashdan so'ng (transaction commit'dan keyin) rendition'lar umumiy
+  thread pool'da yaratiladi va modelda `renditions_ready=True` qo'yiladi.
+- Tayyor bo'lmaguncha serializer/feed original rasm URL'ini qaytaradi.
+- Tayyor bo'lgach `renditions_ready` signal'i yuboriladi (URL'ni saqlab
+  qo'ygan yozuvlar uni yangilashi uchun).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+
+from utils.images import populate_thumbnail_metadata
+
+logger = logging.getLogger(__name__)
+
+JPEG_SPECS = ('image_thumbnail', 'image_sm', 'image_md', 'image_lg')
+WEBP_SUFFIX = '_webp'
+RENDITION_SPECS = JPEG_SPECS + tuple(f'{spec}{WEBP_SUFFIX}' for spec in JPEG_SPECS)
+
+_executor = None
+
+# sender - model klassi, instance - rendition'lari tayyor bo'lgan obyekt
+renditions_ready = Signal()
+
+
+class BackgroundRenditionStrategy:
+    """Imagekit cachefile strategy: request ichida generatsiya va existence check yo'q"""
+
+    def on_existence_required(self, file):
+        pass
+
+    def on_content_required(self, file):
+        # Fayl tarkibi bevosita o'qilganda (masalan, worker yoki admin) yaratiladi
+        file.generate()
+
+    def should_verify_existence(self, file):
+        return False
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+            thread_name_prefix='renditions',
+        )
+    return _executor
+
+
+def generate_renditions(instance, force=False):
+    """Barcha spec'larni yaratish, thumbnail metama'lumotini yozish va `renditions_ready` qo'yish"""
+    if not instance.image:
+        return False
+    try:
+        for spec_name in RENDITION_SPECS:
+            getattr(instance, spec_name).generate(force=force)
+    except Exception as e:
+        logger.error(f"Rendition generation failed ({instance.__class__.__name__} #{instance.pk}): {e}")
+        return False
+    populate_thumbnail_metadata(instance)
+    instance.__class__.objects.filter(pk=instance.pk).update(renditions_ready=True)
+    instance.renditions_ready = True
+    renditions_ready.send(sender=instance.__class__, instance=instance)
+    return True
+
+
+def generate_renditions_for_pk(model, pk, force=False):
+    """Worker ichida ishlatiladi: obyektni DB'dan qayta o'qib rendition'larni yaratadi"""
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None:
+            return False
+        return generate_renditions(instance, force=force)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(instance):
+    """Commit'dan keyin rendition'larni fon pool'ga yuborish"""
+    model = instance.__class__
+    pk = instance.pk
+
+    def _submit():
+        if getattr(settings, 'IMAGE_RENDITIONS_ASYNC', True):
+            _get_executor().submit(generate_renditions_for_pk, model, pk)
+        else:
+            generate_renditions(model.objects.get(pk=pk))
+
+    transaction.on_commit(_submit)
+
+
+def prefers_webp(request):
+    """Klient WebP qabul qiladimi: `?webp=1` yoki `Accept: image/webp` (`?webp=0` o'chiradi)"""
+    if request is None:
+        return False
+    params = getattr(request, 'query_params', None) or request.GET
+    flag = (params.get('webp') or '').strip().lower()
+    if flag in ('1', 'true', 'yes'):
+        return True
+    if flag in ('0', 'false', 'no'):
+        return False
+    return 'image/webp' in request.META.get('HTTP_ACCEPT', '')
+
+
+def rendition_url(instance, spec_name, webp=False):
+    """
+    Rendition tayyor bo'lsa uning URL'i (storage'ga murojaatsiz), aks holda original rasm URL'i.
+    `webp=True` bo'lsa spec'ning WebP varianti qaytariladi.
+    """
+    if not instance.image:
+        return None
+    if webp and instance.renditions_ready:
+        spec_name = f'{spec_name}{WEBP_SUFFIX}'
+    ready = instance.renditions_ready or (
+        spec_name == 'image_thumbnail' and instance.thumbnail_size_bytes is not None
+    )
+    if ready:
+        try:
+            cachefile = getattr(instance, spec_name)
+            return cachefile.storage.url(cachefile.name)
+        except Exception:  # noqa: BLE001 - imagekit throws RuntimeError when image absent
+            pass
+    return instance.image.url
@@ -0,0 +1,197 @@
+"""
+Rasmlarni so'rov bo'yicha (on-demand) o'lchamga keltirish va disk keshi.
+
+- Ruxsat etilgan o'lchamlar `IMAGE_RESIZE_SIZES` whitelist'idan olinadi,
+  shuning uchun keshni ixtiyoriy o'lchamlar bilan to'ldirib bo'lmaydi.
+- Natija `IMAGE_RESIZE_CACHE_ROOT` ga `<sha256(params)>.<ext>` nomi bilan yoziladi.
+  Kalit rasmning content hash'idan olinadi - bir xil blob bir marta kichraytiriladi.
+- Kesh hajmi `IMAGE_RESIZE_CACHE_MAX_BYTES` bilan cheklangan: har bir hit faylning
+  mtime'ini yangilaydi, chegaradan oshganda eng eski (LRU) fayllar o'chiriladi.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+logger = logging.getLogger(__name__)
+
+FIT_COVER = 'cover'
+FIT_CONTAIN = 'contain'
+FITS = (FIT_COVER, FIT_CONTAIN)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'png': ('PNG', 'image/png', '.png'),
+}
+# Eviction'dan keyin kesh shu ulushgacha tushiriladi (har yozuvda skan qilmaslik uchun)
+EVICTION_LOW_WATERMARK = 0.9
+
+_size_lock = threading.Lock()
+_cache_size = None
+
+
+class ResizeError(ValueError):
+    """Noto'g'ri resize parametrlari"""
+
+
+def parse_resize_params(params, default_format='jpeg'):
+    """
+    Query parametrlardan (width, height, fit, format) ni o'qish va whitelist bo'yicha tekshirish.
+    Kamida bitta o'lcham talab qilinadi.
+    """
+    allowed = set(settings.IMAGE_RESIZE_SIZES)
+    sizes = {}
+    for key in ('width', 'height'):
+        raw = params.get(key) or params.get(key[0])
+        if raw in (None, ''):
+            sizes[key] = None
+            continue
+        try:
+            value = int(raw)
+        except (TypeError, ValueError):
+            raise ResizeError(f"{key} butun son bo'lishi kerak")
+        if value not in allowed:
+            raise ResizeError(f"{key} ruxsat etilgan o'lchamlardan biri bo'lishi kerak: {sorted(allowed)}")
+        sizes[key] = value
+    if not sizes['width'] and not sizes['height']:
+        raise ResizeError("width yoki height talab qilinadi")
+
+    fit = (params.get('fit') or FIT_COVER).lower()
+    if fit not in FITS:
+        raise ResizeError(f"fit quyidagilardan biri bo'lishi kerak: {', '.join(FITS)}")
+    output = (params.get('format') or default_format).lower()
+    if output == 'jpg':
+        output = 'jpeg'
+    if output not in OUTPUT_FORMATS:
+        raise ResizeError(f"format quyidagilardan biri bo'lishi kerak: {', '.join(OUTPUT_FORMATS)}")
+    return sizes['width'], sizes['height'], fit, output
+
+
+def cache_key(source_key, width, height, fit, output):
+    raw = f"{source_key}|{width or 0}x{height or 0}|{fit}|{output}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def cache_path(key, output):
+    return os.path.join(settings.IMAGE_RESIZE_CACHE_ROOT, key[:2], f'{key}{OUTPUT_FORMATS[output][2]}')
+
+
+def resize_image(file_obj, width, height, fit, output):
+    """Rasmni kichraytirish (kattalashtirilmaydi). Qaytaradi: bytes"""
+    pil_format = OUTPUT_FORMATS[output][0]
+    with PILImage.open(file_obj) as img:
+        if img.format == 'JPEG':
+            # DCT darajasida kichraytirib dekodlash - katta originallarda ancha tezroq
+            edge = max(width or 0, height or 0) * 2
+            img.draft('RGB', (edge, edge))
+        img = ImageOps.exif_transpose(img)
+        src_w, src_h = img.size
+        target_w = min(width or src_w, src_w)
+        target_h = min(height or src_h, src_h)
+        if width and not height:
+            target_h = max(1, round(src_h * target_w / src_w))
+        elif height and not width:
+            target_w = max(1, round(src_w * target_h / src_h))
+
+        if fit == FIT_COVER and width and height:
+            img = ImageOps.fit(img, (target_w, target_h), PILImage.Resampling.LANCZOS)
+        else:
+            img.thumbnail((target_w, target_h), PILImage.Resampling.LANCZOS)
+
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        elif pil_format == 'WEBP' and img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'P') else 'RGB')
+        options = {'optimize': True}
+        if pil_format in ('JPEG', 'WEBP'):
+            options['quality'] = settings.IMAGE_RESIZE_QUALITY
+        buffer = io.BytesIO()
+        img.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def _scan_cache():
+    """Kesh papkasidagi fayllar: [(mtime, size, path), ...]"""
+    entries = []
+    root = settings.IMAGE_RESIZE_CACHE_ROOT
+    if not os.path.isdir(root):
+        return entries
+    for bucket in os.scandir(root):
+        if not bucket.is_dir():
+            continue
+        for entry in os.scandir(bucket.path):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def evict(max_bytes=None):
+    """LRU eviction: eng eski (mtime) fayllarni chegaraning 90% igacha o'chirish"""
+    global _cache_size
+    max_bytes = max_bytes or settings.IMAGE_RESIZE_CACHE_MAX_BYTES
+    entries = _scan_cache()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    if total > max_bytes:
+        target = max_bytes * EVICTION_LOW_WATERMARK
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+    with _size_lock:
+        _cache_size = total
+    if removed:
+        logger.info(f"Resize cache eviction: {removed} files removed, {total} bytes left")
+    return removed
+
+
+def _account(delta):
+    """Jarayon ichidagi kesh hajmi hisobini yangilash; chegaradan oshsa eviction"""
+    global _cache_size
+    with _size_lock:
+        if _cache_size is None:
+            _cache_size = sum(size for _, size, _ in _scan_cache())
+        _cache_size += delta
+        over = _cache_size > settings.IMAGE_RESIZE_CACHE_MAX_BYTES
+    if over:
+        evict()
+
+
+def get_or_create(source_key, open_source, width, height, fit, output):
+    """
+    Keshdan olish yoki yaratish. `open_source` - original faylni ochuvchi callable.
+    Qaytaradi: (fayl yo'li, kesh kaliti).
+    """
+    key = cache_key(source_key, width, height, fit, output)
+    path = cache_path(key, output)
+    if os.path.exists(path):
+        try:
+            os.utime(path)  # LRU: oxirgi foydalanish vaqti
+        except FileNotFoundError:
+            pass
+        else:
+            return path, key
+
+    with open_source() as fh:
+        data = resize_image(fh, width, height, fit, output)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+    _account(len(data))
+    return path, key
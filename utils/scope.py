@@ -0,0 +1,150 @@
+"""
+Foydalanuvchining "principal scope" i: AuthProject id, unga mos api.Project id
+va agentning biznes region kodlari.
+
+`ProjectScopedMixin` va regional filtrlar har so'rovda `user.profile.project`,
+`Project.objects.filter(code_1c__iexact=...)` va `AgentBusinessRegion` ni
+so'ramasligi uchun scope bir marta aniqlanadi va keshlanadi (L1 + Redis).
+
+Invalidatsiya:
+- profil yoki uning regionlari o'zgarsa (`sync_agent_regions` ham) - faqat shu
+  foydalanuvchi kaliti o'chiriladi;
+- AuthProject / api.Project o'zgarsa - umumiy versiya almashadi va barcha
+  scope'lar qayta aniqlanadi.
+Boshqa jarayonlarda o'zgarish ko'pi bilan `CACHE_L1_TTL` soniyadan keyin ko'rinadi.
+
+`principal_stamp` - scope, `is_active` va parol xeshidan hisoblangan qisqa qiymat.
+U access token'ga yoziladi va har so'rovda keshdagi qiymat bilan solishtiriladi:
+foydalanuvchi bloklansa, paroli yoki scope'i o'zgarsa token claim'lari eskirgan
+hisoblanadi va foydalanuvchi bazadan yuklanadi.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from utils.cache import get_or_set, smart_cache_delete, smart_cache_get, smart_cache_set
+
+SCOPE_KEY_PREFIX = 'principal_scope'
+SCOPE_VERSION_KEY = f'{SCOPE_KEY_PREFIX}:version'
+STAMP_KEY_PREFIX = f'{SCOPE_KEY_PREFIX}:stamp'
+
+
+class PrincipalScope:
+    __slots__ = ('profile_id', 'agent_code', 'auth_project_id', 'project_code', 'project_id', 'region_codes')
+
+    def __init__(self, profile_id=None, agent_code=None, auth_project_id=None, project_code=None, project_id=None,
+                 region_codes=()):
+        self.profile_id = profile_id
+        self.agent_code = agent_code  # UserProfile.code_1c
+        self.auth_project_id = auth_project_id
+        self.project_code = project_code
+        self.project_id = project_id  # api.Project
+        self.region_codes = tuple(region_codes)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _version():
+    version = smart_cache_get(SCOPE_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        smart_cache_set(SCOPE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def scope_key(user_id):
+    return f'{SCOPE_KEY_PREFIX}:{_version()}:{user_id}'
+
+
+def stamp_key(user_id):
+    return f'{STAMP_KEY_PREFIX}:{_version()}:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'PRINCIPAL_SCOPE_TTL', 600)
+
+
+def resolve_scope(user_id):
+    """Scope'ni bazadan aniqlash (3 ta kichik so'rov)"""
+    from api.models import Project
+    from users.models import AgentBusinessRegion, UserProfile
+
+    profile = UserProfile.objects.filter(user_id=user_id).values(
+        'id', 'code_1c', 'project_id', 'project__project_code',
+    ).first()
+    if profile is None:
+        return PrincipalScope()
+
+    project_code = profile['project__project_code']
+    project_id = None
+    if project_code:
+        # iexact: Postgres va SQLite'da registr farqi
+        project_id = Project.objects.filter(
+            code_1c__iexact=project_code, is_deleted=False,
+        ).values_list('id', flat=True).first()
+    region_codes = AgentBusinessRegion.objects.filter(profile_id=profile['id']).values_list('code', flat=True)
+    return PrincipalScope(
+        profile_id=profile['id'],
+        agent_code=profile['code_1c'],
+        auth_project_id=profile['project_id'],
+        project_code=project_code,
+        project_id=project_id,
+        region_codes=sorted(region_codes),
+    )
+
+
+def _scope_data(user_id):
+    return get_or_set(scope_key(user_id), lambda: resolve_scope(user_id).as_dict(), _ttl())
+
+
+def get_principal_scope(user):
+    """Anonim foydalanuvchi uchun None. Natija so'rov davomida `user` da saqlanadi."""
+    if user is None or user.is_anonymous:
+        return None
+    scope = getattr(user, '_principal_scope', None)
+    if scope is None:
+        scope = PrincipalScope(**_scope_data(user.pk))
+        user._principal_scope = scope
+    return scope
+
+
+def resolve_stamp(user_id):
+    """Stamp'ni bazadan hisoblash; foydalanuvchi yo'q bo'lsa None"""
+    from django.contrib.auth import get_user_model
+
+    row = get_user_model().objects.filter(pk=user_id).values('is_active', 'password').first()
+    if row is None:
+        return None
+    payload = json.dumps([_scope_data(user_id), row['is_active'], row['password']], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def principal_stamp(user_id):
+    return get_or_set(stamp_key(user_id), lambda: resolve_stamp(user_id), _ttl())
+
+
+def _bump_version():
+    smart_cache_set(SCOPE_VERSION_KEY, uuid.uuid4().hex[:12], timeout=None)
+
+
+def invalidate_principal_scope(user_id, using=None):
+    """
+    Bitta foydalanuvchi scope'ini o'chirish: darhol va commit'dan keyin yana
+    (tranzaksiya davomida eski qiymat qayta keshlangan bo'lishi mumkin).
+    """
+    def _delete():
+        smart_cache_delete(scope_key(user_id))
+        smart_cache_delete(stamp_key(user_id))
+
+    _delete()
+    transaction.on_commit(_delete, using=using)
+
+
+def invalidate_all_principal_scopes(using=None):
+    """Project xaritasi o'zgarganda barcha scope'lar (versiya orqali)"""
+    _bump_version()
+    transaction.on_commit(_bump_version, using=using)
@@ -0,0 +1,154 @@
+"""
+Katalog gridlari uchun thumbnail sprite sheet'lar.
+
+Bir sahifadagi rasmlar bitta sprite rasmga (kvadrat katakchalar, `columns` ustun)
+yig'iladi va har bir rasmning koordinatalari JSON xaritada qaytariladi -
+60 ta thumbnail so'rovi o'rniga bitta JSON va bitta rasm so'rovi.
+
+Sprite va xarita `CACHE/sprites/` ga rasm id'lari va versiyalari (content hash)
+bo'yicha hisoblangan kalit bilan yoziladi: rasm almashtirilsa kalit o'zgaradi,
+eski sprite'lar media GC bilan tozalanadi. Fayllar vaqtinchalik nomga yozilib
+`os.replace` bilan almashtiriladi, bir kalit uchun parallel so'rovlar esa
+sprite'ni bir marta yig'adi (`single_flight`).
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from utils.cache import single_flight
+from utils.resize import OUTPUT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+SPRITE_PREFIX = 'CACHE/sprites'
+# Katak o'lchamidan kichik bo'lmagan eng kichik rendition ishlatiladi
+SOURCE_SPECS = (('image_thumbnail', 150), ('image_sm', 300), ('image_md', 600))
+BACKGROUND = (255, 255, 255)
+
+
+def image_version(image):
+    return image.content_hash or image.image.name
+
+
+def sprite_key(entity_type, images, cell, columns, output):
+    """Rasm id'lari, versiyalari va sprite parametrlaridan barqaror kalit"""
+    parts = [entity_type, str(cell), str(columns), output]
+    parts.extend(f'{image.pk}:{image_version(image)}' for image in images)
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def sprite_names(key, output):
+    base = f'{SPRITE_PREFIX}/{key[:2]}/{key}'
+    return f'{base}{OUTPUT_FORMATS[output][2]}', f'{base}.json'
+
+
+def _open_source(image, cell):
+    """Tayyor rendition bo'lsa undan, aks holda originaldan o'qish"""
+    if image.renditions_ready:
+        for spec_name, size in SOURCE_SPECS:
+            if size >= cell:
+                cachefile = getattr(image, spec_name)
+                try:
+                    return cachefile.storage.open(cachefile.name, 'rb')
+                except (OSError, ValueError):
+                    break
+    return image.image.open('rb')
+
+
+def _load_cell(image, cell):
+    with _open_source(image, cell) as fh:
+        with PILImage.open(fh) as img:
+            if img.format == 'JPEG':
+                img.draft('RGB', (cell * 2, cell * 2))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'P') else 'RGB')
+            return ImageOps.fit(img, (cell, cell), PILImage.Resampling.LANCZOS)
+
+
+def build_sprite(images, cell, columns, output):
+    """
+    Sprite rasmni yig'ish. Qaytaradi: (bytes, {'width', 'height', 'frames'}).
+    O'qib bo'lmaydigan rasmlar bo'sh katak bo'lib qoladi va xaritaga kirmaydi.
+    """
+    pil_format = OUTPUT_FORMATS[output][0]
+    rows = max(1, -(-len(images) // columns))
+    mode = 'RGB' if pil_format == 'JPEG' else 'RGBA'
+    background = BACKGROUND if mode == 'RGB' else (*BACKGROUND, 0)
+    sheet = PILImage.new(mode, (max(1, min(len(images), columns)) * cell, rows * cell), background)
+
+    frames = []
+    for index, image in enumerate(images):
+        x, y = (index % columns) * cell, (index // columns) * cell
+        try:
+            tile = _load_cell(image, cell)
+        except (OSError, ValueError, PILImage.DecompressionBombError) as e:
+            logger.warning(f"Sprite tile skipped ({image.__class__.__name__} #{image.pk}): {e}")
+            continue
+        if tile.mode == 'RGBA':
+            sheet.paste(tile, (x, y), tile)
+        else:
+            sheet.paste(tile, (x, y))
+        frames.append({'id': image.pk, 'x': x, 'y': y, 'width': cell, 'height': cell})
+
+    options = {'optimize': True}
+    if pil_format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.IMAGE_RESIZE_QUALITY
+    buffer = io.BytesIO()
+    sheet.save(buffer, format=pil_format, **options)
+    return buffer.getvalue(), {'width': sheet.width, 'height': sheet.height, 'frames': frames}
+
+
+def _write_atomic(storage, name, data):
+    """Vaqtinchalik faylga yozib `os.replace`: o'quvchi yarim yozilgan faylni ko'rmaydi"""
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_map(storage, map_name):
+    if not storage.exists(map_name):
+        return None
+    try:
+        with storage.open(map_name, 'rb') as fh:
+            return json.loads(fh.read())
+    except (OSError, ValueError):
+        return None
+
+
+def get_or_create_sprite(entity_type, images, cell, columns, output, storage=None):
+    """
+    Keshdan olish yoki yaratish.
+    Qaytaradi: {'key', 'name', 'width', 'height', 'frames'} - `name` storage'dagi sprite nomi.
+    """
+    storage = storage or default_storage
+    key = sprite_key(entity_type, images, cell, columns, output)
+    image_name, map_name = sprite_names(key, output)
+    sprite_map = _read_map(storage, map_name)
+    if sprite_map is not None:
+        return sprite_map
+
+    def _build():
+        # Navbat kutgan paytda boshqa jarayon yozib bo'lgan bo'lishi mumkin
+        existing = _read_map(storage, map_name)
+        if existing is not None:
+            return existing
+        data, built = build_sprite(images, cell, columns, output)
+        _write_atomic(storage, image_name, data)
+        built.update(key=key, name=image_name)
+        # Xarita oxirida yoziladi: u mavjud bo'lsa sprite ham tayyor
+        _write_atomic(storage, map_name, json.dumps(built).encode('utf-8'))
+        return built
+
+    return single_flight.do(f'sprite:{key}', _build)
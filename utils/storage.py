@@ -0,0 +1,139 @@
+"""
+Content-addressed (SHA-256) media storage.
+
+Yuklangan rasm fayli tarkibining SHA-256 xeshi bo'yicha
+`blobs/ab/cd/<sha256>.<ext>` yo'liga yoziladi. Bir xil fayl qayta
+yuklansa yangi nusxa yozilmaydi - barcha rasm yozuvlari bitta blob'ga
+murojaat qiladi. Imagekit cache nomlari manba nomidan hisoblangani uchun
+rendition'lar ham har bir blob uchun bir marta yaratiladi.
+"""
+import hashlib
+import os
+import uuid
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+BLOB_PREFIX = 'blobs'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_sha256(file_obj):
+    """Fayl obyektining SHA-256 xeshi (pozitsiya boshiga qaytariladi)"""
+    digest = hashlib.sha256()
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    if hasattr(file_obj, 'chunks'):
+        for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(content_hash, original_name=''):
+    """Xesh va asl fayl kengaytmasidan blob yo'lini qurish"""
+    ext = os.path.splitext(original_name or '')[1].lower()
+    return f"{BLOB_PREFIX}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{ext}"
+
+
+def hash_from_name(name):
+    """Blob yo'lidan xeshni ajratib olish (blob bo'lmasa bo'sh satr)"""
+    if not name or not name.startswith(f'{BLOB_PREFIX}/'):
+        return ''
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def assign_content_hash(instance, field_name='image'):
+    """
+    Instance'ga `content_hash` ni yozish. Yangi yuklangan faylda xesh fayl obyektiga ham
+    biriktiriladi, shunda storage uni qayta hisoblamaydi.
+    """
+    field_file = getattr(instance, field_name)
+    content_hash = hash_from_name(field_file.name)
+    if not content_hash and field_file and not getattr(field_file, '_committed', True):
+        content_hash = compute_sha256(field_file.file)
+        field_file.file.content_hash = content_hash
+    instance.content_hash = content_hash
+    return content_hash
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, lekin fayl nomi tarkib xeshidan olinadi va dublikatlar yozilmaydi"""
+
+    def save(self, name, content, max_length=None):
+        if content is None:
+            return super().save(name, content, max_length=max_length)
+        if not hasattr(content, 'chunks'):
+            from django.core.files import File
+            content = File(content, name)
+        content_hash = getattr(content, 'content_hash', None) or compute_sha256(content)
+        target = blob_name(content_hash, name)
+        if self.exists(target):
+            # Dedup: blob yana ishlatilmoqda - mtime yangilanadi, shunda gc_media
+            # (`--min-age-hours`) uni yangi yozuv commit bo'lguncha o'chirmaydi
+            try:
+                os.utime(self.path(target), None)
+            except OSError:
+                pass
+            return target
+        # Vaqtinchalik nomga yozib, atomik rename: parallel bir xil yuklashlar xavfsiz
+        # (tarkib bir xil, shuning uchun ustiga yozish zararsiz)
+        tmp_name = self._save(f"{target}.{uuid.uuid4().hex}.tmp", content)
+        os.replace(self.path(tmp_name), self.path(target))
+        return target
+
+    def get_available_name(self, name, max_length=None):
+        # Blob nomi tarkibga bog'liq - mavjud bo'lsa o'sha fayl qayta ishlatiladi
+        return name
+
+
+def file_fields():
+    """Barcha modellardagi FileField'lar: [(model, maydon nomi), ...]"""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def referenced_names(names):
+    """`names` dan hali biror yozuv (soft-deleted ham) ishlatayotganlari"""
+    names = set(names)
+    referenced = set()
+    if not names:
+        return referenced
+    for model, field in file_fields():
+        referenced.update(model._base_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return referenced
+
+
+def delete_unreferenced(storage, names):
+    """
+    Hech bir yozuv ishlatmayotgan fayllarni o'chirish. Blob'lar tarkib bo'yicha
+    umumiy, shuning uchun yozuvni o'chirish faylni o'chirishni anglatmaydi.
+    Qaytaradi: o'chirilgan fayllar soni.
+    """
+    names = {name for name in names if name}
+    removed = 0
+    for name in names - referenced_names(names):
+        if storage.exists(name):
+            storage.delete(name)
+            removed += 1
+    return removed
+
+
+_image_storage = None
+
+
+def get_image_storage():
+    """ImageField'lar uchun storage (callable - migratsiyalar barqaror bo'lishi uchun)"""
+    global _image_storage
+    if _image_storage is None:
+        _image_storage = ContentAddressedStorage()
+    return _image_storage
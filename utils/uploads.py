@@ -0,0 +1,163 @@
+"""
+Rasmlarni ommaviy (bulk) yuklash pipeline'i.
+
+ProjectImage, ClientImage va NomenklaturaImage `bulk_upload` action'lari uchun umumiy:
+    1. Fayllar thread pool'da o'qiladi, dekodlanadi va tekshiriladi;
+       EXIF orientatsiyasi qo'llanib, metama'lumotlar (EXIF/GPS) olib tashlanadi;
+       project siyosati yoqilgan bo'lsa original kichraytirilib qayta siqiladi.
+    2. Tayyor fayllar content-addressed storage'ga parallel yoziladi.
+    3. Barcha yozuvlar bitta `bulk_create` bilan qo'shiladi.
+    4. Kesh bir marta, faqat tegishli prefikslar bo'yicha tozalanadi.
+Javob oldindan hisoblangan metama'lumotlardan quriladi - fayllar qayta ochilmaydi.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image as PILImage
+from PIL import UnidentifiedImageError
+
+from utils.cache import invalidate_tags
+from utils.images import THUMBNAIL_METADATA_FIELDS, get_upload_policy, normalize_image, with_format_extension
+from utils.renditions import schedule_renditions
+from utils.storage import compute_sha256
+
+logger = logging.getLogger(__name__)
+
+
+
+class PreparedImage:
+    """Thread'da tayyorlangan bitta fayl: tarkib, xesh va metama'lumotlar"""
+
+    def __init__(self, name, content=None, content_hash='', metadata=None, error=None):
+        self.name = name
+        self.content = content
+        self.content_hash = content_hash
+        self.metadata = metadata or {}
+        self.error = error
+        self.stored_name = None
+
+
+def prepare_image(upload, policy=None):
+    """
+    Faylni o'qish, dekodlash, EXIF'ni normalize qilish va xeshlash (thread ichida).
+    `policy` (Project.upload_policy) berilsa original o'lchami cheklanib, qayta siqiladi.
+    """
+    name = os.path.basename(getattr(upload, 'name', '') or 'image')
+    normalized = None
+    try:
+        upload.seek(0)
+        data = upload.read()
+        with PILImage.open(io.BytesIO(data)) as img:
+            img.verify()
+        with PILImage.open(io.BytesIO(data)) as img:
+            img.load()
+            image_format = img.format or ''
+            size = img.size
+            if policy or img.getexif():
+                normalized = normalize_image(img, image_format, **(policy or {}))
+                if normalized:
+                    data, size, image_format = normalized
+                    name = with_format_extension(name, image_format)
+    except (UnidentifiedImageError, PILImage.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        return PreparedImage(name, error=f"Yaroqsiz rasm fayli: {e}")
+
+    content = ContentFile(data, name=name)
+    content_hash = compute_sha256(content)
+    content.content_hash = content_hash
+    return PreparedImage(
+        name,
+        content=content,
+        content_hash=content_hash,
+        metadata={
+            'width': size[0],
+            'height': size[1],
+            'format': image_format,
+            'size_bytes': len(data),
+            'is_normalized': bool(policy and normalized),
+        },
+    )
+
+
+class BulkImageUploader:
+    """
+    Bir model uchun ommaviy yuklash.
+
+    `model` - rasm modeli, `fields` - barcha yozuvlar uchun umumiy maydonlar
+    (masalan `{'project': project, 'category': ...}`), `cache_tags` - yuklashdan
+    keyin generatsiyasi oshiriladigan kesh teglari (`utils.cache.entity_tags`).
+    """
+
+    def __init__(self, model, fields, cache_tags=(), max_workers=None):
+        self.model = model
+        self.fields = fields
+        self.cache_tags = tuple(cache_tags)
+        self.max_workers = max_workers or getattr(settings, 'IMAGE_UPLOAD_WORKERS', 4)
+        self.image_field = model._meta.get_field('image')
+        # Umumiy maydonlardan project siyosatini aniqlash (masalan, client -> project)
+        self.policy = get_upload_policy(model(**fields))
+
+    def prepare(self, uploads):
+        """Barcha fayllarni parallel tayyorlash. Qaytaradi: (tayyor, xatolar)"""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='upload') as pool:
+            prepared = list(pool.map(partial(prepare_image, policy=self.policy), uploads))
+        errors = [{'file': item.name, 'error': item.error} for item in prepared if item.error]
+        return prepared, errors
+
+    def _store(self, item):
+        name = self.image_field.generate_filename(None, item.name)
+        item.stored_name = self.image_field.storage.save(name, item.content)
+        return item
+
+    def store(self, prepared):
+        """Fayllarni storage'ga parallel yozish (bir xil tarkib bitta blob'ga tushadi)"""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='upload') as pool:
+            return list(pool.map(self._store, prepared))
+
+    def _ready_renditions(self, hashes):
+        """Rendition'lari allaqachon tayyor blob'lar uchun thumbnail metama'lumotlari"""
+        rows = self.model.objects.filter(
+            content_hash__in=set(hashes), renditions_ready=True,
+        ).values('content_hash', *THUMBNAIL_METADATA_FIELDS)
+        return {row.pop('content_hash'): row for row in rows}
+
+    def build_instances(self, prepared):
+        ready = self._ready_renditions(item.content_hash for item in prepared)
+        instances = []
+        for item in prepared:
+            values = {
+                **self.fields,
+                **item.metadata,
+                'image': item.stored_name,
+                'content_hash': item.content_hash,
+                'renditions_ready': False,
+            }
+            if item.content_hash in ready:
+                values.update(ready[item.content_hash], renditions_ready=True)
+            instances.append(self.model(**values))
+        return instances
+
+    def upload(self, uploads):
+        """
+        To'liq pipeline. Qaytaradi: (yaratilgan obyektlar, xatolar).
+        Birorta fayl yaroqsiz bo'lsa hech narsa yozilmaydi.
+        """
+        prepared, errors = self.prepare(uploads)
+        if errors:
+            return [], errors
+
+        self.store(prepared)
+        instances = self.build_instances(prepared)
+        with transaction.atomic():
+            created = self.model.objects.bulk_create(instances)
+            for obj in created:
+                if not obj.renditions_ready:
+                    schedule_renditions(obj)
+        invalidate_tags(*self.cache_tags)
+        logger.info(f"Bulk upload: {len(created)} {self.model.__name__} rows created")
+        return created, []
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0007_visit_next_visit_notes_visit_tasks_completed_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='check_in_geohash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Check-in geohash (auto)', max_length=12),
+        ),
+    ]
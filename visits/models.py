@@ -10,6 +10,8 @@ from decimal import Decimal
 
 # Dynamic References
 from references.models import VisitType, VisitStatus, VisitPriority, VisitStep
+from utils.geo import safe_geohash
+from utils.refdata import reference_data
 
 
 class BaseModel(models.Model):
@@ -119,6 +121,7 @@ class Visit(BaseModel):
     check_in_longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     check_in_address = models.TextField(blank=True)
     check_in_accuracy = models.FloatField(null=True, blank=True)
+    check_in_geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, help_text="Check-in geohash (auto)")
     
     check_out_latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     check_out_longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
@@ -175,6 +178,15 @@ class Visit(BaseModel):
     
     def __str__(self):
         return f"{self.agent_name} -> {self.client_name} ({self.planned_date})"
+
+    def save(self, *args, **kwargs):
+        self.check_in_geohash = safe_geohash(self.check_in_latitude, self.check_in_longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and (
+            'check_in_latitude' in update_fields or 'check_in_longitude' in update_fields
+        ):
+            kwargs['update_fields'] = set(update_fields) | {'check_in_geohash'}
+        super().save(*args, **kwargs)
     
     def check_in(self, latitude, longitude, accuracy=None):
         """Check in to visit location"""
@@ -186,11 +198,15 @@ class Visit(BaseModel):
         
         # Dynamic Status Update
         try:
-            self.status = VisitStatus.objects.filter(code='IN_PROGRESS').first()
+            self.status = reference_data.get_by_code(VisitStatus, 'IN_PROGRESS')
         except Exception:
             pass # Graceful failure if status not seeded
             
         self.save()
+
+        # Hourly activity rollup (regional_activity)
+        from api.services import AgentActivityService
+        AgentActivityService.record_visit(self)
     
     def check_out(self, latitude=None, longitude=None):
         """Complete visit and calculate duration"""
@@ -206,7 +222,7 @@ class Visit(BaseModel):
         
         # Dynamic Status Update
         try:
-            self.status = VisitStatus.objects.filter(code='COMPLETED').first()
+            self.status = reference_data.get_by_code(VisitStatus, 'COMPLETED')
         except Exception:
             pass
 
@@ -221,7 +237,7 @@ class Visit(BaseModel):
         
         # Dynamic Status Update
         try:
-            self.status = VisitStatus.objects.filter(code='CANCELLED').first()
+            self.status = reference_data.get_by_code(VisitStatus, 'CANCELLED')
         except Exception:
             pass
             
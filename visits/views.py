@@ -14,8 +14,8 @@ from drf_spectacular.types import OpenApiTypes
 from utils.mixins import ProjectScopedMixin
 import django_filters
 
-from django.core.cache import cache
-from utils.cache import smart_cache_get, smart_cache_set, smart_cache_delete
+from utils.cache import invalidate_entity, smart_cache_get, smart_cache_set, smart_cache_delete
+from utils.refdata import reference_data
 from .models import Visit, VisitPlan, VisitImage
 from .serializers import (
     VisitListSerializer, VisitDetailSerializer, VisitCreateSerializer,
@@ -164,17 +164,17 @@ class VisitViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
         # Mixin handles project assignment
         instance = serializer.save()
         self._resolve_links(instance)
-        cache.clear()
+        invalidate_entity('visit', instance.project_id)
 
     def perform_update(self, serializer):
         instance = serializer.save()
         self._resolve_links(instance)
-        cache.clear()
+        invalidate_entity('visit', instance.project_id)
 
     def perform_destroy(self, instance):
         instance.is_deleted = True
         instance.save(update_fields=['is_deleted', 'updated_at'])
-        cache.clear()
+        invalidate_entity('visit', instance.project_id)
     
     def get_serializer_class(self):
         """Dynamic serializer selection"""
@@ -513,10 +513,9 @@ class VisitPlanViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
         
         # Fetch default types and statuses dynamically
         # We assume these are seeded. If not, we might fallback or fail gracefully.
-        try:
-            planned_type = VisitType.objects.get(code='PLANNED')
-            scheduled_status = VisitStatus.objects.get(code='SCHEDULED')
-        except (VisitType.DoesNotExist, VisitStatus.DoesNotExist):
+        planned_type = reference_data.get_by_code(VisitType, 'PLANNED')
+        scheduled_status = reference_data.get_by_code(VisitStatus, 'SCHEDULED')
+        if planned_type is None or scheduled_status is None:
             return Response(
                 {'error': 'Default VisitType (PLANNED) or VisitStatus (SCHEDULED) not found in database.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -589,16 +588,6 @@ class VisitImageViewSet(ProjectScopedMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filterset_fields = ['visit', 'image_type']
     ordering = ['-captured_at']
-    
-    # Custom get_queryset to ensure image's visit belongs to the project
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        user = self.request.user
-        if user.is_superuser:
-            return queryset
-        
-        # Verify the visit of this image belongs to user's project
-        return queryset.filter(visit__project=user.profile.project)
 
     def perform_destroy(self, instance):
         """Soft delete"""